@@ -0,0 +1,138 @@
+# ==============================
+# app/backup_index.py
+# ==============================
+from __future__ import annotations
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from .bencode import BencodeError, info_hash
+from .db import DB
+
+# (inode, mtime_ns, size): a file whose stat still matches isn't parsed again
+_Stamp = Tuple[int, int, int]
+
+
+@dataclass
+class RefreshStats:
+    files: int = 0    # .torrent files in the directory
+    parsed: int = 0   # new or changed since the last refresh
+    removed: int = 0
+    invalid: int = 0  # not a readable .torrent
+
+
+def _scan(root: str) -> Dict[str, _Stamp]:
+    """Every *.torrent under `root` with its stat stamp."""
+    out: Dict[str, _Stamp] = {}
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                    elif e.name.endswith(".torrent") and e.is_file():
+                        st = e.stat()
+                        out[e.path] = (st.st_ino, st.st_mtime_ns, st.st_size)
+                except OSError:
+                    continue  # vanished mid-scan
+    return out
+
+
+def _parse(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return info_hash(f.read())
+    except (OSError, BencodeError):
+        return None
+
+
+class BackupIndex:
+    """
+    info-hash -> backed-up .torrent path for a directory of (many) .torrent files.
+    - refresh() stats the tree and only parses files whose inode/mtime/size changed,
+      on a thread pool, hashing just the raw info dict
+    - the index is kept in SQLite, so a restart doesn't parse everything again, and
+      mirrored in memory, so lookup() is a dict access
+    """
+
+    def __init__(self, root: str, db: Optional[DB] = None, workers: int = 4):
+        self.root = root
+        self.db = db
+        self.workers = max(1, workers)
+        self._files: Dict[str, Tuple[Optional[str], _Stamp]] = {}
+        self._by_hash: Dict[str, Set[str]] = {}  # a hash can be backed up under several names
+        self._lock = asyncio.Lock()
+
+    def load(self) -> None:
+        if self.db is None:
+            return
+        self._files = {p: (h, (ino, mtime, size)) for p, h, ino, mtime, size in self.db.backup_files()}
+        self._by_hash = {}
+        for p, (h, _) in self._files.items():
+            if h:
+                self._by_hash.setdefault(h, set()).add(p)
+
+    def lookup(self, h: str) -> Optional[str]:
+        paths = self._by_hash.get(h.lower())
+        return min(paths) if paths else None
+
+    def __len__(self) -> int:
+        return len(self._by_hash)
+
+    def add(self, path: str, h: str) -> None:
+        """Register a file we just wrote, so the next refresh doesn't parse it."""
+        st = os.stat(path)
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        self._forget(path)
+        self._files[path] = (h, stamp)
+        self._by_hash.setdefault(h, set()).add(path)
+        if self.db is not None:
+            self.db.backup_put([(path, h, *stamp)])
+
+    async def refresh(self) -> RefreshStats:
+        async with self._lock:
+            found = await asyncio.to_thread(_scan, self.root)
+            stats = RefreshStats(files=len(found))
+            gone = [p for p in self._files if p not in found]
+            todo = [p for p, stamp in found.items() if p not in self._files or self._files[p][1] != stamp]
+            for p in gone:
+                self._forget(p)
+            rows: List[Tuple[str, Optional[str], int, int, int]] = []
+            if todo:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bindex") as pool:
+                    hashes = await asyncio.get_running_loop().run_in_executor(
+                        None, lambda: list(pool.map(_parse, todo, chunksize=64)),
+                    )
+                for p, h in zip(todo, hashes):
+                    self._forget(p)
+                    self._files[p] = (h, found[p])
+                    if h:
+                        self._by_hash.setdefault(h, set()).add(p)
+                    else:
+                        stats.invalid += 1
+                    rows.append((p, h, *found[p]))
+            stats.parsed = len(todo)
+            stats.removed = len(gone)
+            if self.db is not None:
+                if gone:
+                    self.db.backup_drop(gone)
+                if rows:
+                    self.db.backup_put(rows)
+            return stats
+
+    def _forget(self, path: str) -> None:
+        old = self._files.pop(path, None)
+        paths = self._by_hash.get(old[0]) if old is not None and old[0] else None
+        if paths is not None:
+            # other copies of the same torrent keep the hash indexed
+            paths.discard(path)
+            if not paths:
+                del self._by_hash[old[0]]
@@ -0,0 +1,102 @@
+# ==============================
+# app/bencode.py
+# ==============================
+from __future__ import annotations
+import hashlib
+from typing import Any, Dict, Tuple
+
+
+class BencodeError(ValueError):
+    pass
+
+
+def _decode(data: bytes, i: int) -> Tuple[Any, int]:
+    c = data[i:i + 1]
+    if c == b"i":
+        end = data.index(b"e", i)
+        return int(data[i + 1:end]), end + 1
+    if c == b"l":
+        i += 1
+        out = []
+        while data[i:i + 1] != b"e":
+            v, i = _decode(data, i)
+            out.append(v)
+        return out, i + 1
+    if c == b"d":
+        i += 1
+        d = {}
+        while data[i:i + 1] != b"e":
+            k, i = _decode(data, i)
+            d[k], i = _decode(data, i)
+        return d, i + 1
+    if c.isdigit():
+        colon = data.index(b":", i)
+        n = int(data[i:colon])
+        start = colon + 1
+        if start + n > len(data):
+            raise BencodeError("string runs past end of data")
+        return data[start:start + n], start + n
+    raise BencodeError(f"unexpected byte {c!r} at {i}")
+
+
+def bdecode(data: bytes) -> Any:
+    """Decode bencoded `data`; dict keys and strings stay bytes."""
+    try:
+        value, end = _decode(data, 0)
+    except (IndexError, ValueError) as e:
+        raise BencodeError(str(e)) from e
+    if end != len(data):
+        raise BencodeError("trailing data")
+    return value
+
+
+def _skip(data: bytes, i: int) -> int:
+    """End offset of the value starting at `i`, without building it."""
+    c = data[i:i + 1]
+    if c == b"i":
+        return data.index(b"e", i) + 1
+    if c == b"l" or c == b"d":
+        i += 1
+        while data[i:i + 1] != b"e":
+            i = _skip(data, i)
+        return i + 1
+    if c.isdigit():
+        colon = data.index(b":", i)
+        end = colon + 1 + int(data[i:colon])
+        if end > len(data):
+            raise BencodeError("string runs past end of data")
+        return end
+    raise BencodeError(f"unexpected byte {c!r} at {i}")
+
+
+def _dict_spans(data: bytes, i: int) -> Dict[bytes, Tuple[int, int]]:
+    """{key: (start, end)} of the raw values of the dict starting at `i`."""
+    if data[i:i + 1] != b"d":
+        raise BencodeError("not a dict")
+    i += 1
+    out: Dict[bytes, Tuple[int, int]] = {}
+    while data[i:i + 1] != b"e":
+        key, i = _decode(data, i)
+        end = _skip(data, i)
+        out[key] = (i, end)
+        i = end
+    return out
+
+
+def info_hash(data: bytes) -> str:
+    """
+    qBittorrent's id for a .torrent: SHA-1 of the raw info dict (v1 and hybrid),
+    or the truncated SHA-256 for v2-only torrents. Only the info dict's top-level
+    keys are walked; nothing else is decoded.
+    """
+    try:
+        start, end = _dict_spans(data, 0)[b"info"]
+        keys = _dict_spans(data, start)
+    except KeyError:
+        raise BencodeError("no info dict") from None
+    except (IndexError, ValueError) as e:
+        raise BencodeError(str(e)) from e
+    info = data[start:end]
+    if b"pieces" not in keys and b"meta version" in keys:
+        return hashlib.sha256(info).hexdigest()[:40]
+    return hashlib.sha1(info).hexdigest()
@@ -3,9 +3,12 @@
 # ==============================
 
 from __future__ import annotations
+import json
 import os
 from pydantic import BaseModel, Field, AnyHttpUrl, validator
-from typing import List, Optional
+from typing import List, Literal, Optional
+
+from .verify import MANIFEST, PIECES, RECHECK
 
 class PathMapping(BaseModel):
     container: str
@@ -17,6 +20,40 @@ class PathMapping(BaseModel):
             return v[:-1]
         return v
 
+class PlacementRule(BaseModel):
+    """
+    One misplacement rule; the first matching rule decides.
+    - prefix:   save_path is `pattern` or below it; the remainder is kept under `target`
+    - glob:     save_path matches the fnmatch `pattern`; the torrent belongs in `target`
+    - category / tag: the torrent has that category / tag; it belongs in `target`
+    No `target` means a matching torrent is where it should be.
+    """
+    kind: Literal['prefix', 'glob', 'category', 'tag'] = 'prefix'
+    pattern: str
+    target: Optional[str] = None
+
+    @validator('target')
+    def no_trailing_slash(cls, v: Optional[str]) -> Optional[str]:
+        if v and v != '/' and v.endswith('/'):
+            return v[:-1]
+        return v
+
+
+def _placement_rules() -> List[PlacementRule]:
+    raw = os.environ.get('PLACEMENT_RULES')
+    if raw:
+        return [PlacementRule(**r) for r in json.loads(raw)]
+    return [
+        PlacementRule(kind='prefix', pattern='/data/torrents'),
+        PlacementRule(kind='prefix', pattern='/data', target='/data/torrents'),
+    ]
+
+
+# Accepted COPY_ENGINE / VERIFY_MODE values
+COPY_ENGINES = ('auto', 'rsync', 'native')
+VERIFY_MODES = (RECHECK, MANIFEST, PIECES)
+
+
 class AppConfig(BaseModel):
     # App
     secret_key: str = Field(default_factory=lambda: os.environ.get('APP_SECRET_KEY', 'change-me'))
@@ -30,6 +67,7 @@ class AppConfig(BaseModel):
     qb_url: AnyHttpUrl = Field(default_factory=lambda: os.environ.get('QB_URL', 'http://192.168.1.118:8080'))
     qb_username: str = Field(default_factory=lambda: os.environ.get('QB_USERNAME', 'admin'))
     qb_password: str = Field(default_factory=lambda: os.environ.get('QB_PASSWORD', 'adminadmin'))
+    qb_max_connections: int = Field(default_factory=lambda: int(os.environ.get('QB_MAX_CONNECTIONS', '8')))
 
     # Paths & mapping
     mappings: List[PathMapping] = Field(default_factory=lambda: [
@@ -38,13 +76,70 @@ class AppConfig(BaseModel):
         PathMapping(container='/data',           host='/mnt/user/torrents'),
     ])
 
+    # Where torrents belong (PLACEMENT_RULES: JSON list of PlacementRule)
+    placement_rules: List[PlacementRule] = Field(default_factory=_placement_rules)
+
     # Migration
     rsync_flags: List[str] = Field(default_factory=lambda: ['-aHAX', '--info=progress2', '--partial', '--inplace', '--numeric-ids', '--preallocate'])
     max_concurrent_migrations: int = Field(default_factory=lambda: int(os.environ.get('MAX_CONCURRENT', '2')))
+    # Order of queued migrations: 'small-first' or 'fifo' (a request's priority always wins)
+    migrate_order: str = Field(default_factory=lambda: os.environ.get('MIGRATE_ORDER', 'small-first'))
+    # Space left free on a destination disk when planning copies (MiB)
+    min_free_mb: int = Field(default_factory=lambda: int(os.environ.get('MIN_FREE_MB', '1024')))
+    # Copy engine: 'rsync', 'native' (built-in, copy_file_range) or 'auto' (rsync if installed)
+    copy_engine: str = Field(default_factory=lambda: os.environ.get('COPY_ENGINE', 'auto'))
+    copy_workers: int = Field(default_factory=lambda: int(os.environ.get('COPY_WORKERS', '4')))
+    # After a copy: 'recheck' (qB re-hashes), 'manifest' (size+mtime vs source) or
+    # 'pieces' (hash against the .torrent); mismatches still fall back to a recheck
+    verify_mode: str = Field(default_factory=lambda: os.environ.get('VERIFY_MODE', 'recheck'))
+    # Torrents paused/relocated/resumed together per qB call for renames/hardlinks
+    qb_batch_size: int = Field(default_factory=lambda: int(os.environ.get('QB_BATCH_SIZE', '50')))
+    # Most torrents paused at once, over all running migrations
+    max_paused: int = Field(default_factory=lambda: int(os.environ.get('MAX_PAUSED', '100')))
+    # Concurrency inside one migrate task
+    parallel_copies: int = Field(default_factory=lambda: int(os.environ.get('PARALLEL_COPIES', '4')))
+    per_disk_copies: int = Field(default_factory=lambda: int(os.environ.get('PER_DISK_COPIES', '1')))
+    parallel_deletes: int = Field(default_factory=lambda: int(os.environ.get('PARALLEL_DELETES', '2')))
+    # Threads per delete, and the pause after each deleted file while copies are running
+    delete_workers: int = Field(default_factory=lambda: int(os.environ.get('DELETE_WORKERS', '4')))
+    delete_throttle_ms: int = Field(default_factory=lambda: int(os.environ.get('DELETE_THROTTLE_MS', '5')))
+    qb_concurrency: int = Field(default_factory=lambda: int(os.environ.get('QB_CONCURRENCY', '4')))
+    # Minimum seconds between progress events per task
+    progress_interval: float = Field(default_factory=lambda: float(os.environ.get('PROGRESS_INTERVAL', '0.5')))
+
+    # Torrent list cache (sync/maindata poll interval)
+    torrent_poll_sec: float = Field(default_factory=lambda: float(os.environ.get('TORRENT_POLL_SEC', '2')))
+
+    # SSE replay: in-memory event log size, optional SQLite spill
+    sse_log_size: int = Field(default_factory=lambda: int(os.environ.get('SSE_LOG_SIZE', '5000')))
+    sse_spill: bool = Field(default_factory=lambda: os.environ.get('SSE_SPILL', 'false').lower() in ('1', 'true', 'yes'))
 
     # Metadata-fix
     stuck_minutes: int = Field(default_factory=lambda: int(os.environ.get('STUCK_MINUTES', '10')))
+    # Background scan period, max torrents per strategy call, and how long a strategy gets to work
+    metafix_interval_sec: float = Field(default_factory=lambda: float(os.environ.get('METAFIX_INTERVAL_SEC', '60')))
+    metafix_batch: int = Field(default_factory=lambda: int(os.environ.get('METAFIX_BATCH', '500')))
+    metafix_settle_sec: float = Field(default_factory=lambda: float(os.environ.get('METAFIX_SETTLE_SEC', '30')))
     backup_torrent_dir: str = Field(default_factory=lambda: os.environ.get('BACKUP_TORRENT_DIR', '/backup_torrents'))
+    # Threads parsing new .torrent files when the backup index is refreshed
+    backup_index_workers: int = Field(default_factory=lambda: int(os.environ.get('BACKUP_INDEX_WORKERS', '4')))
+    # Export every torrent's .torrent into backup_torrent_dir every N minutes (0 = only on request)
+    export_interval_min: float = Field(default_factory=lambda: float(os.environ.get('EXPORT_INTERVAL_MIN', '360')))
+    export_concurrency: int = Field(default_factory=lambda: int(os.environ.get('EXPORT_CONCURRENCY', '4')))
+
+    @validator('copy_engine', always=True)
+    def known_copy_engine(cls, v: str) -> str:
+        v = (v or 'auto').lower()
+        if v not in COPY_ENGINES:
+            raise ValueError(f"COPY_ENGINE must be one of {', '.join(COPY_ENGINES)}, not {v!r}")
+        return v
+
+    @validator('verify_mode', always=True)
+    def known_verify_mode(cls, v: str) -> str:
+        v = (v or RECHECK).lower()
+        if v not in VERIFY_MODES:
+            raise ValueError(f"VERIFY_MODE must be one of {', '.join(VERIFY_MODES)}, not {v!r}")
+        return v
 
     # Optional: turn off --inplace via env
     @property
@@ -53,16 +148,3 @@ class AppConfig(BaseModel):
         if os.environ.get('DISABLE_INPLACE', 'false').lower() in ('1','true','yes'):
             flags = [f for f in flags if f != '--inplace']
         return flags
-
-    # replace the existing method in AppConfig
-    def save_path_is_misplaced(self, save_path: str) -> bool:
-        """
-        Misplaced if path is under /data (== '/data' or '/data/...') but NOT under /data/torrents
-        Handles both with/without trailing slash.
-        """
-        sp = save_path.rstrip('/')
-        def under(p: str, root: str) -> bool:
-            p = p.rstrip('/')
-            root = root.rstrip('/')
-            return p == root or p.startswith(root + '/')
-        return under(sp, '/data') and not under(sp, '/data/torrents')
@@ -0,0 +1,220 @@
+# ==============================
+# app/copier.py
+# ==============================
+from __future__ import annotations
+import asyncio
+import errno
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Bytes per copy_file_range/sendfile call (multiple of the page size)
+CHUNK = 8 * 1024 * 1024
+
+Report = Callable[[int], None]
+
+
+@dataclass
+class CopyStats:
+    files: int = 0
+    bytes: int = 0
+    skipped: int = 0  # already up to date (same size and mtime)
+    linked: int = 0   # hard links recreated inside the set
+
+
+class _Stop(Exception):
+    pass
+
+
+def _copy_xattrs(src: str, dst: str, follow: bool = True) -> None:
+    """Extended attributes, which includes POSIX ACLs (system.posix_acl_*)."""
+    try:
+        names = os.listxattr(src, follow_symlinks=follow)
+    except OSError:
+        return
+    for name in names:
+        try:
+            os.setxattr(dst, name, os.getxattr(src, name, follow_symlinks=follow), follow_symlinks=follow)
+        except OSError as e:
+            if e.errno not in (errno.ENOTSUP, errno.EPERM, errno.EACCES):
+                raise
+
+
+def _copy_meta(src: str, dst: str, st: os.stat_result, follow: bool = True) -> None:
+    """Owner (numeric), mode, xattrs/ACLs and times, like rsync -aAX --numeric-ids."""
+    try:
+        os.chown(dst, st.st_uid, st.st_gid, follow_symlinks=follow)
+    except PermissionError:
+        pass  # not root: keep our own ids, as rsync does
+    if follow or os.chmod in os.supports_follow_symlinks:  # no lchmod on Linux
+        os.chmod(dst, stat.S_IMODE(st.st_mode), follow_symlinks=follow)
+    _copy_xattrs(src, dst, follow)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns), follow_symlinks=follow)
+
+
+def _copy_data(fin: int, fout: int, size: int, report: Report, stop: threading.Event) -> None:
+    """Kernel-side copy: copy_file_range, else sendfile, else a plain buffered loop."""
+    done = 0
+    method = "copy_file_range" if hasattr(os, "copy_file_range") else "sendfile"
+    while done < size:
+        if stop.is_set():
+            raise _Stop()
+        n = 0
+        try:
+            if method == "copy_file_range":
+                n = os.copy_file_range(fin, fout, min(CHUNK, size - done))
+            elif method == "sendfile":
+                n = os.sendfile(fout, fin, done, min(CHUNK, size - done))
+            else:
+                buf = os.pread(fin, min(CHUNK, size - done), done)
+                n = os.write(fout, buf) if buf else 0
+        except OSError as e:
+            # EXDEV (older kernels across filesystems), EINVAL/ENOSYS (fs without support)
+            if e.errno in (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP) and method != "read":
+                method = "sendfile" if method == "copy_file_range" else "read"
+                os.lseek(fout, done, os.SEEK_SET)
+                os.lseek(fin, done, os.SEEK_SET)
+                continue
+            raise
+        if n == 0:
+            break  # source shrank
+        done += n
+        report(n)
+
+
+def _copy_one(src: str, dst: str, report: Report, stop: threading.Event) -> Tuple[int, bool]:
+    """Copy one entry; returns (bytes copied, skipped because up to date)."""
+    st = os.lstat(src)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if stat.S_ISLNK(st.st_mode):
+        if os.path.lexists(dst):
+            os.unlink(dst)
+        os.symlink(os.readlink(src), dst)
+        _copy_meta(src, dst, st, follow=False)
+        return 0, False
+    try:
+        dt = os.stat(dst)
+        if dt.st_size == st.st_size and dt.st_mtime_ns == st.st_mtime_ns:
+            report(st.st_size)
+            return 0, True  # rsync's quick check
+    except FileNotFoundError:
+        pass
+    fin = os.open(src, os.O_RDONLY)
+    try:
+        fout = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            _copy_data(fin, fout, st.st_size, report, stop)
+        finally:
+            os.close(fout)
+    finally:
+        os.close(fin)
+    _copy_meta(src, dst, st)
+    return st.st_size, False
+
+
+def _link_one(first_dst: str, dst: str) -> None:
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.lexists(dst):
+        if os.path.samefile(first_dst, dst):
+            return
+        os.unlink(dst)
+    os.link(first_dst, dst)
+
+
+def _hardlink_groups(src: str, files: List[str]) -> List[List[str]]:
+    """Files in the set that are hard links of each other stay linked (-H)."""
+    groups: Dict[Tuple[int, int], List[str]] = {}
+    out: List[List[str]] = []
+    for rel in files:
+        try:
+            st = os.lstat(os.path.join(src, rel))
+        except FileNotFoundError:
+            continue  # not downloaded
+        if stat.S_ISREG(st.st_mode) and st.st_nlink > 1:
+            key = (st.st_dev, st.st_ino)
+            if key not in groups:
+                groups[key] = []
+                out.append(groups[key])
+            groups[key].append(rel)
+        else:
+            out.append([rel])
+    return out
+
+
+def _copy_dirs(src: str, dst: str, files: List[str]) -> None:
+    dirs = {os.path.dirname(rel) for rel in files}
+    for rel in list(dirs):
+        while rel:
+            rel = os.path.dirname(rel)
+            dirs.add(rel)
+    dirs.discard("")
+    # deepest first, so finishing a child doesn't bump its parent's mtime afterwards
+    for rel in sorted(dirs, key=lambda p: p.count("/"), reverse=True):
+        s, d = os.path.join(src, rel), os.path.join(dst, rel)
+        if os.path.isdir(s) and os.path.isdir(d):
+            _copy_meta(s, d, os.stat(s))
+
+
+async def copy_files(
+    src: str,
+    dst: str,
+    files: List[str],
+    workers: int = 4,
+    progress: Optional[Callable[[int], None]] = None,
+    dry_run: bool = False,
+) -> CopyStats:
+    """
+    Copy `files` (relative to `src`) into `dst` with the kernel's zero-copy paths,
+    `workers` files at a time, keeping owner/mode/times/xattrs/ACLs and hard links
+    within the set. `progress` is called on the event loop with the running byte
+    total. Files already identical by size and mtime are skipped. Cancelling stops
+    the workers at their next chunk.
+    """
+    loop = asyncio.get_running_loop()
+    stats = CopyStats()
+    groups = await asyncio.to_thread(_hardlink_groups, src, files)
+    if dry_run:
+        for g in groups:
+            stats.files += len(g)
+            stats.bytes += os.lstat(os.path.join(src, g[0])).st_size
+        return stats
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    done = 0
+
+    def bump(n: int) -> None:
+        nonlocal done
+        done += n
+        if progress is not None:
+            progress(done)
+
+    def report(n: int) -> None:
+        loop.call_soon_threadsafe(bump, n)
+
+    def run(group: List[str]) -> None:
+        first = os.path.join(dst, group[0])
+        n, skipped = _copy_one(os.path.join(src, group[0]), first, report, stop)
+        for rel in group[1:]:
+            _link_one(first, os.path.join(dst, rel))
+        with lock:
+            stats.bytes += n
+            stats.skipped += skipped
+            stats.linked += len(group) - 1
+            stats.files += len(group)
+
+    os.makedirs(dst, exist_ok=True)
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="copy")
+    try:
+        await asyncio.gather(*(loop.run_in_executor(pool, run, g) for g in groups))
+        await asyncio.to_thread(_copy_dirs, src, dst, files)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    # progress callbacks were queued before each worker's result, so `done` is final here
+    return stats
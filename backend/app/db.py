@@ -1,41 +1,334 @@
 # ==============================
 # app/db.py
 # ==============================
+import asyncio
+import json
+import logging
 import os
 import sqlite3
-from typing import Optional, Tuple
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from .config import AppConfig
 
-SCHEMA = """
-PRAGMA journal_mode=WAL;
-CREATE TABLE IF NOT EXISTS users (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  username TEXT UNIQUE NOT NULL,
-  password_hash TEXT NOT NULL
-);
-CREATE TABLE IF NOT EXISTS meta_seen (
-  hash TEXT PRIMARY KEY,
-  first_seen_ts INTEGER NOT NULL
-);
-CREATE TABLE IF NOT EXISTS tasks (
-  id TEXT PRIMARY KEY,
-  kind TEXT NOT NULL,
-  status TEXT NOT NULL,
-  payload TEXT,
-  created_ts INTEGER NOT NULL,
-  updated_ts INTEGER NOT NULL
-);
-"""
+log = logging.getLogger(__name__)
+
+# Schema migrations, applied in order; PRAGMA user_version holds how many ran.
+# Append new steps, never edit old ones (the first step is the original schema,
+# written with IF NOT EXISTS so databases from before versioning upgrade cleanly).
+MIGRATIONS: List[str] = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      username TEXT UNIQUE NOT NULL,
+      password_hash TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta_seen (
+      hash TEXT PRIMARY KEY,
+      first_seen_ts INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS tasks (
+      id TEXT PRIMARY KEY,
+      kind TEXT NOT NULL,
+      status TEXT NOT NULL,
+      payload TEXT,
+      created_ts INTEGER NOT NULL,
+      updated_ts INTEGER NOT NULL
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS tasks_status ON tasks(status);
+    CREATE TABLE IF NOT EXISTS task_items (
+      task_id TEXT NOT NULL,
+      hash TEXT NOT NULL,
+      state TEXT NOT NULL,
+      message TEXT,
+      updated_ts INTEGER NOT NULL,
+      PRIMARY KEY (task_id, hash)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS events (
+      epoch TEXT NOT NULL,
+      seq INTEGER NOT NULL,
+      event TEXT NOT NULL,
+      data TEXT NOT NULL,
+      PRIMARY KEY (epoch, seq)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS copy_stats (
+      disk TEXT PRIMARY KEY,
+      bytes INTEGER NOT NULL,
+      seconds REAL NOT NULL,
+      updated_ts INTEGER NOT NULL
+    );
+    """,
+    """
+    ALTER TABLE meta_seen ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE meta_seen ADD COLUMN last_try_ts INTEGER;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS backup_torrents (
+      path TEXT PRIMARY KEY,
+      hash TEXT,
+      inode INTEGER NOT NULL,
+      mtime_ns INTEGER NOT NULL,
+      size INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS backup_torrents_hash ON backup_torrents(hash);
+    """,
+]
+
+# SSE events kept in the spill table (per process epoch)
+EVENTS_KEEP = 100000
+
+# Connection tuning
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 64 * 1024 * 1024
+# Max queued writes committed in one transaction
+WRITE_BATCH = 500
+
+# (sql, rows): executemany(sql, rows) in the writer's transaction
+_Write = Tuple[str, Sequence[Sequence[Any]]]
+
 
 class DB:
+    """
+    SQLite access for the app.
+    - one connection per thread (FastAPI's threadpool, asyncio.to_thread workers and
+      the event loop each get their own), tuned for WAL
+    - writes from tasks and the SSE spill go through an async queue once
+      start_writer() ran, and are committed in batches by a single writer;
+      `await flush()` before reading something you just wrote
+    """
+
     def __init__(self, cfg: AppConfig):
         self.cfg = cfg
         os.makedirs(cfg.data_dir, exist_ok=True)
         self.path = os.path.join(cfg.data_dir, 'app.db')
-        self.conn = sqlite3.connect(self.path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self.conn.executescript(SCHEMA)
-        self.conn.commit()
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer: Optional[asyncio.Task] = None
+        self.migrate()
+
+    # ---------- connections ----------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        with self._conns_lock:
+            self._conns.append(conn)
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
 
     def get_conn(self):
-        return self.conn
\ No newline at end of file
+        return self.conn
+
+    def close(self) -> None:
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for c in conns:
+            c.close()
+        self._local = threading.local()
+
+    # ---------- schema ----------
+    @property
+    def user_version(self) -> int:
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self) -> None:
+        conn = self.conn
+        for version in range(self.user_version, len(MIGRATIONS)):
+            # executescript commits first; the step and its version bump go in one transaction
+            conn.executescript(f"BEGIN;\n{MIGRATIONS[version]}\nPRAGMA user_version={version + 1};\nCOMMIT;")
+
+    # ---------- write queue ----------
+    def start_writer(self) -> None:
+        """Batch writes from here on (call from the event loop)."""
+        if self._writer is None:
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop_writer(self) -> None:
+        if self._writer is None:
+            return
+        await self.flush()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        self._queue = None
+
+    async def flush(self) -> None:
+        """Wait until everything queued so far is committed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def _write(self, sql: str, rows: Sequence[Sequence[Any]]) -> None:
+        if self._queue is None:
+            self._apply([(sql, rows)])
+        elif self._loop is not None and not self._in_loop():
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (sql, rows))
+        else:
+            self._queue.put_nowait((sql, rows))
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _apply(self, batch: List[_Write]) -> None:
+        conn = self.conn
+        with conn:  # one transaction for the whole batch
+            for sql, rows in batch:
+                conn.executemany(sql, rows)
+
+    async def _write_loop(self) -> None:
+        assert self._queue is not None
+        q = self._queue
+        while True:
+            batch = [await q.get()]
+            while len(batch) < WRITE_BATCH and not q.empty():
+                batch.append(q.get_nowait())
+            try:
+                await asyncio.to_thread(self._apply, batch)
+            except Exception:
+                # one bad statement must not stall the queue; apply the rest one by one
+                for op in batch:
+                    try:
+                        await asyncio.to_thread(self._apply, [op])
+                    except Exception:
+                        log.exception("dropped database write: %s (%d row(s))", op[0].strip(), len(op[1]))
+            finally:
+                for _ in batch:
+                    q.task_done()
+
+    # ---------- task queue ----------
+    def create_task(self, task_id: str, kind: str, payload: Dict[str, Any]) -> None:
+        now = int(time.time())
+        self._write(
+            "INSERT OR REPLACE INTO tasks(id,kind,status,payload,created_ts,updated_ts) VALUES(?,?,?,?,?,?)",
+            [(task_id, kind, "queued", json.dumps(payload), now, now)],
+        )
+
+    def set_task_status(self, task_id: str, status: str) -> None:
+        self._write("UPDATE tasks SET status=?, updated_ts=? WHERE id=?", [(status, int(time.time()), task_id)])
+
+    def set_item_state(self, task_id: str, hashes: List[str], state: str, message: Optional[str] = None) -> None:
+        now = int(time.time())
+        self._write(
+            "INSERT OR REPLACE INTO task_items(task_id,hash,state,message,updated_ts) VALUES(?,?,?,?,?)",
+            [(task_id, h, state, message, now) for h in hashes],
+        )
+
+    def cancel_items(self, task_id: str, final: Tuple[str, ...], state: str) -> None:
+        """Move every item of `task_id` not in a `final` state to `state`."""
+        marks = ",".join("?" * len(final))
+        self._write(
+            f"UPDATE task_items SET state=?, updated_ts=? WHERE task_id=? AND state NOT IN ({marks})",
+            [(state, int(time.time()), task_id, *final)],
+        )
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT * FROM tasks WHERE id=?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        items = self.conn.execute(
+            "SELECT hash,state,message,updated_ts FROM task_items WHERE task_id=? ORDER BY hash", (task_id,)
+        ).fetchall()
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "payload": json.loads(row["payload"] or "{}"),
+            "created_ts": row["created_ts"],
+            "updated_ts": row["updated_ts"],
+            "items": [dict(r) for r in items],
+        }
+
+    def unfinished_tasks(self, kind: str) -> List[Tuple[str, Dict[str, Any], Dict[str, str]]]:
+        """(id, payload, {hash: state}) of tasks still queued or running, oldest first."""
+        rows = self.conn.execute(
+            "SELECT id,payload FROM tasks WHERE kind=? AND status IN ('queued','running') ORDER BY created_ts",
+            (kind,),
+        ).fetchall()
+        out = []
+        for r in rows:
+            states = {
+                i["hash"]: i["state"]
+                for i in self.conn.execute("SELECT hash,state FROM task_items WHERE task_id=?", (r["id"],))
+            }
+            out.append((r["id"], json.loads(r["payload"] or "{}"), states))
+        return out
+
+    # ---------- copy throughput ----------
+    def record_copy(self, disk: str, nbytes: int, seconds: float) -> None:
+        self._write(
+            "INSERT INTO copy_stats(disk,bytes,seconds,updated_ts) VALUES(?,?,?,?) "
+            "ON CONFLICT(disk) DO UPDATE SET bytes=bytes+excluded.bytes, seconds=seconds+excluded.seconds, "
+            "updated_ts=excluded.updated_ts",
+            [(disk, int(nbytes), float(seconds), int(time.time()))],
+        )
+
+    def copy_rates(self) -> Dict[str, float]:
+        """Average bytes/s per destination disk over all past copies."""
+        rows = self.conn.execute("SELECT disk,bytes,seconds FROM copy_stats WHERE seconds>0").fetchall()
+        return {r["disk"]: r["bytes"] / r["seconds"] for r in rows}
+
+    # ---------- torrents waiting for metadata ----------
+    def meta_seen(self) -> Dict[str, Tuple[int, int, Optional[int]]]:
+        """{hash: (first_seen_ts, attempts, last_try_ts)}"""
+        rows = self.conn.execute("SELECT hash,first_seen_ts,attempts,last_try_ts FROM meta_seen").fetchall()
+        return {r["hash"]: (r["first_seen_ts"], r["attempts"], r["last_try_ts"]) for r in rows}
+
+    def meta_seen_add(self, rows: List[Tuple[str, int]]) -> None:
+        self._write("INSERT OR IGNORE INTO meta_seen(hash,first_seen_ts) VALUES(?,?)", rows)
+
+    def meta_seen_drop(self, hashes: List[str]) -> None:
+        self._write("DELETE FROM meta_seen WHERE hash=?", [(h,) for h in hashes])
+
+    def meta_seen_tried(self, hashes: List[str], attempts: int, ts: int) -> None:
+        self._write("UPDATE meta_seen SET attempts=?, last_try_ts=? WHERE hash=?", [(attempts, ts, h) for h in hashes])
+
+    # ---------- backup .torrent index ----------
+    def backup_files(self) -> List[Tuple[str, Optional[str], int, int, int]]:
+        """(path, hash or None if unreadable, inode, mtime_ns, size) of every indexed file."""
+        rows = self.conn.execute("SELECT path,hash,inode,mtime_ns,size FROM backup_torrents").fetchall()
+        return [tuple(r) for r in rows]
+
+    def backup_put(self, rows: List[Tuple[str, Optional[str], int, int, int]]) -> None:
+        self._write("INSERT OR REPLACE INTO backup_torrents(path,hash,inode,mtime_ns,size) VALUES(?,?,?,?,?)", rows)
+
+    def backup_drop(self, paths: List[str]) -> None:
+        self._write("DELETE FROM backup_torrents WHERE path=?", [(p,) for p in paths])
+
+    # ---------- SSE event spill ----------
+    def log_event(self, epoch: str, seq: int, event: str, data: str) -> None:
+        self._write("INSERT OR REPLACE INTO events(epoch,seq,event,data) VALUES(?,?,?,?)", [(epoch, seq, event, data)])
+        if seq % 1000 == 0:
+            self._write("DELETE FROM events WHERE epoch<>? OR seq<=?", [(epoch, seq - EVENTS_KEEP)])
+
+    def events_since(self, epoch: str, after: int, before: int) -> List[Tuple[int, str, str]]:
+        rows = self.conn.execute(
+            "SELECT seq,event,data FROM events WHERE epoch=? AND seq>? AND seq<? ORDER BY seq",
+            (epoch, after, before),
+        ).fetchall()
+        return [(r["seq"], r["event"], r["data"]) for r in rows]
\ No newline at end of file
@@ -0,0 +1,96 @@
+# ==============================
+# app/deleter.py
+# ==============================
+from __future__ import annotations
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+# Max files handled by one worker call
+BATCH = 256
+
+
+@dataclass
+class DeleteStats:
+    files: int = 0
+    bytes: int = 0
+    dirs: int = 0
+    errors: int = 0
+
+
+def _unlink_batch(root: str, rels: List[str], delay: float = 0.0) -> Tuple[int, int, int]:
+    """Unlink `rels` (relative to `root`), pausing `delay` seconds after each; returns (files, bytes, errors)."""
+    n = size = errors = 0
+    for rel in rels:
+        path = os.path.join(root, rel)
+        try:
+            st = os.lstat(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            errors += 1
+            continue
+        n += 1
+        size += st.st_size
+        if delay > 0:
+            time.sleep(delay)
+    return n, size, errors
+
+
+def prune_dirs(root: str, files: List[str]) -> int:
+    """Remove directories the deleted files leave empty, deepest first. Returns the count."""
+    dirs = set()
+    for rel in files:
+        parent = os.path.dirname(rel)
+        while parent:
+            dirs.add(parent)
+            parent = os.path.dirname(parent)
+    removed = 0
+    for rel in sorted(dirs, key=lambda p: p.count("/"), reverse=True):
+        try:
+            os.rmdir(os.path.join(root, rel))
+            removed += 1
+        except OSError:
+            pass  # not empty: something else lives there
+    return removed
+
+
+async def delete_files(
+    root: str,
+    files: List[str],
+    workers: int = 4,
+    progress: Optional[Callable[[DeleteStats], Awaitable[None]]] = None,
+    throttle: Optional[Callable[[], float]] = None,
+) -> DeleteStats:
+    """
+    Delete `files` (relative to `root`) on a dedicated pool of `workers` threads,
+    BATCH files per call, then prune emptied directories. `progress` is awaited
+    with the running totals after every round; `throttle()` returns seconds to
+    pause after each file of the next round (e.g. while copies are hitting the
+    same array).
+    """
+    loop = asyncio.get_running_loop()
+    stats = DeleteStats()
+    batches = [files[i:i + BATCH] for i in range(0, len(files), BATCH)]
+    workers = max(1, workers)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="delete")
+    try:
+        for i in range(0, len(batches), workers):
+            delay = throttle() if throttle is not None else 0.0
+            rounds = await asyncio.gather(*(
+                loop.run_in_executor(pool, _unlink_batch, root, batch, delay) for batch in batches[i:i + workers]
+            ))
+            for n, size, errors in rounds:
+                stats.files += n
+                stats.bytes += size
+                stats.errors += errors
+            if progress is not None:
+                await progress(stats)
+        stats.dirs = await loop.run_in_executor(pool, prune_dirs, root, files)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return stats
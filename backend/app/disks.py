@@ -0,0 +1,84 @@
+# ==============================
+# app/disks.py
+# ==============================
+from __future__ import annotations
+import os
+from typing import Optional
+
+# Unraid user shares are a FUSE union (shfs) over the array disks and pools:
+#   /mnt/user/<share>/...  ->  /mnt/disk1/<share>/..., /mnt/cache/<share>/..., ...
+# st_dev of a /mnt/user path is the FUSE device, which says nothing about the
+# physical disk, so we look the path up on the branches instead.
+UNRAID_MNT = "/mnt"
+USER_SHARES = ("user", "user0")
+NOT_BRANCHES = USER_SHARES + ("disks", "remotes", "addons", "rootshare")
+
+
+def existing_ancestor(path: str) -> str:
+    """Closest existing directory at or above `path` (destinations may not exist yet)."""
+    p = os.path.abspath(path)
+    while not os.path.exists(p):
+        parent = os.path.dirname(p)
+        if parent == p:
+            break
+        p = parent
+    return p
+
+
+def device_of(path: str) -> int:
+    return os.stat(existing_ancestor(path)).st_dev
+
+
+def user_share_rest(path: str, mnt: str = UNRAID_MNT) -> Optional[str]:
+    p = os.path.abspath(path)
+    for share in USER_SHARES:
+        root = os.path.join(mnt, share)
+        if p == root or p.startswith(root + "/"):
+            return p[len(root):].lstrip("/")
+    return None
+
+
+def _branches(mnt: str = UNRAID_MNT):
+    try:
+        names = sorted(os.listdir(mnt))
+    except OSError:
+        return []
+    return [n for n in names if n not in NOT_BRANCHES]
+
+
+def unraid_backing(path: str, mnt: str = UNRAID_MNT) -> Optional[str]:
+    """
+    For a /mnt/user path, the /mnt/<disk-or-pool>/... path that backs it, or None
+    if the path isn't a user share or its data lives on several branches.
+    Resolves against the deepest existing directory, so it works for new targets.
+    """
+    rest = user_share_rest(path, mnt)
+    if rest is None:
+        return None
+    parts = rest.split("/") if rest else []
+    # walk from the full path upwards; first level where exactly one branch has it wins
+    for depth in range(len(parts), 0, -1):
+        sub = "/".join(parts[:depth])
+        hits = [b for b in _branches(mnt) if os.path.exists(os.path.join(mnt, b, sub))]
+        if len(hits) == 1:
+            return os.path.join(mnt, hits[0], rest)
+        if len(hits) > 1:
+            return None
+    return None
+
+
+def disk_key(path: str, mnt: str = UNRAID_MNT) -> str:
+    """
+    Stable identifier of the physical disk/pool a path writes to:
+    'disk3', 'cache', ... on Unraid, otherwise 'dev:<st_dev>'.
+    """
+    p = os.path.abspath(path)
+    backing = unraid_backing(p, mnt)
+    if backing is not None:
+        p = backing
+    if p.startswith(mnt + "/") and user_share_rest(p, mnt) is None:
+        return p[len(mnt) + 1:].split("/", 1)[0]
+    try:
+        return f"dev:{device_of(p)}"
+    except OSError:
+        return f"path:{p}"
@@ -0,0 +1,151 @@
+# ==============================
+# app/exporter.py
+# ==============================
+from __future__ import annotations
+import asyncio
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+import httpx
+
+from .sse import broker
+from .backup_index import BackupIndex
+from .bencode import BencodeError, info_hash
+from .config import AppConfig
+from .metafix import waiting_for_metadata
+from .qb_client import QBClient
+from .torrent_cache import TorrentCache
+
+
+@dataclass
+class ExportStats:
+    total: int = 0     # torrents with metadata
+    present: int = 0   # already backed up
+    exported: int = 0
+    failed: int = 0
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write via a temp file in the same directory and rename, so readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class TorrentExporter:
+    """
+    Keeps backup_torrent_dir populated from qB's /api/v2/torrents/export.
+    - only torrents the backup index doesn't know yet are fetched, so after the
+      first run each pass costs one index refresh plus the new torrents
+    - files are named by info-hash (<hash>.torrent), checked against it and
+      written atomically, export_concurrency at a time
+    - runs every export_interval_min, or on request; runs never overlap
+    """
+
+    def __init__(self, cfg: AppConfig, qb: QBClient, cache: TorrentCache, backups: BackupIndex):
+        self.cfg = cfg
+        self.qb = qb
+        self.cache = cache
+        self.backups = backups
+        self.sem = asyncio.Semaphore(max(1, cfg.export_concurrency))
+        self._lock = asyncio.Lock()  # one run at a time, scheduled or requested
+        self._run_task: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _export_one(self, h: str) -> bool:
+        async with self.sem:
+            data = await self.qb.export_torrent(h)
+        try:
+            if info_hash(data) != h:
+                return False  # not the torrent we asked for
+        except BencodeError:
+            return False
+        path = os.path.join(self.backups.root, f"{h}.torrent")
+        await asyncio.to_thread(write_atomic, path, data)
+        self.backups.add(path, h)
+        return True
+
+    async def export_once(self) -> ExportStats:
+        async with self._lock:
+            return await self._export()
+
+    async def _export(self) -> ExportStats:
+        await self.cache.ensure_ready()
+        await self.backups.refresh()
+        _, torrents, _ = self.cache.snapshot()
+        hashes = [t["hash"] for t in torrents if not waiting_for_metadata(t)]
+        todo: List[str] = [h for h in hashes if self.backups.lookup(h) is None]
+        stats = ExportStats(total=len(hashes), present=len(hashes) - len(todo))
+        if not todo:
+            return stats
+        await asyncio.to_thread(os.makedirs, self.backups.root, exist_ok=True)
+        await broker.publish("state", {"kind": "backup", "message": f"backup: exporting {len(todo)} .torrent file(s)"})
+
+        async def one(h: str) -> None:
+            try:
+                ok = await self._export_one(h)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code in (404, 405):
+                    raise  # qB older than 4.5: no export endpoint, stop the run
+                ok = False
+            except (httpx.HTTPError, OSError):
+                ok = False
+            if ok:
+                stats.exported += 1
+            else:
+                stats.failed += 1
+
+        try:
+            # the first export alone: if qB has no export endpoint, nothing else is tried
+            await one(todo[0])
+            await asyncio.gather(*(one(h) for h in todo[1:]))
+        finally:
+            await broker.publish("state", {
+                "kind": "backup", "stats": asdict(stats),
+                "message": f"backup: {stats.exported} exported, {stats.failed} failed, {stats.present} already backed up",
+                **({"level": "warn"} if stats.failed else {}),
+            })
+        return stats
+
+    def trigger(self) -> bool:
+        """Start a run unless one is in progress; True if one was started."""
+        if self._lock.locked() or (self._run_task is not None and not self._run_task.done()):
+            return False
+        self._run_task = asyncio.create_task(self.export_once())
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.export_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # qB unreachable or too old: try again next interval
+            await asyncio.sleep(self.cfg.export_interval_min * 60)
+
+    def start(self) -> None:
+        if self._task is None and self.cfg.export_interval_min > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        for t in (self._task, self._run_task):
+            if t is not None and not t.done():
+                t.cancel()
+                try:
+                    await t
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._task = None
@@ -0,0 +1,72 @@
+# ==============================
+# app/listing.py
+# ==============================
+from __future__ import annotations
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder gives the same JSON, slower
+    orjson = None
+
+# Row fields, in models.TorrentInfo order
+FIELDS = (
+    "name", "hash", "size", "save_path", "state", "progress",
+    "category", "tags", "misplaced", "suggested_target",
+)
+
+
+@dataclass(slots=True)
+class TorrentRecord:
+    """One /api/torrents row (the fields of models.TorrentInfo), without pydantic's per-instance cost."""
+    name: str
+    hash: str
+    size: int
+    save_path: str
+    state: str
+    progress: float
+    category: Optional[str]
+    tags: Optional[str]
+    misplaced: bool
+    suggested_target: Optional[str]
+
+    @classmethod
+    def of(cls, t: Dict[str, Any], target: Optional[str]) -> "TorrentRecord":
+        return cls(
+            t.get("name", ""), t.get("hash", ""), t.get("size", 0), t.get("save_path", ""),
+            t.get("state", ""), t.get("progress", 0.0), t.get("category"), t.get("tags"),
+            target is not None, target,
+        )
+
+    def row(self, fields: Sequence[str] = FIELDS) -> Dict[str, Any]:
+        return {f: getattr(self, f) for f in fields}
+
+
+def encode_list(
+    records: List[TorrentRecord],
+    rev: Optional[int] = None,
+    full: bool = True,
+    removed: Iterable[str] = (),
+    total: Optional[int] = None,
+    next_cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> bytes:
+    """
+    A models.ListResponse body, encoded straight from the records: no model is
+    built or validated per row. With `fields`, rows carry only those keys.
+    """
+    body: Dict[str, Any] = {
+        "items": records if fields is None else [r.row(fields) for r in records],
+        "rev": rev,
+        "full": full,
+        "removed": list(removed),
+        "total": total,
+        "next_cursor": next_cursor,
+    }
+    if orjson is not None:
+        return orjson.dumps(body)  # serializes the slotted dataclasses natively
+    if fields is None:
+        body["items"] = [r.row() for r in records]
+    return json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode()
@@ -6,8 +6,8 @@ import asyncio
 import os
 import time
 import uuid
-from typing import List
-from fastapi import FastAPI, Depends, HTTPException, Request
+from typing import Dict, List, Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from .config import AppConfig
@@ -16,9 +16,14 @@ from .auth import router as auth_router, auth_guard
 from .qb_client import QBClient
 from .pathmap import PathMapper
 from .tasks import TaskRunner
-from .sse import router as sse_router
-from .models import TorrentInfo, ListResponse, MigrateRequest, FixMetaRequest, TaskStatus
-from .utils import compute_misplaced, suggest_target
+from .torrent_cache import TorrentCache
+from .sse import router as sse_router, broker
+from .models import ListResponse, MigrateRequest, FixMetaRequest, TaskStatus
+from .listing import FIELDS, encode_list
+from .torrent_view import MAX_PAGE, Query as TorrentQuery, QueryError, TorrentView
+from .metafix import MetaFixer
+from .backup_index import BackupIndex
+from .exporter import TorrentExporter
 
 app = FastAPI(title="Unraid Torrent Helper — Backend", version="0.1.0")
 app.add_middleware(
@@ -38,16 +43,49 @@ async def startup():
     db = DB(cfg)
     qb = QBClient(cfg)
     mapper = PathMapper(cfg.mappings)
-    runner = TaskRunner(cfg, qb, mapper)
+    backups = BackupIndex(cfg.backup_torrent_dir, db, cfg.backup_index_workers)
+    runner = TaskRunner(cfg, qb, mapper, db, backups)
+    cache = TorrentCache(qb, poll_sec=cfg.torrent_poll_sec)
+    fixer = MetaFixer(cfg, qb, cache, db, backups)
+    exporter = TorrentExporter(cfg, qb, cache, backups)
+    broker.configure(log_size=cfg.sse_log_size)
+    if cfg.sse_spill:
+        broker.attach_db(db)
+    db.start_writer()
+    cache.start()
+    # pick up migrations a restart interrupted
+    runner.resume_pending()
+    fixer.start()
+    exporter.start()
     app.state.cfg = cfg
     app.state.db = db
     app.state.qb = qb
     app.state.mapper = mapper
     app.state.runner = runner
+    app.state.placement = runner.placement
+    app.state.view = TorrentView(cache, runner.placement)
+    app.state.cache = cache
+    app.state.fixer = fixer
+    app.state.backups = backups
+    app.state.exporter = exporter
     static_dir = os.path.join(cfg.data_dir, 'static')
     if os.path.isdir(static_dir):
         app.mount('/', StaticFiles(directory=static_dir, html=True), name='static')
 
+@app.on_event('shutdown')
+async def shutdown():
+    cache: TorrentCache = app.state.cache
+    qb: QBClient = app.state.qb
+    db: DB = app.state.db
+    fixer: MetaFixer = app.state.fixer
+    exporter: TorrentExporter = app.state.exporter
+    await exporter.stop()
+    await fixer.stop()
+    await cache.stop()
+    await qb.aclose()
+    await db.stop_writer()
+    db.close()
+
 @app.get('/api/healthz')
 def healthz():
     return {"status": "ok"}
@@ -59,45 +97,135 @@ def get_config(req: Request):
     return {
         "qb_url": str(cfg.qb_url),
         "mappings": [m.dict() for m in cfg.mappings],
+        "placement_rules": [r.dict() for r in cfg.placement_rules],
         "rsync_flags": cfg.rsync_flags_effective,
         "stuck_minutes": cfg.stuck_minutes,
         "backup_torrent_dir": cfg.backup_torrent_dir,
         "max_concurrent_migrations": cfg.max_concurrent_migrations,
     }
 
+def _split(v: Optional[str]) -> List[str]:
+    return [x.strip() for x in (v or '').split(',') if x.strip()]
+
 @app.get('/api/torrents', response_model=ListResponse, dependencies=[Depends(auth_guard)])
-def list_torrents(req: Request):
-    qb: QBClient = req.app.state.qb
-    cfg: AppConfig = req.app.state.cfg
-    items: List[TorrentInfo] = []
-    for t in qb.list_torrents():
-        misplaced = cfg.save_path_is_misplaced(t.get('save_path', ''))
-        items.append(TorrentInfo(
-            name=t.get('name',''),
-            hash=t.get('hash',''),
-            size=t.get('size',0),
-            save_path=t.get('save_path',''),
-            state=t.get('state',''),
-            progress=t.get('progress',0.0),
-            category=t.get('category'),
-            tags=t.get('tags'),
-            misplaced=misplaced,
-            suggested_target=suggest_target(t.get('save_path','')) if misplaced else None,
-        ))
-    return ListResponse(items=items)
+async def list_torrents(
+    req: Request,
+    since: Optional[int] = None,
+    misplaced: Optional[bool] = None,
+    state: Optional[str] = None,
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE),
+    fields: Optional[str] = None,
+):
+    """
+    Served from the sync/maindata cache. Pass `since=<rev>` from a previous
+    response to receive only changed rows plus removed hashes.
+    Filters: `misplaced`, `state` (comma-separated), `category`, `tag` (comma-separated,
+    all must match), `q` (name substring). `sort=<key>` or `-<key>`; `limit` + `cursor`
+    (from `next_cursor`) page through the result; `fields=name,hash,...` trims each row.
+    """
+    view: TorrentView = req.app.state.view
+    cache: TorrentCache = req.app.state.cache
+    try:
+        await cache.ensure_ready()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"qBittorrent unavailable: {e}")
+
+    etag = cache.etag
+    if req.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    sort = sort or 'name'
+    query = TorrentQuery(
+        misplaced=misplaced,
+        states=set(_split(state)) or None,
+        category=category,
+        tags=set(_split(tag)),
+        q=q or None,
+        sort=sort.lstrip('-'),
+        desc=sort.startswith('-'),
+    )
+    keep = set(_split(fields))
+    unknown = keep - set(FIELDS)
+    if unknown:
+        raise HTTPException(400, f"unknown field(s): {', '.join(sorted(unknown))}")
+    try:
+        if since is not None and cursor is None and limit is None:
+            full, rows, removed = view.changed(since, query)
+            total, next_cursor = None, None
+        else:
+            page = view.query(query, cursor, limit)
+            full, rows, removed, total, next_cursor = True, page.rows, [], page.total, page.next_cursor
+    except QueryError as e:
+        raise HTTPException(400, str(e))
+    # encoded directly from the records: same schema as ListResponse, no per-row validation
+    body = encode_list(
+        rows, rev=cache.rev, full=full, removed=removed, total=total, next_cursor=next_cursor,
+        fields=[f for f in FIELDS if f in keep] or None,
+    )
+    return Response(content=body, media_type='application/json', headers={'ETag': etag})
 
 @app.post('/api/actions/migrate', dependencies=[Depends(auth_guard)])
 async def migrate(body: MigrateRequest, req: Request):
     runner: TaskRunner = req.app.state.runner
     task_id = str(uuid.uuid4())
-    coro = runner.migrate(task_id, body.hashes, body.dryRun, body.deleteOld)
-    runner.create_task(task_id, coro)
+    runner.enqueue_migrate(task_id, body.hashes, body.dryRun, body.deleteOld, body.priority)
     return {"taskId": task_id}
 
-# (Phase 2) Fix-metadata orchestration — scaffold only; full strategy applied in Part 2b if needed
+@app.post('/api/actions/migrate/plan', dependencies=[Depends(auth_guard)])
+async def migrate_plan(body: MigrateRequest, req: Request):
+    """Pre-flight only: per-torrent method/destination, space per disk, ETA. Nothing is paused."""
+    runner: TaskRunner = req.app.state.runner
+    try:
+        return await runner.plan_migrate(body.hashes, body.deleteOld)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"qBittorrent unavailable: {e}")
+
+@app.get('/api/tasks/{task_id}', response_model=TaskStatus, dependencies=[Depends(auth_guard)])
+async def get_task(task_id: str, req: Request):
+    db: DB = req.app.state.db
+    await db.flush()
+    task = db.get_task(task_id)
+    if task is None:
+        raise HTTPException(404, 'Unknown task')
+    counts: Dict[str, int] = {}
+    for it in task['items']:
+        counts[it['state']] = counts.get(it['state'], 0) + 1
+    return TaskStatus(
+        taskId=task['id'],
+        status=task['status'],
+        results={'kind': task['kind'], 'counts': counts, 'items': task['items'], 'payload': task['payload']},
+    )
+
+@app.post('/api/tasks/{task_id}/cancel', dependencies=[Depends(auth_guard)])
+async def cancel_task(task_id: str, req: Request):
+    runner: TaskRunner = req.app.state.runner
+    fixer: MetaFixer = req.app.state.fixer
+    if runner.cancel(task_id) or fixer.cancel(task_id):
+        return {"ok": True}
+    db: DB = req.app.state.db
+    if db.get_task(task_id) is None:
+        raise HTTPException(404, 'Unknown task')
+    raise HTTPException(409, 'Task is not running')
+
+@app.post('/api/actions/backup', dependencies=[Depends(auth_guard)])
+async def backup_torrents(req: Request):
+    """Export .torrent files of torrents not yet in the backup dir (progress on the SSE stream)."""
+    exporter: TorrentExporter = req.app.state.exporter
+    started = exporter.trigger()
+    return {"ok": True, "started": started}
+
 @app.post('/api/actions/fix-metadata', dependencies=[Depends(auth_guard)])
 async def fix_metadata(body: FixMetaRequest, req: Request):
-    qb: QBClient = req.app.state.qb
-    # simple first step: reannounce; replacement flow will be expanded in next chunk if desired
-    qb.reannounce(body.hashes)
-    return {"ok": True, "message": "Reannounce sent"}
\ No newline at end of file
+    """
+    Run the metadata strategies (default: reannounce, dht-nudge, replace) on `hashes`
+    now, escalating while they stay in metaDL. Stuck torrents are also picked up in
+    the background after STUCK_MINUTES.
+    """
+    fixer: MetaFixer = req.app.state.fixer
+    task_id = str(uuid.uuid4())
+    fixer.enqueue(task_id, body.hashes, body.strategy, body.dryRun)
+    return {"taskId": task_id}
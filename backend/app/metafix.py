@@ -0,0 +1,341 @@
+# ==============================
+# app/metafix.py
+# ==============================
+from __future__ import annotations
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from .sse import broker
+from .backup_index import BackupIndex
+from .config import AppConfig
+from .db import DB
+from .qb_client import QBClient
+from .torrent_cache import TorrentCache
+from .tasks import ITEM_CANCELED, ITEM_DONE, ITEM_ERROR, ITEM_QUEUED
+
+# Strategies, cheapest first; a stuck torrent moves one step every stuck_minutes
+REANNOUNCE = "reannounce"
+DHT_NUDGE = "dht-nudge"
+REPLACE = "replace"
+STRATEGIES = (REANNOUNCE, DHT_NUDGE, REPLACE)
+
+# qB states of a torrent that has no metadata yet
+META_STATES = ("metaDL", "forcedMetaDL")
+
+# Preferences the nudge turns on (DHT is bounced off and on to force a fresh bootstrap)
+NUDGE_PREFS = ("dht", "pex", "lsd")
+
+
+def waiting_for_metadata(t: Dict[str, Any]) -> bool:
+    return t.get("state") in META_STATES
+
+
+class MetaFixer:
+    """
+    Finds torrents stuck fetching metadata and escalates through STRATEGIES.
+    - each scan diffs the torrent cache's changes since the previous scan against
+      meta_seen (when a hash was first seen in metaDL, strategies tried so far)
+    - a torrent is stuck after stuck_minutes; it then gets the next strategy, and
+      another one every stuck_minutes while it stays stuck
+    - a strategy runs once per batch: one reannounce call and one preference toggle
+      for the whole DHT nudge; replacements go torrent by torrent (delete, then add)
+    """
+
+    def __init__(self, cfg: AppConfig, qb: QBClient, cache: TorrentCache, db: Optional[DB] = None,
+                 backups: Optional[BackupIndex] = None):
+        self.cfg = cfg
+        self.qb = qb
+        self.cache = cache
+        self.db = db
+        self.backups = backups
+        # hash -> [first_seen_ts, attempts, last_try_ts]
+        self.seen: Dict[str, List[Any]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._rev: Optional[int] = None
+        self._lock = asyncio.Lock()  # one strategy call at a time (scan or manual run)
+        self._task: Optional[asyncio.Task] = None
+        self._restore: Optional[asyncio.Task] = None
+
+    # ---------- tracking ----------
+    def load(self) -> None:
+        if self.db is not None:
+            self.seen = {h: list(v) for h, v in self.db.meta_seen().items()}
+        if self.backups is not None:
+            self.backups.load()
+
+    def _diff(self, now: int) -> None:
+        full, torrents, removed = self.cache.snapshot(self._rev)
+        self._rev = self.cache.rev
+        new: List[str] = []
+        gone: List[str] = []
+        if full:
+            waiting = {t["hash"] for t in torrents if waiting_for_metadata(t)}
+            gone = [h for h in self.seen if h not in waiting]
+            new = [h for h in waiting if h not in self.seen]
+        else:
+            for t in torrents:
+                h = t["hash"]
+                if waiting_for_metadata(t):
+                    if h not in self.seen:
+                        new.append(h)
+                elif h in self.seen:
+                    gone.append(h)
+            gone += [h for h in removed if h in self.seen]
+        for h in gone:
+            del self.seen[h]
+        for h in new:
+            self.seen[h] = [now, 0, None]
+        if self.db is not None:
+            if new:
+                self.db.meta_seen_add([(h, now) for h in new])
+            if gone:
+                self.db.meta_seen_drop(gone)
+
+    def _tried(self, hashes: List[str], attempts: int, now: int) -> None:
+        hashes = [h for h in hashes if h in self.seen]
+        for h in hashes:
+            self.seen[h][1] = max(self.seen[h][1], attempts)
+            self.seen[h][2] = now
+        if self.db is not None and hashes:
+            self.db.meta_seen_tried(hashes, attempts, now)
+
+    def due(self, now: int) -> Dict[str, List[str]]:
+        """Stuck hashes by the strategy they get next, longest stuck first."""
+        stuck_after = self.cfg.stuck_minutes * 60
+        out: Dict[str, List[str]] = {}
+        for h, (first, attempts, last) in sorted(self.seen.items(), key=lambda kv: kv[1][0]):
+            if attempts >= len(STRATEGIES):
+                continue  # everything tried
+            if now - (last if last is not None else first) < stuck_after:
+                continue
+            out.setdefault(STRATEGIES[attempts], []).append(h)
+        return out
+
+    async def scan_once(self) -> Dict[str, List[str]]:
+        """Diff the cache against meta_seen and apply whatever is due. Returns what ran."""
+        now = int(time.time())
+        self._diff(now)
+        ran: Dict[str, List[str]] = {}
+        for strategy, hashes in self.due(now).items():
+            hashes = hashes[: max(1, self.cfg.metafix_batch)]
+            torrents = [t for t in (self.cache.get(h) for h in hashes) if t is not None]
+            try:
+                acted = await self.apply(strategy, torrents)
+            except Exception as e:
+                await broker.publish("state", {
+                    "kind": "metafix", "strategy": strategy, "hashes": hashes,
+                    "message": f"{strategy} failed: {e}", "level": "warn",
+                })
+                self._tried(hashes, STRATEGIES.index(strategy), now)  # same step again after stuck_minutes
+                continue
+            self._tried(hashes, STRATEGIES.index(strategy) + 1, now)
+            ran[strategy] = acted
+            await broker.publish("state", {
+                "kind": "metafix", "strategy": strategy, "hashes": acted,
+                "message": f"{strategy}: {len(acted)} torrent(s) stuck without metadata",
+            })
+        return ran
+
+    # ---------- strategies ----------
+    async def apply(self, strategy: str, torrents: List[Dict[str, Any]]) -> List[str]:
+        """Run one strategy on a batch of torrents; returns the hashes it acted on."""
+        hashes = [t["hash"] for t in torrents]
+        if not hashes:
+            return []
+        async with self._lock:
+            if strategy == REANNOUNCE:
+                await self.qb.reannounce(hashes)
+                return hashes
+            if strategy == DHT_NUDGE:
+                await self._nudge(hashes)
+                return hashes
+            if strategy == REPLACE:
+                return await self._replace(torrents)
+        raise ValueError(f"unknown strategy {strategy!r}")
+
+    async def _nudge(self, hashes: List[str]) -> None:
+        prefs = await self.qb.get_preferences()
+        before = {k: prefs.get(k) for k in NUDGE_PREFS}
+        if before["dht"]:
+            await self.qb.set_preferences({"dht": False})
+        await self.qb.set_preferences({k: True for k in NUDGE_PREFS})
+        await self.qb.reannounce(hashes)
+        off = {k: False for k, v in before.items() if v is False}
+        if off and (self._restore is None or self._restore.done()):
+            # the user had these off: give the lookups a while, then put them back
+            self._restore = asyncio.create_task(self._restore_prefs(off))
+
+    async def _restore_prefs(self, prefs: Dict[str, Any]) -> None:
+        try:
+            await asyncio.sleep(self.cfg.metafix_settle_sec)
+        finally:
+            await self.qb.set_preferences(prefs)
+
+    def backup_for(self, h: str) -> Optional[str]:
+        """Backed-up .torrent of `h`, if there is one."""
+        if self.backups is not None:
+            return self.backups.lookup(h)
+        for name in (f"{h}.torrent", f"{h.upper()}.torrent"):
+            path = os.path.join(self.cfg.backup_torrent_dir, name)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    async def _replace(self, torrents: List[Dict[str, Any]]) -> List[str]:
+        """Drop the magnet (keeping data) and re-add it from its backed-up .torrent."""
+        if self.backups is not None:
+            await self.backups.refresh()  # only parses files added since the last one
+        found = [(t, p) for t, p in ((t, self.backup_for(t["hash"])) for t in torrents) if p is not None]
+        replaced: List[str] = []
+        for t, path in found:
+            # one at a time, so a failed add only ever costs that one torrent
+            h = t["hash"]
+            try:
+                if not await asyncio.to_thread(os.access, path, os.R_OK):
+                    raise OSError(f"cannot read {path}")
+                await self.qb.delete([h], delete_files=False)
+                answer = await self.qb.add_torrent(
+                    path, t.get("save_path", ""), paused=False,
+                    category=t.get("category") or None, tags=t.get("tags") or None,
+                )
+                if answer != "Ok.":
+                    raise RuntimeError(f"qBittorrent rejected {os.path.basename(path)}: {answer}")
+            except Exception as e:
+                await broker.publish("state", {
+                    "kind": "metafix", "strategy": REPLACE, "hash": h,
+                    "message": f"replace failed: {e}", "level": "error",
+                })
+                continue
+            replaced.append(h)
+        return replaced
+
+    # ---------- manual runs ----------
+    def _track(self, task_id: str, hashes: List[str], state: str, message: Optional[str] = None):
+        if self.db is not None and hashes:
+            self.db.set_item_state(task_id, hashes, state, message)
+
+    def _status(self, task_id: str, status: str):
+        if self.db is not None:
+            self.db.set_task_status(task_id, status)
+
+    def enqueue(self, task_id: str, hashes: List[str], strategies: Optional[List[str]] = None, dry_run: bool = False):
+        """Persist a fix-metadata task and schedule it."""
+        if self.db is not None:
+            self.db.create_task(task_id, "fix-metadata", {
+                "hashes": hashes, "strategies": strategies, "dry_run": dry_run,
+            })
+        self._track(task_id, hashes, ITEM_QUEUED)
+        t = asyncio.create_task(self.fix(task_id, hashes, strategies, dry_run))
+        self.tasks[task_id] = t
+        return t
+
+    def cancel(self, task_id: str) -> bool:
+        t = self.tasks.get(task_id)
+        if t is None or t.done():
+            return False
+        t.cancel()
+        return True
+
+    async def _waiting(self, hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {t["hash"]: t for t in await self.qb.list_torrents(hashes) if waiting_for_metadata(t)}
+
+    async def fix(self, task_id: str, hashes: List[str], strategies: Optional[List[str]] = None, dry_run: bool = False):
+        """
+        Apply `strategies` in order to those of `hashes` still without metadata,
+        giving each metafix_settle_sec to work before escalating.
+        """
+        strategies = list(strategies or STRATEGIES)
+        try:
+            await self._fix(task_id, hashes, strategies, dry_run)
+        except asyncio.CancelledError:
+            self._status(task_id, "canceled")
+            if self.db is not None:
+                self.db.cancel_items(task_id, (ITEM_DONE, ITEM_ERROR), ITEM_CANCELED)
+            await broker.publish("done", {"taskId": task_id, "success": False, "canceled": True})
+            raise
+
+    async def _fix(self, task_id: str, hashes: List[str], strategies: List[str], dry_run: bool):
+        self._status(task_id, "running")
+        try:
+            pending = await self._waiting(hashes)
+        except Exception as e:
+            await broker.publish("state", {"taskId": task_id, "message": f"list torrents failed: {e}", "level": "error"})
+            self._status(task_id, "error")
+            await broker.publish("done", {"taskId": task_id, "success": False})
+            return
+        self._track(task_id, [h for h in hashes if h not in pending], ITEM_DONE, "has metadata")
+        if dry_run:
+            msg = f"dry-run: would try {', '.join(strategies)}"
+            await broker.publish("state", {"taskId": task_id, "hashes": list(pending), "message": f"{msg} on {len(pending)} torrent(s)"})
+            self._track(task_id, list(pending), ITEM_DONE, msg)
+            self._status(task_id, "done")
+            await broker.publish("done", {"taskId": task_id, "success": True})
+            return
+
+        failed: List[str] = []
+        for strategy in strategies:
+            if not pending:
+                break
+            hs = list(pending)
+            await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"{strategy}: {len(hs)} torrent(s)"})
+            self._track(task_id, hs, strategy)
+            try:
+                await self.apply(strategy, list(pending.values()))
+            except Exception as e:
+                await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"{strategy} failed: {e}", "level": "warn"})
+            self._tried(hs, STRATEGIES.index(strategy) + 1, int(time.time()))
+            await asyncio.sleep(self.cfg.metafix_settle_sec)
+            try:
+                present = {t["hash"]: t for t in await self.qb.list_torrents(hs)}
+            except Exception:
+                present = pending
+            still = {h: t for h, t in present.items() if waiting_for_metadata(t)}
+            # gone from qB: a replace that was deleted but couldn't be added back
+            gone = [h for h in hs if h not in present]
+            self._track(task_id, gone, ITEM_ERROR, f"no longer in qBittorrent after {strategy}")
+            failed += gone
+            self._track(task_id, [h for h in present if h not in still], ITEM_DONE, f"fixed by {strategy}")
+            pending = still
+
+        self._track(task_id, list(pending), ITEM_ERROR, "still no metadata")
+        self._status(task_id, "done")
+        await broker.publish("done", {"taskId": task_id, "success": not pending and not failed})
+
+    # ---------- background ----------
+    async def _run(self) -> None:
+        if self.backups is not None:
+            try:
+                await self.backups.refresh()  # build/catch up the index before it's needed
+            except Exception:
+                pass
+        while True:
+            try:
+                await self.cache.ensure_ready()
+                await self.scan_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # qB unreachable: try again next round
+            await asyncio.sleep(self.cfg.metafix_interval_sec)
+
+    def start(self) -> None:
+        self.load()
+        if self.db is not None:
+            # a restart interrupted these: run them again
+            for task_id, payload, _ in self.db.unfinished_tasks("fix-metadata"):
+                self.enqueue(task_id, payload.get("hashes", []), payload.get("strategies"), payload.get("dry_run", False))
+        if self._task is None and self.cfg.stuck_minutes > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        pending = [t for t in (self._task, self._restore, *self.tasks.values()) if t is not None and not t.done()]
+        for t in pending:
+            t.cancel()
+        for t in pending:
+            try:
+                await t
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
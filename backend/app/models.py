@@ -19,11 +19,17 @@ class TorrentInfo(BaseModel):
 
 class ListResponse(BaseModel):
     items: List[TorrentInfo]
+    rev: Optional[int] = None
+    full: bool = True
+    removed: List[str] = Field(default_factory=list)
+    total: Optional[int] = None        # rows matching the filters (paged requests)
+    next_cursor: Optional[str] = None  # pass as `cursor` for the next page
 
 class MigrateRequest(BaseModel):
     hashes: List[str]
     dryRun: bool = False
     deleteOld: bool = False
+    priority: int = 0  # higher runs first
 
 class FixMetaRequest(BaseModel):
     hashes: List[str]
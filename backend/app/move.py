@@ -0,0 +1,122 @@
+# ==============================
+# app/move.py
+# ==============================
+from __future__ import annotations
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from .disks import UNRAID_MNT, user_share_rest, existing_ancestor, unraid_backing
+
+# Move methods, cheapest first
+NOOP = "noop"          # source and destination are the same directory
+RENAME = "rename"      # atomic rename(2), O(1)
+HARDLINK = "hardlink"  # link every file, O(files), no data copied
+RSYNC = "rsync"        # byte copy across filesystems
+
+
+@dataclass
+class MovePlan:
+    method: str
+    src: str  # paths to operate on; on Unraid these may be /mnt/diskN paths
+    dst: str
+    reason: str
+
+
+def _same_branch_paths(src: str, dst: str, mnt: str):
+    """
+    For two /mnt/user paths, the pair of /mnt/<branch> paths to use when the source
+    lives on exactly one disk/pool and the destination share exists on that same
+    branch. shfs itself refuses rename/link across shares, the branch doesn't.
+    """
+    src_b = unraid_backing(src, mnt)
+    dst_rest = user_share_rest(dst, mnt)
+    if src_b is None or dst_rest is None or not dst_rest:
+        return None
+    branch = src_b[len(mnt) + 1:].split("/", 1)[0]
+    share = dst_rest.split("/", 1)[0]
+    if not os.path.isdir(os.path.join(mnt, branch, share)):
+        return None
+    return src_b, os.path.join(mnt, branch, dst_rest)
+
+
+def plan_move(src: str, dst: str, allow_rename: bool, mnt: str = UNRAID_MNT) -> MovePlan:
+    """
+    Pick the cheapest way to get content from directory `src` to `dst`.
+    Rename is only chosen when the caller is going to drop the source anyway.
+    """
+    s = os.path.realpath(src)
+    d = os.path.realpath(dst)
+    if s == d:
+        return MovePlan(NOOP, s, d, "source is destination")
+
+    if user_share_rest(s, mnt) is not None and user_share_rest(d, mnt) is not None:
+        pair = _same_branch_paths(s, d, mnt)
+        if pair is None:
+            return MovePlan(RSYNC, src, dst, "user share spans disks")
+        s, d = pair
+        where = f"same disk ({s[len(mnt) + 1:].split('/', 1)[0]})"
+    else:
+        try:
+            if os.stat(s).st_dev != os.stat(existing_ancestor(d)).st_dev:
+                return MovePlan(RSYNC, src, dst, "different filesystems")
+        except OSError as e:
+            return MovePlan(RSYNC, src, dst, f"stat failed: {e}")
+        where = "same filesystem"
+
+    return MovePlan(RENAME if allow_rename else HARDLINK, s, d, where)
+
+
+def content_roots(files: Iterable[str]) -> List[str]:
+    """Top-level entries (root folder or single file) a torrent owns under its save_path."""
+    return sorted({f.split("/", 1)[0] for f in files if f})
+
+
+def rename_roots(src: str, dst: str, roots: Iterable[str]) -> List[Tuple[str, str]]:
+    """
+    rename(2) each top-level entry from `src` into `dst`. Entries whose target
+    already exists are left alone (the caller links those). Returns what moved.
+    """
+    moved: List[Tuple[str, str]] = []
+    for root in roots:
+        s = os.path.join(src, root)
+        d = os.path.join(dst, root)
+        if not os.path.lexists(s) or os.path.lexists(d):
+            continue
+        os.makedirs(dst, exist_ok=True)
+        os.rename(s, d)
+        moved.append((s, d))
+    return moved
+
+
+def hardlink_files(src: str, dst: str, files: Iterable[str]) -> int:
+    """
+    Hard-link each relative path in `files` from `src` into `dst`, creating parent
+    directories (with the source's metadata). Returns the number of files linked.
+    """
+    linked = 0
+    made: Dict[str, str] = {}
+    for rel in files:
+        s = os.path.join(src, rel)
+        d = os.path.join(dst, rel)
+        if not os.path.lexists(s):
+            continue  # moved by rename_roots or not downloaded
+        parent = os.path.dirname(rel)
+        while parent and parent not in made:
+            made[parent] = os.path.join(dst, parent)
+            parent = os.path.dirname(parent)
+        os.makedirs(os.path.dirname(d), exist_ok=True)
+        if os.path.lexists(d):
+            if not os.path.islink(d) and os.path.samefile(s, d):
+                continue
+            os.unlink(d)
+        if os.path.islink(s):
+            os.symlink(os.readlink(s), d)
+        else:
+            os.link(s, d)
+            linked += 1
+    # deepest first, so creating children doesn't bump a parent's mtime afterwards
+    for rel in sorted(made, key=lambda p: p.count("/"), reverse=True):
+        shutil.copystat(os.path.join(src, rel), made[rel], follow_symlinks=False)
+    return linked
@@ -3,7 +3,11 @@
 # ==============================
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Any
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Translations memoised per direction (torrents share a handful of save_paths)
+CACHE_SIZE = 4096
 
 
 def _norm(p: str) -> str:
@@ -26,17 +30,63 @@ class MapRule:
         object.__setattr__(self, "host", _norm(self.host))
 
 
+def _parts(p: str) -> List[str]:
+    """Components of a normalised path; '/' -> [''], '/a/b' -> ['', 'a', 'b']."""
+    return [""] if p == "/" else p.split("/")
+
+
+class _Node:
+    __slots__ = ("children", "target")
+
+    def __init__(self):
+        self.children: Dict[str, _Node] = {}
+        self.target: Optional[str] = None
+
+
+class _PrefixTrie:
+    """Rule roots keyed by path component; a lookup walks the path once, whatever the rule count."""
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]]):
+        self._root = _Node()
+        for root, target in pairs:
+            node = self._root
+            for part in _parts(root):
+                node = node.children.setdefault(part, _Node())
+            if node.target is None:  # first rule for a root wins
+                node.target = target
+
+    def translate(self, path: str) -> Optional[str]:
+        parts = _parts(_norm(path))
+        node = self._root
+        best: Optional[str] = None
+        depth = 0
+        for i, part in enumerate(parts):
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.target is not None:
+                best, depth = node.target, i + 1
+        if best is None:
+            return None
+        rest = "/".join(parts[depth:])
+        if not rest:
+            return best
+        return (best if best != "/" else "") + "/" + rest
+
+
 class PathMapper:
     """
     Bi-directional path translator between container paths and host paths.
     Chooses the *longest-prefix* rule (most specific) and preserves the remainder.
+    Rules are compiled into a component trie per direction and results are memoised
+    (LRU, `cache_size` entries per direction).
     Accepts rules as:
       - dicts: {"container": "...", "host": "..."}
       - MapRule instances
       - objects with .container and .host attributes (e.g., your PathMapping)
     """
 
-    def __init__(self, rules: Iterable[Any]):
+    def __init__(self, rules: Iterable[Any], cache_size: int = CACHE_SIZE):
         parsed: List[MapRule] = []
         for r in rules:
             if isinstance(r, MapRule):
@@ -50,48 +100,21 @@ class PathMapper:
                 except Exception as e:
                     raise TypeError(f"Unsupported rule type {type(r)!r}: {e}")
 
-        # sort by descending container/host length so more specific wins
-        self._by_container = sorted(parsed, key=lambda r: len(r.container), reverse=True)
-        self._by_host = sorted(parsed, key=lambda r: len(r.host), reverse=True)
-
-    # ---------- helpers ----------
-    @staticmethod
-    def _under(path: str, root: str) -> bool:
-        p = _norm(path)
-        r = _norm(root)
-        return p == r or p.startswith(r + "/")
-
-    @staticmethod
-    def _join(root: str, rest: str) -> str:
-        root = _norm(root)
-        if not rest or rest == "/":
-            return root
-        if rest.startswith("/"):
-            rest = rest[1:]
-        return root + "/" + rest
-
-    @staticmethod
-    def _rest(path: str, root: str) -> str:
-        p = _norm(path)
-        r = _norm(root)
-        if p == r:
-            return ""
-        assert p.startswith(r + "/"), (p, r)
-        return p[len(r) + 1 :]
+        self.rules = parsed
+        self._to_host = lru_cache(maxsize=cache_size)(_PrefixTrie((r.container, r.host) for r in parsed).translate)
+        self._to_container = lru_cache(maxsize=cache_size)(_PrefixTrie((r.host, r.container) for r in parsed).translate)
 
     # ---------- public API ----------
     def container_to_host(self, container_path: str) -> Optional[str]:
-        p = _norm(container_path)
-        for rule in self._by_container:
-            if self._under(p, rule.container):
-                rest = self._rest(p, rule.container) if p != rule.container else ""
-                return self._join(rule.host, rest)
-        return None
+        return self._to_host(container_path)
 
     def host_to_container(self, host_path: str) -> Optional[str]:
-        p = _norm(host_path)
-        for rule in self._by_host:
-            if self._under(p, rule.host):
-                rest = self._rest(p, rule.host) if p != rule.host else ""
-                return self._join(rule.container, rest)
-        return None
\ No newline at end of file
+        return self._to_container(host_path)
+
+    def translate_many(self, paths: Iterable[str], to_host: bool = True) -> List[Optional[str]]:
+        """Translate a batch of paths (container -> host, or host -> container)."""
+        fn = self._to_host if to_host else self._to_container
+        return [fn(p) for p in paths]
+
+    def cache_info(self) -> Dict[str, Any]:
+        return {"to_host": self._to_host.cache_info()._asdict(), "to_container": self._to_container.cache_info()._asdict()}
@@ -0,0 +1,97 @@
+# ==============================
+# app/placement.py
+# ==============================
+from __future__ import annotations
+import re
+from fnmatch import translate
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import PlacementRule
+
+# (save_path, category, tags) -> target save_path, or None when already in place
+_Key = Tuple[str, str, frozenset]
+
+
+def _strip(p: str) -> str:
+    return p.rstrip("/") or "/"
+
+
+def _tags(raw: Any) -> frozenset:
+    if isinstance(raw, (list, tuple, set, frozenset)):
+        return frozenset(t.strip() for t in raw if t and t.strip())
+    return frozenset(t.strip() for t in (raw or "").split(",") if t.strip())
+
+
+class Placement:
+    """
+    Compiled misplacement rules (app.config.PlacementRule), evaluated in order.
+    Every rule becomes a plain predicate + target function once; classify_many()
+    evaluates each distinct (save_path, category, tags) only once, so a list of
+    thousands of torrents costs about as many rule checks as it has distinct folders.
+    """
+
+    def __init__(self, rules: Iterable[PlacementRule]):
+        self.rules = list(rules)
+        self._compiled: List[Tuple[Callable[[str, str, frozenset], bool], Callable[[str], str], bool]] = [
+            self._compile(r) for r in self.rules
+        ]
+
+    @staticmethod
+    def _compile(rule: PlacementRule):
+        target = rule.target
+        if rule.kind == "prefix":
+            root = _strip(rule.pattern)
+            pre = root if root == "/" else root + "/"
+
+            def match(sp: str, cat: str, tags: frozenset) -> bool:
+                return sp == root or sp.startswith(pre)
+
+            base = "" if target == "/" else target
+
+            def dest(sp: str) -> str:
+                rest = sp[len(root):].lstrip("/")
+                return f"{base}/{rest}" if rest else target
+        else:
+            if rule.kind == "glob":
+                rx = re.compile(translate(_strip(rule.pattern)))
+
+                def match(sp: str, cat: str, tags: frozenset) -> bool:
+                    return rx.match(sp) is not None
+            elif rule.kind == "category":
+                def match(sp: str, cat: str, tags: frozenset) -> bool:
+                    return cat == rule.pattern
+            else:
+                def match(sp: str, cat: str, tags: frozenset) -> bool:
+                    return rule.pattern in tags
+
+            def dest(sp: str) -> str:
+                return target
+        return match, dest, target is not None
+
+    def _evaluate(self, sp: str, category: str, tags: frozenset) -> Optional[str]:
+        for match, dest, moves in self._compiled:
+            if match(sp, category, tags):
+                if not moves:
+                    return None
+                d = dest(sp)
+                return None if _strip(d) == sp else d
+        return None
+
+    # ---------- public API ----------
+    def target(self, save_path: str, category: Optional[str] = None, tags: Any = "") -> Optional[str]:
+        """Where a torrent belongs, or None when it is already in place."""
+        return self._evaluate(_strip(save_path or ""), category or "", _tags(tags))
+
+    def target_of(self, t: Dict[str, Any]) -> Optional[str]:
+        return self.target(t.get("save_path") or "", t.get("category"), t.get("tags"))
+
+    def classify_many(self, torrents: Iterable[Dict[str, Any]]) -> List[Optional[str]]:
+        """target_of() for every torrent in one pass, memoised per distinct key."""
+        seen: Dict[_Key, Optional[str]] = {}
+        out: List[Optional[str]] = []
+        for t in torrents:
+            key = (_strip(t.get("save_path") or ""), t.get("category") or "", _tags(t.get("tags")))
+            if key not in seen:
+                seen[key] = self._evaluate(*key)
+            out.append(seen[key])
+        return out
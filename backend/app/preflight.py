@@ -0,0 +1,107 @@
+# ==============================
+# app/preflight.py
+# ==============================
+from __future__ import annotations
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .disks import disk_key, existing_ancestor, unraid_backing
+
+# Assumed copy rate for a disk we have no history for (bytes/s)
+DEFAULT_RATE = 100 * 1024 * 1024
+
+
+def statvfs_free(path: str) -> int:
+    """Bytes an unprivileged writer may still use on the filesystem holding `path`."""
+    st = os.statvfs(existing_ancestor(path))
+    return st.f_bavail * st.f_frsize
+
+
+@dataclass
+class PlanJob:
+    key: str
+    dst: str           # destination (host path)
+    size: int          # bytes the job would write
+    copies: bool       # False for rename/hardlink/noop: no space needed
+    hashes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class CapacityPlan:
+    accepted: List[str]            # job keys, in the order to run them
+    rejected: Dict[str, str]       # job key -> reason
+    disks: List[Dict[str, Any]]
+    eta: int                       # seconds; disks copy in parallel, the slowest decides
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "accepted": len(self.accepted),
+            "rejected": len(self.rejected),
+            "bytes": sum(d["needed"] for d in self.disks),
+            "eta": self.eta,
+            "disks": self.disks,
+        }
+
+
+def plan_capacity(
+    jobs: List[PlanJob],
+    reserve: int,
+    rates: Dict[str, float],
+    free: Callable[[str], int] = statvfs_free,
+    key: Callable[[str], str] = disk_key,
+    backing: Callable[[str], Optional[str]] = unraid_backing,
+) -> CapacityPlan:
+    """
+    Fit copy jobs onto their destination disks before anything is paused.
+    Per disk, jobs are taken smallest first while they fit in free space minus
+    `reserve`; the rest are rejected. Rename/link jobs always fit and go first.
+    Free space is read on the disk backing a /mnt/user destination: statvfs on
+    the share itself reports the pool, not the disk the job will fill.
+    The ETA uses each disk's historical rate (`rates`, bytes/s) or DEFAULT_RATE;
+    disks copy in parallel, so the slowest disk decides.
+    """
+    by_disk: Dict[str, List[PlanJob]] = {}
+    paths: Dict[str, str] = {}
+    free_jobs: List[str] = []
+    for j in jobs:
+        if not j.copies:
+            free_jobs.append(j.key)
+            continue
+        try:
+            k = key(j.dst)
+        except OSError:
+            k = j.dst
+        by_disk.setdefault(k, []).append(j)
+        if k not in paths:
+            try:
+                paths[k] = backing(j.dst) or j.dst
+            except OSError:
+                paths[k] = j.dst
+
+    accepted = list(free_jobs)
+    rejected: Dict[str, str] = {}
+    disks: List[Dict[str, Any]] = []
+    eta = 0
+    for k, group in by_disk.items():
+        try:
+            avail: Optional[int] = free(paths[k])
+        except OSError:
+            avail = None  # can't tell; don't block the batch on it
+        budget = None if avail is None else max(0, avail - reserve)
+        needed = 0
+        for j in sorted(group, key=lambda j: j.size):
+            if budget is not None and needed + j.size > budget:
+                rejected[j.key] = f"not enough space on {k}: need {j.size}, {budget - needed} left"
+                continue
+            needed += j.size
+            accepted.append(j.key)
+        rate = rates.get(k) or DEFAULT_RATE
+        disk_eta = int(needed / rate)
+        eta = max(eta, disk_eta)
+        disks.append({
+            "disk": k, "path": paths[k], "free": avail, "needed": needed,
+            "rejected": sum(1 for j in group if j.key in rejected),
+            "rate": int(rate), "eta": disk_eta,
+        })
+    return CapacityPlan(accepted, rejected, disks, eta)
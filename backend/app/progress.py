@@ -0,0 +1,97 @@
+# ==============================
+# app/progress.py
+# ==============================
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+Publish = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if abs(n) < 1024 or unit == "TiB":
+            return f"{n:.1f}{unit}" if unit != "B" else f"{int(n)}B"
+        n /= 1024
+    return f"{n:.1f}TiB"
+
+
+class ProgressAggregator:
+    """
+    Whole-task progress over several concurrent copy jobs.
+    Jobs report as often as they like; at most one "progress" event per task is
+    published every `interval` seconds, carrying the latest values (latest wins).
+    """
+
+    def __init__(self, task_id: str, publish: Publish, interval: float = 0.5):
+        self.task_id = task_id
+        self._publish = publish
+        self._interval = interval
+        self._total: Dict[str, int] = {}
+        self._done: Dict[str, int] = {}
+        self._rate: Dict[str, float] = {}
+        self._started = time.monotonic()
+        self._dirty = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- job reporting ----------
+    def add_job(self, key: str, total_bytes: int) -> None:
+        self._total[key] = max(0, int(total_bytes))
+        self._done.setdefault(key, 0)
+        self._dirty.set()
+
+    def update(self, key: str, done_bytes: int, rate: float = 0.0) -> None:
+        total = self._total.get(key)
+        self._done[key] = min(done_bytes, total) if total else done_bytes
+        self._rate[key] = rate
+        self._dirty.set()
+
+    def finish(self, key: str) -> None:
+        self._done[key] = self._total.get(key, self._done.get(key, 0))
+        self._rate.pop(key, None)
+        self._dirty.set()
+
+    # ---------- aggregate ----------
+    def snapshot(self) -> Dict[str, Any]:
+        total = sum(self._total.values())
+        done = sum(self._done.values())
+        rate = sum(self._rate.values())
+        if rate <= 0:
+            elapsed = time.monotonic() - self._started
+            rate = done / elapsed if elapsed > 0 else 0.0
+        eta = int((total - done) / rate) if rate > 0 and total > done else 0
+        pct = round(100.0 * done / total, 1) if total else 0.0
+        return {
+            "taskId": self.task_id,
+            "bytes": done,
+            "total": total,
+            "percent": pct,
+            "rate": int(rate),
+            "eta": eta,
+            "jobs": {k: self._done.get(k, 0) for k in self._total},
+            "line": f"{pct:5.1f}%  {_fmt_bytes(done)} / {_fmt_bytes(total)}  {_fmt_bytes(rate)}/s  eta {eta}s",
+        }
+
+    # ---------- emission ----------
+    async def _run(self) -> None:
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            await self._publish("progress", self.snapshot())
+            await asyncio.sleep(self._interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the emitter and publish the final state once."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._publish("progress", self.snapshot())
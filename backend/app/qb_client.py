@@ -1,73 +1,170 @@
 # ==============================
 # app/qb_client.py
 # ==============================
+import asyncio
+import json
+import os
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from .config import AppConfig
 
+# Per-endpoint timeouts (seconds); anything not listed uses DEFAULT_TIMEOUT.
+DEFAULT_TIMEOUT = 10.0
+ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    '/api/v2/auth/login': 10.0,
+    '/api/v2/torrents/info': 30.0,
+    '/api/v2/sync/maindata': 30.0,
+    '/api/v2/torrents/add': 60.0,
+    '/api/v2/torrents/pause': 5.0,
+    '/api/v2/torrents/resume': 5.0,
+    '/api/v2/torrents/setLocation': 5.0,
+    '/api/v2/torrents/recheck': 5.0,
+    '/api/v2/torrents/export': 30.0,
+}
+
+# Max hashes per mutation call, keeps 'hashes=a|b|c' well under request size limits.
+HASH_CHUNK = 100
+
+
 class QBClient:
-    def __init__(self, cfg: AppConfig):
+    """
+    Async qBittorrent WebAPI client on a pooled httpx.AsyncClient.
+    - logs in lazily and again when qB answers 403 (expired SID); callers that
+      hit the same expired session wait for one shared login
+    - identical GETs that are already in flight share one upstream request
+    """
+
+    def __init__(self, cfg: AppConfig, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.cfg = cfg
-        self._client = httpx.Client(base_url=str(cfg.qb_url), timeout=30.0)
+        limits = httpx.Limits(
+            max_connections=cfg.qb_max_connections,
+            max_keepalive_connections=cfg.qb_max_connections,
+        )
+        self._client = httpx.AsyncClient(
+            base_url=str(cfg.qb_url), timeout=DEFAULT_TIMEOUT, limits=limits, transport=transport,
+        )
         self._authed = False
+        self._session = 0  # bumped by every successful login
+        self._login_lock = asyncio.Lock()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
 
-    def login(self):
-        if self._authed:
-            return
-        r = self._client.post('/api/v2/auth/login', data={'username': self.cfg.qb_username, 'password': self.cfg.qb_password})
-        r.raise_for_status()
-        if r.text != 'Ok.':
-            raise RuntimeError('qBittorrent login failed')
-        self._authed = True
+    async def aclose(self):
+        await self._client.aclose()
 
-    def _get(self, path: str, **kwargs):
-        self.login()
-        r = self._client.get(path, **kwargs)
-        r.raise_for_status()
-        return r
+    async def login(self, expired: Optional[int] = None):
+        """
+        Log in unless already logged in. `expired` is the session a caller saw a 403
+        on: only that session is replaced, so concurrent 403s share one login.
+        """
+        async with self._login_lock:
+            if self._authed and (expired is None or expired != self._session):
+                return
+            r = await self._client.post(
+                '/api/v2/auth/login',
+                data={'username': self.cfg.qb_username, 'password': self.cfg.qb_password},
+                timeout=ENDPOINT_TIMEOUTS['/api/v2/auth/login'],
+            )
+            r.raise_for_status()
+            if r.text != 'Ok.':
+                raise RuntimeError('qBittorrent login failed')
+            self._authed = True
+            self._session += 1
 
-    def _post(self, path: str, **kwargs):
-        self.login()
-        r = self._client.post(path, **kwargs)
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        await self.login()
+        session = self._session
+        timeout = ENDPOINT_TIMEOUTS.get(path, DEFAULT_TIMEOUT)
+        r = await self._client.request(method, path, timeout=timeout, **kwargs)
+        if r.status_code == 403:
+            # SID expired or qB restarted: log in again (once for all callers) and retry once
+            await self.login(expired=session)
+            r = await self._client.request(method, path, timeout=timeout, **kwargs)
         r.raise_for_status()
         return r
 
-    def list_torrents(self) -> List[Dict[str, Any]]:
-        r = self._get('/api/v2/torrents/info', params={'filter': 'all'})
+    async def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        key = (path, tuple(sorted((params or {}).items())))
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._request('GET', path, params=params))
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: one caller going away must not cancel the shared request
+        return await asyncio.shield(fut)
+
+    async def _post(self, path: str, **kwargs) -> httpx.Response:
+        return await self._request('POST', path, **kwargs)
+
+    async def list_torrents(self, hashes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        if not hashes:
+            r = await self._get('/api/v2/torrents/info', params={'filter': 'all'})
+            return r.json()
+        # qB only returns the requested subset, so a batch never pulls the whole client
+        out: List[Dict[str, Any]] = []
+        for i in range(0, len(hashes), HASH_CHUNK):
+            params = {'filter': 'all', 'hashes': '|'.join(hashes[i:i + HASH_CHUNK])}
+            out.extend((await self._get('/api/v2/torrents/info', params=params)).json())
+        return out
+
+    async def sync_maindata(self, rid: int = 0) -> Dict[str, Any]:
+        r = await self._get('/api/v2/sync/maindata', params={'rid': rid})
         return r.json()
 
-    def pause(self, hashes: List[str]):
-        self._post('/api/v2/torrents/pause', params={'hashes': '|'.join(hashes)})
+    async def torrent_files(self, h: str) -> List[Dict[str, Any]]:
+        """Files of one torrent; 'name' is relative to its save_path."""
+        r = await self._get('/api/v2/torrents/files', params={'hash': h})
+        return r.json()
 
-    def resume(self, hashes: List[str]):
-        self._post('/api/v2/torrents/resume', params={'hashes': '|'.join(hashes)})
+    async def _post_hashes(self, path: str, hashes: List[str], **data: str):
+        """One form POST per HASH_CHUNK hashes (qB accepts 'a|b|c')."""
+        for i in range(0, len(hashes), HASH_CHUNK):
+            await self._post(path, data={'hashes': '|'.join(hashes[i:i + HASH_CHUNK]), **data})
 
-    def set_location(self, hashes: List[str], location: str):
-        self._post('/api/v2/torrents/setLocation', data={'hashes': '|'.join(hashes), 'location': location})
+    async def pause(self, hashes: List[str]):
+        await self._post_hashes('/api/v2/torrents/pause', hashes)
 
-    def recheck(self, hashes: List[str]):
-        self._post('/api/v2/torrents/recheck', params={'hashes': '|'.join(hashes)})
+    async def resume(self, hashes: List[str]):
+        await self._post_hashes('/api/v2/torrents/resume', hashes)
 
-    def reannounce(self, hashes: List[str]):
-        self._post('/api/v2/torrents/reannounce', params={'hashes': '|'.join(hashes)})
+    async def set_location(self, hashes: List[str], location: str):
+        await self._post_hashes('/api/v2/torrents/setLocation', hashes, location=location)
 
-    def delete(self, hashes: List[str], delete_files: bool = False):
-        self._post('/api/v2/torrents/delete', params={'hashes': '|'.join(hashes), 'deleteFiles': 'true' if delete_files else 'false'})
+    async def recheck(self, hashes: List[str]):
+        await self._post_hashes('/api/v2/torrents/recheck', hashes)
 
-    def add_torrent(self, torrent_path: str, save_path: str, paused: bool = True, autoTMM: bool = False, root_folder: Optional[bool] = None):
+    async def reannounce(self, hashes: List[str]):
+        await self._post_hashes('/api/v2/torrents/reannounce', hashes)
+
+    async def delete(self, hashes: List[str], delete_files: bool = False):
+        await self._post_hashes('/api/v2/torrents/delete', hashes, deleteFiles='true' if delete_files else 'false')
+
+    async def add_torrent(self, torrent_path: str, save_path: str, paused: bool = True, autoTMM: bool = False, root_folder: Optional[bool] = None,
+                          category: Optional[str] = None, tags: Optional[str] = None):
         data = {
             'paused': 'true' if paused else 'false',
             'autoTMM': 'true' if autoTMM else 'false',
             'savepath': save_path,
         }
+        if category:
+            data['category'] = category
+        if tags:
+            data['tags'] = tags
         if root_folder is not None:
             data['root_folder'] = 'true' if root_folder else 'false'
-        files = {'torrents': (torrent_path.split('/')[-1], open(torrent_path, 'rb'), 'application/x-bittorrent')}
-        r = self._post('/api/v2/torrents/add', data=data, files=files)
+        with open(torrent_path, 'rb') as f:
+            content = f.read()
+        files = {'torrents': (os.path.basename(torrent_path), content, 'application/x-bittorrent')}
+        r = await self._post('/api/v2/torrents/add', data=data, files=files)
         return r.text
 
-    def get_preferences(self) -> Dict[str, Any]:
-        return self._get('/api/v2/app/preferences').json()
+    async def export_torrent(self, h: str) -> bytes:
+        """The .torrent file of `h` (qBittorrent 4.5+)."""
+        r = await self._get('/api/v2/torrents/export', params={'hash': h})
+        return r.content
+
+    async def get_preferences(self) -> Dict[str, Any]:
+        return (await self._get('/api/v2/app/preferences')).json()
 
-    def set_preferences(self, prefs: Dict[str, Any]):
-        self._post('/api/v2/app/setPreferences', json=prefs)
+    async def set_preferences(self, prefs: Dict[str, Any]):
+        # qB reads the changes from a form field named "json", not from a JSON body
+        await self._post('/api/v2/app/setPreferences', data={'json': json.dumps(prefs)})
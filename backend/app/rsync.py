@@ -3,30 +3,131 @@
 # ==============================
 import asyncio
 import os
+import re
 import shlex
 from typing import AsyncIterator, List, Optional
 
+# --info=progress2 lines look like:
+#   "      1,234,567  10%    2.34MB/s    0:00:12 (xfr#1, to-chk=3/10)"
+# (ir-chk instead of to-chk while the incremental file list is still being built)
+_PROGRESS2 = re.compile(
+    r"^\s*(?P<bytes>[\d,.]+)\s+(?P<pct>\d+)%\s+(?P<rate>[\d,.]+)(?P<unit>[kKMGT]?B)/s"
+    r"\s+(?P<eta>\d+:\d{2}:\d{2})"
+    r"(?:\s+\(xfr#(?P<xfr>\d+),\s+(?:to|ir)-chk=(?P<left>\d+)/(?P<total>\d+)\))?"
+)
+_UNITS = {"B": 1, "kB": 1024, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+
 class RsyncProgress:
+    """One rsync output line; progress2 lines are parsed into numeric fields."""
+
     def __init__(self, line: str):
         self.raw = line
-        # --info=progress2 lines often look like:
-        # "       1,234,567  10%    2.34MB/s    0:00:12 (xfr#1, to-chk=3/10)"
-        # We'll forward raw; frontend can parse basic numbers. Keep lightweight here.
+        self.is_progress = False
+        self.bytes = 0
+        self.percent = 0
+        self.rate = 0.0  # bytes/s
+        self.eta = 0  # seconds
+        self.xfr: Optional[int] = None
+        self.to_check: Optional[int] = None
+        self.total_files: Optional[int] = None
+        m = _PROGRESS2.match(line)
+        if m:
+            self.is_progress = True
+            self.bytes = int(m["bytes"].replace(",", "").replace(".", ""))
+            self.percent = int(m["pct"])
+            self.rate = float(m["rate"].replace(",", "")) * _UNITS.get(m["unit"], 1)
+            h, mi, se = (int(x) for x in m["eta"].split(":"))
+            self.eta = h * 3600 + mi * 60 + se
+            if m["xfr"] is not None:
+                self.xfr = int(m["xfr"])
+                self.to_check = int(m["left"])
+                self.total_files = int(m["total"])
 
-async def run_rsync(src: str, dst: str, flags: List[str], dry_run: bool = False) -> AsyncIterator[RsyncProgress]:
+async def run_rsync(
+    src: str, dst: str, flags: List[str], dry_run: bool = False, files: Optional[List[str]] = None,
+) -> AsyncIterator[RsyncProgress]:
+    """
+    Sync `src/` into `dst/`, yielding each output record as it arrives (progress2
+    redraws with carriage returns, so those are split out too). With `files` (paths relative to
+    src), only those are transferred, fed NUL-separated on stdin via --files-from.
+    If the consumer is cancelled or stops iterating, rsync is terminated.
+    """
     os.makedirs(dst, exist_ok=True)
-    cmd = ['rsync'] + flags + (["-n"] if dry_run else []) + [f"{src.rstrip('/')}/", f"{dst.rstrip('/')}/"]
-    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+    cmd = ['rsync'] + flags + (["-n"] if dry_run else [])
+    if files is not None:
+        cmd += ['--from0', '--files-from=-']
+    cmd += [f"{src.rstrip('/')}/", f"{dst.rstrip('/')}/"]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if files is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+    )
     assert proc.stdout
-    async for line in _aiter_lines(proc.stdout):
-        yield RsyncProgress(line.decode(errors='ignore').rstrip())
-    rc = await proc.wait()
+    feeder = asyncio.create_task(_feed_files(proc.stdin, files)) if files is not None else None
+    try:
+        async for rec in _aiter_records(proc.stdout):
+            yield RsyncProgress(rec.decode(errors='ignore').strip())
+        rc = await proc.wait()
+        if feeder is not None:
+            await feeder
+    finally:
+        if proc.returncode is None:
+            await _terminate(proc)
+        if feeder is not None and not feeder.done():
+            feeder.cancel()
     if rc != 0:
         raise RuntimeError(f"rsync failed rc={rc}")
 
-async def _aiter_lines(stream: asyncio.StreamReader):
+async def _terminate(proc: asyncio.subprocess.Process, grace: float = 5.0):
+    """SIGTERM, then SIGKILL if rsync hasn't exited after `grace` seconds."""
+    try:
+        proc.terminate()
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(proc.wait(), timeout=grace)
+    except asyncio.TimeoutError:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            return
+        await proc.wait()
+
+async def _feed_files(stdin: Optional[asyncio.StreamWriter], files: List[str]):
+    assert stdin
+    try:
+        stdin.write(b''.join(f.encode() + b'\0' for f in files))
+        await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        stdin.close()
+
+
+# Longest record we buffer; longer output without \r/\n is emitted in pieces.
+MAX_RECORD = 64 * 1024
+_SPLIT = re.compile(rb'[\r\n]')
+
+async def _aiter_records(stream: asyncio.StreamReader, chunk_size: int = 16 * 1024, limit: int = MAX_RECORD):
+    """
+    Yield non-empty records split on CR or LF. Reads fixed-size chunks instead of
+    readline(), so CR-only progress redraws come through immediately and a long
+    stream without newlines can't grow the buffer past `limit`.
+    """
+    buf = b''
     while True:
-        line = await stream.readline()
-        if not line:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
             break
-        yield line
\ No newline at end of file
+        buf += chunk
+        parts = _SPLIT.split(buf)
+        buf = parts.pop()
+        for part in parts:
+            if part:
+                yield part
+        while len(buf) > limit:
+            yield buf[:limit]
+            buf = buf[limit:]
+    if buf:
+        yield buf
@@ -0,0 +1,94 @@
+# ==============================
+# app/scheduler.py
+# ==============================
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Tuple
+
+# Order of queued migrations
+FIFO = "fifo"              # arrival order
+SMALL_FIRST = "small-first"  # fewest bytes first, so quick jobs don't wait behind big ones
+
+
+class PriorityGate:
+    """
+    Like asyncio.Semaphore(slots), but waiters are admitted lowest key first
+    (ties in arrival order). A waiter that is cancelled simply leaves the queue.
+    """
+
+    def __init__(self, slots: int):
+        self._free = max(1, slots)
+        self._seq = itertools.count()
+        self._waiters: List[Tuple[tuple, int, asyncio.Future]] = []
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    async def acquire(self, key: tuple = ()) -> None:
+        if self._free > 0 and not self.waiting:
+            self._free -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (key, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # slot was handed over just as we were cancelled
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+    @asynccontextmanager
+    async def slot(self, key: tuple = ()) -> AsyncIterator[None]:
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class PauseBudget:
+    """
+    Caps how many torrents are paused at once across all tasks. A batch bigger
+    than the cap is let through alone, once nothing else is paused.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.paused = 0
+        self._waiters: List[asyncio.Future] = []
+
+    def _fits(self, n: int) -> bool:
+        return self.paused == 0 or self.paused + n <= self.limit
+
+    async def acquire(self, n: int) -> None:
+        while not self._fits(n):
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            finally:
+                self._waiters.remove(fut)
+        self.paused += n
+
+    def release(self, n: int) -> None:
+        self.paused -= n
+        for fut in self._waiters:
+            if not fut.done():
+                fut.set_result(None)
+
+
+def migrate_key(order: str, priority: int, size: int) -> tuple:
+    """Higher `priority` always goes first; within a priority, `order` decides."""
+    return (-priority, size if order == SMALL_FIRST else 0)
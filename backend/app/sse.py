@@ -2,93 +2,263 @@
 # app/sse.py
 # ==============================
 import asyncio
+import itertools
 import json
 import time
-from typing import AsyncIterator, Dict, List, Optional
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import StreamingResponse
 
 from .auth import auth_guard
 
 router = APIRouter(prefix="/api/events", tags=["events"])
 
+# Events where only the newest value per task matters; a slow subscriber gets the
+# latest one instead of a backlog.
+COALESCE_EVENTS = {"progress"}
+
+
+class Subscriber:
+    """
+    One SSE client: its filters and a bounded buffer. Coalescable events replace
+    the pending one for the same (event, taskId); when the buffer is full the
+    oldest pending event is dropped (and counted) instead of cutting the client off.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        task_ids: Iterable[str] = (),
+        hashes: Iterable[str] = (),
+        events: Iterable[str] = (),
+        maxsize: int = 1000,
+    ):
+        self.id = next(self._ids)
+        self.task_ids: Set[str] = set(task_ids)
+        self.hashes: Set[str] = set(hashes)
+        self.events: Set[str] = set(events)
+        self.maxsize = maxsize
+        self._buf: "OrderedDict[object, str]" = OrderedDict()
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self.connected_ts = time.time()
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_lag = 0
+
+    def wants(self, event: str, data: Dict) -> bool:
+        if self.events and event not in self.events:
+            return False
+        if self.task_ids and data.get("taskId") not in self.task_ids:
+            return False
+        if self.hashes:
+            hs = set(data.get("hashes") or ())
+            if data.get("hash"):
+                hs.add(data["hash"])
+            if not hs & self.hashes:
+                return False
+        return True
+
+    def push(self, event: str, data: Dict, payload: str) -> None:
+        if event in COALESCE_EVENTS:
+            key: object = (event, data.get("taskId"))
+            if key in self._buf:
+                self.coalesced += 1
+                self._buf.pop(key)
+        else:
+            key = next(self._seq)
+        self._buf[key] = payload
+        while len(self._buf) > self.maxsize:
+            self._buf.popitem(last=False)
+            self.dropped += 1
+        self.max_lag = max(self.max_lag, len(self._buf))
+        self._ready.set()
+
+    async def get(self, timeout: float) -> Optional[str]:
+        """Next payload, or None if nothing arrived within `timeout` seconds."""
+        if not self._buf:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        _, payload = self._buf.popitem(last=False)
+        self.delivered += 1
+        return payload
+
+    def stats(self) -> Dict:
+        return {
+            "id": self.id,
+            "filters": {
+                "taskId": sorted(self.task_ids),
+                "hash": sorted(self.hashes),
+                "events": sorted(self.events),
+            },
+            "connectedTs": int(self.connected_ts),
+            "lag": len(self._buf),
+            "maxLag": self.max_lag,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+def _format(event: str, data: Dict, event_id: Optional[str] = None) -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return head + f"event: {event}\n" f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# (seq, event, data, payload)
+_LogEntry = Tuple[int, str, Dict, str]
+
+
 class SSEBroker:
     """
     Simple in-memory pub/sub for Server-Sent Events.
+    Each event is serialised once and only queued for subscribers whose filters match.
+    Events carry ids "<epoch>-<seq>" and the last `log_size` are kept, so a client
+    reconnecting with Last-Event-ID gets exactly what it missed. Optionally the log
+    is also written to SQLite, extending replay past the in-memory window.
     """
 
-    def __init__(self, heartbeat_sec: int = 10):
-        self._subscribers: List[asyncio.Queue] = []
+    def __init__(self, heartbeat_sec: int = 10, maxsize: int = 1000, log_size: int = 5000):
+        self._subscribers: List[Subscriber] = []
         self._heartbeat_sec = heartbeat_sec
+        self._maxsize = maxsize
+        self.epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._log: Deque[_LogEntry] = deque(maxlen=log_size)
+        self._db: Any = None
+
+    def configure(self, log_size: int) -> None:
+        self._log = deque(self._log, maxlen=max(1, log_size))
+
+    def attach_db(self, db: Any) -> None:
+        """Spill events to the `events` table of `db` (app.db.DB) for longer replay."""
+        self._db = db
 
     async def publish(self, event: str, data: Dict):
-        payload = f"event: {event}\n" f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
-        # fan out (non-blocking)
-        for q in list(self._subscribers):
-            try:
-                q.put_nowait(payload)
-            except asyncio.QueueFull:
-                # drop slow subscriber
-                try:
-                    self._subscribers.remove(q)
-                except ValueError:
-                    pass
-
-    async def _heartbeat(self, q: asyncio.Queue):
-        """
-        Periodic comment lines to keep proxies from closing idle connections.
-        """
-        while True:
-            await asyncio.sleep(self._heartbeat_sec)
-            try:
-                q.put_nowait(f": heartbeat {int(time.time())}\n\n")
-            except asyncio.QueueFull:
-                break
+        self._seq += 1
+        event_id = f"{self.epoch}-{self._seq}"
+        payload = _format(event, data, event_id)
+        self._log.append((self._seq, event, data, payload))
+        if self._db is not None:
+            self._db.log_event(self.epoch, self._seq, event, json.dumps(data, ensure_ascii=False))
+        for sub in list(self._subscribers):
+            if sub.wants(event, data):
+                sub.push(event, data, payload)
 
-    async def stream(self) -> AsyncIterator[str]:
+    def replay(self, sub: Subscriber, last_event_id: str) -> bool:
         """
-        Async generator per-subscriber.
+        Queue every logged event after `last_event_id` that `sub` wants.
+        Returns False when the gap can't be covered (other process, or too old).
         """
-        q: asyncio.Queue[str] = asyncio.Queue(maxsize=1000)
-        self._subscribers.append(q)
+        try:
+            epoch, seq_s = last_event_id.rsplit("-", 1)
+            last = int(seq_s)
+        except ValueError:
+            return False
+        if epoch != self.epoch or last > self._seq:
+            return False
+        oldest = self._log[0][0] if self._log else self._seq + 1
+        if last + 1 < oldest:
+            if self._db is None:
+                return False
+            rows = self._db.events_since(self.epoch, last, oldest)
+            if not rows or rows[0][0] != last + 1:
+                return False
+            for seq, event, data_json in rows:
+                data = json.loads(data_json)
+                if sub.wants(event, data):
+                    sub.push(event, data, _format(event, data, f"{self.epoch}-{seq}"))
+        for seq, event, data, payload in self._log:
+            if seq > last and sub.wants(event, data):
+                sub.push(event, data, payload)
+        return True
 
-        # Send an initial event so the client UI immediately shows "connected"
-        await self.publish("state", {"message": "SSE connected"})
+    def subscribe(self, **filters) -> Subscriber:
+        sub = Subscriber(maxsize=self._maxsize, **filters)
+        self._subscribers.append(sub)
+        return sub
 
-        hb_task = asyncio.create_task(self._heartbeat(q))
+    def unsubscribe(self, sub: Subscriber) -> None:
+        try:
+            self._subscribers.remove(sub)
+        except ValueError:
+            pass
+
+    def metrics(self) -> List[Dict]:
+        return [s.stats() for s in self._subscribers]
 
+    async def stream(self, sub: Subscriber, replayed: bool = True) -> AsyncIterator[str]:
+        """
+        Async generator per-subscriber. Emits a heartbeat comment when idle to keep
+        proxies from closing the connection.
+        """
+        # Send an initial event so the client UI immediately shows "connected"
+        yield _format("state", {"message": "SSE connected"})
+        if not replayed:
+            # gap can't be replayed: tell the client to resync with a full reload
+            yield _format("reset", {"message": "event history unavailable, reload"})
         try:
             while True:
-                chunk = await q.get()
-                yield chunk
+                chunk = await sub.get(self._heartbeat_sec)
+                yield chunk if chunk is not None else f": heartbeat {int(time.time())}\n\n"
         except asyncio.CancelledError:
             pass
         finally:
-            hb_task.cancel()
-            try:
-                self._subscribers.remove(q)
-            except ValueError:
-                pass
+            self.unsubscribe(sub)
 
 
 broker = SSEBroker()
 
 @router.get("/stream")
-async def stream(req: Request, user: str = Depends(auth_guard)):
+async def stream(
+    req: Request,
+    user: str = Depends(auth_guard),
+    taskId: List[str] = Query(default=[]),
+    hashes: List[str] = Query(default=[], alias="hash"),
+    events: List[str] = Query(default=[]),
+    lastEventId: Optional[str] = None,
+):
     """
     Server-Sent Events endpoint.
+    Optional filters (repeat or comma-separate): ?taskId=..&hash=..&events=state,done
+    Missed events are replayed from the Last-Event-ID header (or ?lastEventId=,
+    for clients that reconnect with a new EventSource).
     """
+    def split(values: List[str]) -> List[str]:
+        return [v for x in values for v in x.split(",") if v]
+
+    sub = broker.subscribe(task_ids=split(taskId), hashes=split(hashes), events=split(events))
+    # replay right away (no await in between), so missed and live events stay in order
+    last_id = req.headers.get("last-event-id") or lastEventId
+    replayed = broker.replay(sub, last_id) if last_id else True
+
     async def gen():
-        async for chunk in broker.stream():
-            # If client disconnects, stop streaming
-            if await req.is_disconnected():
-                break
-            yield chunk
+        try:
+            async for chunk in broker.stream(sub, replayed):
+                # If client disconnects, stop streaming
+                if await req.is_disconnected():
+                    break
+                yield chunk
+        finally:
+            broker.unsubscribe(sub)
 
     headers = {
         "Cache-Control": "no-cache",
         "Connection": "keep-alive",
         "X-Accel-Buffering": "no",  # for Nginx
     }
-    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
\ No newline at end of file
+    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
+
+
+@router.get("/metrics", dependencies=[Depends(auth_guard)])
+def metrics():
+    """Per-subscriber lag and drop counters."""
+    return {"subscribers": broker.metrics()}
@@ -4,19 +4,28 @@
 import asyncio
 import os
 import shutil
-from typing import Dict, List, Callable, Any
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from .sse import broker
+from .backup_index import BackupIndex
 from .config import AppConfig
+from .db import DB
 from .qb_client import QBClient
 from .pathmap import PathMapper
+from .placement import Placement
 from .rsync import run_rsync
-
-
-def _under(p: str, root: str) -> bool:
-    p = (p or "").rstrip("/")
-    r = (root or "").rstrip("/")
-    return p == r or p.startswith(r + "/")
+from .copier import copy_files
+from .deleter import DeleteStats, delete_files
+from .torrent_index import TorrentIndex
+from .disks import disk_key
+from .progress import ProgressAggregator, _fmt_bytes
+from .preflight import CapacityPlan, PlanJob, plan_capacity
+from .scheduler import PauseBudget, PriorityGate, migrate_key
+from .verify import MANIFEST, PIECES, compare_manifest, torrent_layout, verify_pieces
+from .move import MovePlan, NOOP, HARDLINK, RENAME, RSYNC, content_roots, hardlink_files, plan_move, rename_roots
 
 
 def _shell_join(parts: List[str]) -> str:
@@ -44,79 +53,311 @@ def _normalize_flags(flags) -> List[str]:
     return [f for f in seq if f]
 
 
-async def _qb_call_with_timeout(
-    fn: Callable[..., Any], *args, timeout: float = 5.0, **kwargs
-):
-    """
-    Run a blocking qBittorrent client call off the event loop with a timeout,
-    so a sluggish WebAPI can't block our SSE stream.
-    """
-    loop = asyncio.get_running_loop()
-    try:
-        return await asyncio.wait_for(
-            loop.run_in_executor(None, lambda: fn(*args, **kwargs)), timeout=timeout
-        )
-    except asyncio.TimeoutError:
-        raise TimeoutError(f"qB call timed out after {timeout}s")
+# Per-torrent states persisted in task_items
+ITEM_QUEUED = "queued"
+ITEM_COPYING = "copying"
+ITEM_RELOCATING = "relocating"
+ITEM_RECHECKING = "rechecking"
+ITEM_DONE = "done"
+ITEM_ERROR = "error"
+ITEM_CANCELED = "canceled"
+# reached once the data is at the destination; a resumed task doesn't copy these again
+COPIED_STATES = (ITEM_RELOCATING, ITEM_RECHECKING)
 
 
 class TaskRunner:
-    def __init__(self, cfg: AppConfig, qb: QBClient, mapper: PathMapper):
+    def __init__(self, cfg: AppConfig, qb: QBClient, mapper: PathMapper, db: Optional[DB] = None,
+                 backups: Optional[BackupIndex] = None):
         self.cfg = cfg
         self.qb = qb
         self.mapper = mapper
-        self.sem = asyncio.Semaphore(cfg.max_concurrent_migrations)
+        self.db = db
+        self.backups = backups
+        self.placement = Placement(cfg.placement_rules)
+        self.gate = PriorityGate(cfg.max_concurrent_migrations)
         self.tasks: Dict[str, asyncio.Task] = {}
+        # limits shared by all running tasks
+        self.qb_sem = asyncio.Semaphore(max(1, cfg.qb_concurrency))
+        self.copy_sem = asyncio.Semaphore(max(1, cfg.parallel_copies))
+        self.delete_sem = asyncio.Semaphore(max(1, cfg.parallel_deletes))
+        self.pauses = PauseBudget(cfg.max_paused)
+        self._disk_sems: Dict[str, asyncio.Semaphore] = {}
+        self._copying = 0  # copies in flight, deletes back off while > 0
+
+    def _disk_sem(self, key: str) -> asyncio.Semaphore:
+        sem = self._disk_sems.get(key)
+        if sem is None:
+            sem = self._disk_sems[key] = asyncio.Semaphore(max(1, self.cfg.per_disk_copies))
+        return sem
+
+    async def _qb(self, fn, *args):
+        async with self.qb_sem:
+            return await fn(*args)
 
     def create_task(self, task_id: str, coro):
         t = asyncio.create_task(coro)
         self.tasks[task_id] = t
         return t
 
-    async def migrate(self, task_id: str, hashes: List[str], dry_run: bool, delete_old: bool):
-        async with self.sem:
+    # ---------- persistence ----------
+    def _track(self, task_id: str, hashes: List[str], state: str, message: Optional[str] = None):
+        if self.db is not None and hashes:
+            self.db.set_item_state(task_id, hashes, state, message)
+
+    def _status(self, task_id: str, status: str):
+        if self.db is not None:
+            self.db.set_task_status(task_id, status)
+
+    def _fail(self, task_id: str):
+        """Task status "error"; items that hadn't finished become errors too."""
+        self._status(task_id, "error")
+        if self.db is not None:
+            self.db.cancel_items(task_id, (ITEM_DONE, ITEM_ERROR), ITEM_ERROR)
+
+    async def _flush(self):
+        if self.db is not None:
+            await self.db.flush()
+
+    def cancel(self, task_id: str) -> bool:
+        """Cancel a queued or running task; its rsync is killed and paused torrents resumed."""
+        t = self.tasks.get(task_id)
+        if t is None or t.done():
+            return False
+        t.cancel()
+        return True
+
+    def enqueue_migrate(self, task_id: str, hashes: List[str], dry_run: bool, delete_old: bool, priority: int = 0):
+        """Persist a migrate task (status queued, items queued) and schedule it."""
+        if self.db is not None:
+            self.db.create_task(task_id, "migrate", {
+                "hashes": hashes, "dryRun": dry_run, "deleteOld": delete_old, "priority": priority,
+            })
+            self.db.set_item_state(task_id, hashes, ITEM_QUEUED)
+        return self.create_task(task_id, self.migrate(task_id, hashes, dry_run, delete_old, priority=priority))
+
+    def resume_pending(self) -> List[str]:
+        """
+        Re-schedule migrate tasks a restart interrupted. Finished and failed items are
+        skipped; items whose data was already copied are only relocated.
+        """
+        if self.db is None:
+            return []
+        resumed = []
+        for task_id, payload, states in self.db.unfinished_tasks("migrate"):
+            todo = [h for h in payload.get("hashes", []) if states.get(h) not in (ITEM_DONE, ITEM_ERROR)]
+            copied = {h for h in todo if states.get(h) in COPIED_STATES}
+            self.create_task(task_id, self.migrate(
+                task_id, todo, payload.get("dryRun", False), payload.get("deleteOld", False), copied,
+                payload.get("priority", 0),
+            ))
+            resumed.append(task_id)
+        return resumed
+
+    async def migrate(
+        self, task_id: str, hashes: List[str], dry_run: bool, delete_old: bool,
+        already_copied: Optional[Set[str]] = None, priority: int = 0,
+    ):
+        try:
+            await self._migrate(task_id, hashes, dry_run, delete_old, already_copied or set(), priority)
+        except asyncio.CancelledError:
+            self._status(task_id, "canceled")
+            if self.db is not None:
+                self.db.cancel_items(task_id, (ITEM_DONE, ITEM_ERROR), ITEM_CANCELED)
+            await broker.publish("state", {"taskId": task_id, "message": "canceled", "level": "warn"})
+            await broker.publish("done", {"taskId": task_id, "success": False, "canceled": True})
+            await self._flush()
+            raise
+        except Exception as e:
+            self._fail(task_id)
+            await broker.publish("state", {"taskId": task_id, "message": f"migrate failed: {e}", "level": "error"})
+            await broker.publish("done", {"taskId": task_id, "success": False})
+            await self._flush()
+
+    async def _migrate(
+        self, task_id: str, hashes: List[str], dry_run: bool, delete_old: bool,
+        already_copied: Set[str], priority: int,
+    ):
+        # one snapshot of just the requested hashes for the whole batch; taken before
+        # queueing, its sizes decide the order (small-first)
+        index = TorrentIndex(self.qb.list_torrents)
+        try:
+            await index.load(hashes)
+        except Exception as e:
+            await broker.publish("state", {"taskId": task_id, "message": f"list torrents failed: {e}", "level": "error"})
+            self._fail(task_id)
+            await broker.publish("done", {"taskId": task_id, "success": False})
+            await self._flush()
+            return
+        size = 0
+        for h in hashes:
+            t = await index.get(h)
+            size += int((t or {}).get("size") or 0)
+
+        async with self.gate.slot(migrate_key(self.cfg.migrate_order, priority, size)):
+            self._status(task_id, "running")
             await broker.publish("state", {
                 "taskId": task_id,
                 "message": f"Starting migrate: {len(hashes)} torrents",
                 "dryRun": dry_run
             })
-            for h in hashes:
-                await self._migrate_one(task_id, h, dry_run, delete_old)
+
+            items: List[_Item] = []
+            for i, h in enumerate(hashes):
+                it = await self._plan_one(task_id, h, dry_run, index, hashes[i + 1:])
+                if it is not None:
+                    items.append(it)
+            items = await self._load_files(task_id, items)
+            for it in items:
+                it.copied = it.hash in already_copied
+
+            # torrents sharing a source/destination folder become one job (one pass over
+            # exactly their files); renames/links are paused/relocated/resumed a wave at
+            # a time, copies one job at a time, and deletes overlap with the next wave
+            jobs = _group_jobs(items)
+
+            # --- Pre-flight: reject copies that don't fit before anything is paused ---
+            plan, _ = await self._preflight(jobs, delete_old)
+            summary = plan.summary()
+            await broker.publish("state", {
+                "taskId": task_id, "plan": summary,
+                "message": f"plan: {len(plan.accepted)} job(s), {_fmt_bytes(summary['bytes'])} to copy, eta ~{plan.eta}s",
+            })
+            by_key = {job.key: job for job in jobs}
+            for key, reason in plan.rejected.items():
+                rh = [it.hash for it in by_key[key].items]
+                await broker.publish("state", {"taskId": task_id, "hashes": rh, "message": reason, "level": "error"})
+                self._track(task_id, rh, ITEM_ERROR, reason)
+            jobs = [by_key[k] for k in plan.accepted]
+
+            agg = ProgressAggregator(task_id, broker.publish, interval=self.cfg.progress_interval)
+            for job in jobs:
+                agg.add_job(job.key, job.size)
+            agg.start()
+            deletes: List[asyncio.Task] = []
+            try:
+                for wave in _waves(jobs, max(1, self.cfg.qb_batch_size)):
+                    done = await self._run_wave(task_id, wave, dry_run, delete_old, index, agg)
+                    if delete_old:
+                        deletes.extend(asyncio.create_task(self._delete_old(task_id, job, files)) for job, files in done)
+                if deletes:
+                    await asyncio.gather(*deletes)
+            finally:
+                # a cancel must not leave earlier waves' deletes running on their own
+                for t in deletes:
+                    t.cancel()
+                await asyncio.gather(*deletes, return_exceptions=True)
+                await agg.close()
+            self._status(task_id, "done")
+            await self._flush()
             await broker.publish("done", {"taskId": task_id, "success": True})
 
-    async def _migrate_one(self, task_id: str, h: str, dry_run: bool, delete_old: bool):
+    async def _load_files(self, task_id: str, items: List["_Item"]) -> List["_Item"]:
+        """Fetch each torrent's own file list; torrents without one are skipped."""
+        async def one(it: _Item) -> Optional[_Item]:
+            try:
+                files = await self._qb(self.qb.torrent_files, it.hash)
+            except Exception as e:
+                await broker.publish("state", {"taskId": task_id, "hash": it.hash, "message": f"file list failed: {e}", "level": "error"})
+                self._track(task_id, [it.hash], ITEM_ERROR, f"file list failed: {e}")
+                return None
+            it.sizes = {f["name"]: int(f.get("size") or 0) for f in files if f.get("name")}
+            it.files = list(it.sizes)
+            if not it.files:
+                await broker.publish("state", {"taskId": task_id, "hash": it.hash, "message": "No files (metadata missing?)", "level": "error"})
+                self._track(task_id, [it.hash], ITEM_ERROR, "No files (metadata missing?)")
+                return None
+            return it
+
+        loaded = await asyncio.gather(*(one(it) for it in items))
+        return [it for it in loaded if it is not None]
+
+    def _resolve(self, tor: Dict, save_path: str) -> Tuple[str, str, Optional[str], Optional[str]]:
+        """(src, dst) container paths and their host paths (None if unmapped)."""
+        src_container = save_path.rstrip("/")
+        # already in place -> same folder, nothing to move
+        dst_container = self.placement.target_of(tor) or src_container
+        src_host, dst_host = self.mapper.translate_many([src_container, dst_container])
+        return src_container, dst_container, src_host, dst_host
+
+    async def _preflight(self, jobs: List["_Job"], delete_old: bool) -> Tuple[CapacityPlan, Dict[str, str]]:
+        """Move method per job and whether the copies fit on their destination disks."""
+        def run():
+            methods: Dict[str, str] = {}
+            pjs: List[PlanJob] = []
+            for job in jobs:
+                try:
+                    methods[job.key] = plan_move(job.src_host, job.dst_host, delete_old).method
+                except Exception:
+                    methods[job.key] = RSYNC
+                copies = methods[job.key] == RSYNC and not all(it.copied for it in job.items)
+                pjs.append(PlanJob(job.key, job.dst_host, job.size, copies, [it.hash for it in job.items]))
+            rates = self.db.copy_rates() if self.db is not None else {}
+            return plan_capacity(pjs, self.cfg.min_free_mb * 1024 * 1024, rates), methods
+        return await asyncio.to_thread(run)
+
+    async def plan_migrate(self, hashes: List[str], delete_old: bool) -> Dict:
+        """
+        Fast dry-run: sizes from qB's torrent list (no file lists, no rsync -n),
+        method and free space per destination, ETA from past copy rates.
+        """
+        index = TorrentIndex(self.qb.list_torrents)
+        await index.load(hashes)
+        rows: Dict[str, Dict] = {}
+        items: List[_Item] = []
+        for h in hashes:
+            tor = await index.get(h)
+            save_path = (tor or {}).get("save_path") or (tor or {}).get("download_path") or ""
+            if not save_path:
+                rows[h] = {"hash": h, "ok": False, "reason": "Not found" if not tor else "Missing save_path"}
+                continue
+            src_c, dst_c, src_h, dst_h = self._resolve(tor, save_path)
+            row = rows[h] = {
+                "hash": h, "name": tor.get("name", ""), "size": int(tor.get("size") or 0),
+                "src": src_c, "dst": dst_c, "ok": True, "reason": None,
+            }
+            if not src_h or not dst_h:
+                row.update(ok=False, reason="Cannot map paths")
+                continue
+            items.append(_Item(h, src_c, dst_c, src_h, dst_h, size=row["size"]))
+
+        plan, methods = await self._preflight(_group_jobs(items), delete_old)
+        for job in _group_jobs(items):
+            for it in job.items:
+                rows[it.hash]["method"] = methods[job.key]
+                if job.key in plan.rejected:
+                    rows[it.hash].update(ok=False, reason=plan.rejected[job.key])
+        return {"items": [rows[h] for h in dict.fromkeys(hashes)], **plan.summary()}
+
+    async def _plan_one(
+        self, task_id: str, h: str, dry_run: bool, index: TorrentIndex, pending: List[str],
+    ) -> Optional["_Item"]:
         # get torrent snapshot
-        torrents = self.qb.list_torrents()
-        tor = next((t for t in torrents if t.get("hash") == h), None)
+        try:
+            tor = await index.get(h, pending)
+        except Exception as e:
+            await broker.publish("state", {"taskId": task_id, "hash": h, "message": f"lookup failed: {e}", "level": "error"})
+            self._track(task_id, [h], ITEM_ERROR, f"lookup failed: {e}")
+            return None
         if not tor:
             await broker.publish("state", {"taskId": task_id, "hash": h, "message": "Not found", "level": "error"})
-            return
+            self._track(task_id, [h], ITEM_ERROR, "Not found")
+            return None
 
         save_path = tor.get("save_path") or tor.get("download_path") or ""
         if not save_path:
             await broker.publish("state", {"taskId": task_id, "hash": h, "message": "Missing save_path", "level": "error"})
-            return
-
-        # container dst decision
-        if _under(save_path, "/data/torrents"):
-            dst_container = save_path.rstrip("/")
-        elif _under(save_path, "/data"):
-            dst_container = save_path.rstrip("/").replace("/data", "/data/torrents", 1)
-        else:
-            dst_container = save_path.rstrip("/")
+            self._track(task_id, [h], ITEM_ERROR, "Missing save_path")
+            return None
 
-        src_container = save_path.rstrip("/")
-
-        # map to host
-        src_host = self.mapper.container_to_host(src_container)
-        dst_host = self.mapper.container_to_host(dst_container)
+        src_container, dst_container, src_host, dst_host = self._resolve(tor, save_path)
         if not src_host or not dst_host:
             await broker.publish("state", {
                 "taskId": task_id, "hash": h,
                 "message": f"Cannot map paths (src={src_container}, dst={dst_container})",
                 "level": "error"
             })
-            return
+            self._track(task_id, [h], ITEM_ERROR, "Cannot map paths")
+            return None
 
         # mapping info
         await broker.publish("state", {
@@ -125,94 +366,509 @@ class TaskRunner:
         })
 
         # --- Build & publish command preview BEFORE any qB calls ---
-        base_flags = _normalize_flags(getattr(self.cfg, "rsync_flags_effective", None))
-        flags = base_flags.copy()
+        flags = self._flags()
         if dry_run and "--dry-run" not in flags:
             flags = ["--dry-run", *flags]
-        cmd_preview = ["rsync", *flags, f"{src_host}/", f"{dst_host}/"]
-        cmd_str = _shell_join(cmd_preview)
+        if self._engine() == "native":
+            cmd_str = f"copy (native, {self.cfg.copy_workers} workers): {src_host}/ -> {dst_host}/"
+        else:
+            cmd_preview = ["rsync", *flags, "--from0", "--files-from=-", f"{src_host}/", f"{dst_host}/"]
+            cmd_str = _shell_join(cmd_preview)
 
         await broker.publish("state",   {"taskId": task_id, "hash": h, "message": cmd_str})
         await broker.publish("progress",{"taskId": task_id, "hash": h, "line":    cmd_str})
         await broker.publish("progress",{
             "taskId": task_id, "hash": h, "line": f"plan: {src_host} -> {dst_host}"
         })
+        return _Item(h, src_container, dst_container, src_host, dst_host)
 
-        # --- Pause torrent (skip on dry-run to avoid blocking) ---
-        if dry_run:
-            await broker.publish("state", {"taskId": task_id, "hash": h, "message": "dry-run: skipping pause"})
-        else:
+    def _flags(self) -> List[str]:
+        return _normalize_flags(getattr(self.cfg, "rsync_flags_effective", None))
+
+    async def _run_wave(
+        self, task_id: str, wave: List["_Job"], dry_run: bool, delete_old: bool,
+        index: TorrentIndex, agg: ProgressAggregator,
+    ) -> List[Tuple["_Job", List[str]]]:
+        """
+        Move one wave of jobs. Renames/hardlinks are quick, so their torrents are
+        paused, relocated and resumed together, one qB call per phase. Each copy is
+        run on its own: its torrents are paused only once it holds a copy slot and
+        resumed as soon as they are relocated.
+        Returns (job, files safe to delete) for jobs with relocated torrents.
+        """
+        await asyncio.gather(*(self._plan_job(task_id, job, dry_run, delete_old) for job in wave))
+        quick = [job for job in wave if job.method != RSYNC]
+        runs = [self._run_jobs(task_id, quick, dry_run, index, agg)] if quick else []
+        runs.extend(self._run_jobs(task_id, [job], dry_run, index, agg) for job in wave if job.method == RSYNC)
+        await asyncio.gather(*runs)
+
+        # old files are only deleted once qB points at the new copy, and never while
+        # a torrent of the same job that stayed behind still uses them
+        out: List[Tuple[_Job, List[str]]] = []
+        for job in wave:
+            if job.method == NOOP or (job.method == RENAME and not job.linked):
+                continue  # nothing left behind
+            keep = {f for it in job.items if not it.relocated for f in it.files}
+            files = sorted({f for it in job.items if it.relocated for f in it.files} - keep)
+            if files:
+                out.append((job, files))
+        return out
+
+    async def _run_jobs(
+        self, task_id: str, jobs: List["_Job"], dry_run: bool, index: TorrentIndex, agg: ProgressAggregator,
+    ) -> None:
+        """Pause, move, relocate and resume `jobs` (all quick, or a single copy)."""
+        hs = [it.hash for job in jobs for it in job.items]
+        paused = False
+
+        async def pause():
+            nonlocal paused
+            await self.pauses.acquire(len(hs))
+            paused = True
             try:
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": "Pause torrent"})
-                await _qb_call_with_timeout(self.qb.pause, [h], timeout=5.0)
+                await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"Pause {len(hs)} torrent(s)"})
+                await self._qb(self.qb.pause, hs)
             except Exception as e:
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": f"pause failed: {e}", "level": "warn"})
+                await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"pause failed: {e}", "level": "warn"})
 
-        # --- rsync availability ---
-        rsync_path = shutil.which("rsync")
-        if rsync_path is None:
-            note = "rsync not found in PATH"
+        # a copy pauses from inside its copy slot, right before the data moves
+        copy_pause = pause if not dry_run and jobs[0].method == RSYNC else None
+        relocated: List[_Item] = []
+        try:
+            # --- Pause (skip on dry-run to avoid blocking) ---
             if dry_run:
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": f"{note} — dry-run preview only"})
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": "dry-run complete"})
+                await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": "dry-run: skipping pause"})
+            elif copy_pause is None:
+                await pause()
+
+            # --- Move data: rename/hardlink on one filesystem, otherwise rsync in parallel,
+            # bounded globally and per destination disk ---
+            await asyncio.gather(*(self._move_job(task_id, job, dry_run, agg, copy_pause) for job in jobs))
+
+            failed = [it.hash for job in jobs if not job.copied for it in job.items]
+            self._track(task_id, failed, ITEM_ERROR, "copy failed")
+
+            if dry_run:
+                for h in hs:
+                    await broker.publish("state", {"taskId": task_id, "hash": h, "message": "dry-run complete"})
+                self._track(task_id, [h for h in hs if h not in failed], ITEM_DONE, "dry-run")
                 return
-            else:
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": note, "level": "error"})
-                # try to resume if we paused
+
+            # --- Post actions: one setLocation per destination, one recheck, one resume ---
+            copied = [it for job in jobs if job.copied for it in job.items]
+            self._track(task_id, [it.hash for it in copied], ITEM_RELOCATING)
+            for dst, group in _group_by_dst(copied).items():
+                gh = [it.hash for it in group]
                 try:
-                    await _qb_call_with_timeout(self.qb.resume, [h], timeout=5.0)
+                    await broker.publish("state", {"taskId": task_id, "hashes": gh, "message": f"setLocation -> {dst}"})
+                    await self._qb(self.qb.set_location, gh, dst)
+                except Exception as e:
+                    # one destination failing must not keep the others where they are
+                    await broker.publish("state", {"taskId": task_id, "hashes": gh, "message": f"setLocation failed: {e}", "level": "error"})
+                    continue
+                for it in group:
+                    index.update(it.hash, save_path=dst)
+                    it.relocated = True
+                relocated.extend(group)
+            self._track(task_id, [it.hash for it in copied if not it.relocated], ITEM_ERROR, "setLocation failed")
+
+            if relocated:
+                try:
+                    rh = await self._verify(task_id, jobs, relocated)
+                    if rh:
+                        await broker.publish("state", {"taskId": task_id, "hashes": rh, "message": "recheck"})
+                        self._track(task_id, rh, ITEM_RECHECKING)
+                        await self._qb(self.qb.recheck, rh)
+                except Exception as e:
+                    rh = [it.hash for it in relocated]
+                    await broker.publish("state", {"taskId": task_id, "hashes": rh, "message": f"recheck failed: {e}", "level": "warn"})
+        finally:
+            # also runs when the task is canceled: leave qB and the disk consistent
+            if not dry_run:
+                try:
+                    await self._settle_wave(task_id, jobs, hs if paused else [])
+                finally:
+                    if paused:
+                        self.pauses.release(len(hs))
+                self._track(task_id, [it.hash for it in relocated], ITEM_DONE)
+
+    async def _verify(self, task_id: str, wave: List["_Job"], relocated: List["_Item"]) -> List[str]:
+        """
+        Check relocated torrents ourselves (VERIFY_MODE) and return the hashes that
+        still need a qB recheck: all of them in 'recheck' mode, else only mismatches.
+        Renamed/hardlinked data is the same inodes and needs no check at all.
+        """
+        mode = self.cfg.verify_mode
+        if mode not in (MANIFEST, PIECES):
+            return [it.hash for it in relocated]
+        moved = {it.hash for it in relocated}
+        checks = []
+        for job in wave:
+            items = [it for it in job.items if it.hash in moved]
+            same_data = job.method in (RENAME, HARDLINK) or (job.method == NOOP and not any(it.copied for it in items))
+            checks.extend((job, it, same_data) for it in items)
+
+        async def one(job: _Job, it: _Item, same_data: bool) -> bool:
+            if same_data:
+                return True
+            async with self.copy_sem:
+                try:
+                    if mode == MANIFEST:
+                        return not await asyncio.to_thread(compare_manifest, job.src_host, job.dst_host, it.files)
+                    data = await self._torrent_file(it.hash)
+                    layout = torrent_layout(data, it.files) if data else None
+                    if layout is None:
+                        return False
+                    return not await asyncio.to_thread(verify_pieces, job.dst_host, layout, self.cfg.copy_workers)
                 except Exception:
-                    pass
-                return
+                    return False
+
+        t0 = time.monotonic()
+        results = await asyncio.gather(*(one(*c) for c in checks))
+        ok = [c[1].hash for c, good in zip(checks, results) if good]
+        bad = [c[1].hash for c, good in zip(checks, results) if not good]
+        if ok:
+            await broker.publish("state", {
+                "taskId": task_id, "hashes": ok,
+                "message": f"verified ({mode}) in {time.monotonic() - t0:.1f}s, no recheck needed",
+            })
+        return bad
+
+    async def _torrent_file(self, h: str) -> Optional[bytes]:
+        """The .torrent for `h`: backup dir first, then qB's export endpoint."""
+        path = self.backups.lookup(h) if self.backups is not None else None
+        if path is None:
+            path = os.path.join(self.cfg.backup_torrent_dir, f"{h}.torrent")
+        try:
+            return await asyncio.to_thread(Path(path).read_bytes)
+        except OSError:
+            pass
+        try:
+            return await self._qb(self.qb.export_torrent, h)
+        except Exception:
+            return None
+
+    async def _settle_wave(self, task_id: str, wave: List["_Job"], hs: List[str]):
+        # a rename/link still running in a thread must finish before we look at what moved
+        await asyncio.gather(*(job.fs_op for job in wave if job.fs_op is not None), return_exceptions=True)
+
+        # renamed entries no relocated torrent points at go back where qB expects them
+        for job in wave:
+            for root, (src, dst) in job.renamed.items():
+                if any(it.relocated for it in job.owners(root)):
+                    continue
+                try:
+                    await asyncio.to_thread(os.rename, dst, src)
+                    await broker.publish("state", {"taskId": task_id, "message": f"rename rolled back: {root}", "level": "warn"})
+                except Exception as e:
+                    await broker.publish("state", {"taskId": task_id, "message": f"rename rollback failed for {root}: {e}", "level": "error"})
 
-        # --- Execute rsync ---
+        # resume everything we paused, including torrents whose copy failed
+        if not hs:
+            return
+        try:
+            await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": "resume"})
+            await self._qb(self.qb.resume, hs)
+        except Exception as e:
+            await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"resume failed: {e}", "level": "warn"})
+
+    async def _plan_job(self, task_id: str, job: "_Job", dry_run: bool, delete_old: bool):
+        """Pick the job's move method; job.plan stays None if its data is already in place."""
+        hs = [it.hash for it in job.items]
+        if all(it.copied for it in job.items):
+            # resumed after the copy finished: only relocate, and leave the source alone
+            job.method = NOOP
+            return
         try:
-            async for prog in run_rsync(src_host, dst_host, base_flags, dry_run=dry_run):
-                await broker.publish("progress", {"taskId": task_id, "hash": h, "line": prog.raw})
+            plan = await asyncio.to_thread(plan_move, job.src_host, job.dst_host, delete_old)
         except Exception as e:
-            await broker.publish("state", {"taskId": task_id, "hash": h, "message": f"rsync error: {e}", "level": "error"})
-            # try to resume if needed
+            plan = MovePlan(RSYNC, job.src_host, job.dst_host, f"plan failed: {e}")
+        if plan.method == RENAME and not dry_run:
+            # a rename takes the whole top-level entry with it; link what other torrents still use
+            busy = await self._roots_in_use(job, job.files)
+            if busy is None:
+                plan = MovePlan(HARDLINK, plan.src, plan.dst, f"{plan.reason}, could not check other torrents' paths")
+            elif busy:
+                job.keep = busy
+                await broker.publish("state", {
+                    "taskId": task_id, "hashes": hs, "level": "warn",
+                    "message": f"Linking {', '.join(sorted(busy))} instead of renaming: used by another torrent",
+                })
+        job.plan = plan
+        job.method = plan.method
+        await broker.publish("state", {
+            "taskId": task_id, "hashes": hs, "method": plan.method,
+            "message": f"move: {plan.method} ({plan.reason}), {len(job.files)} file(s)",
+        })
+
+    async def _move_job(
+        self, task_id: str, job: "_Job", dry_run: bool, agg: ProgressAggregator,
+        before_copy: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        hs = [it.hash for it in job.items]
+        plan = job.plan
+        if plan is None:
+            job.copied = True
+            agg.finish(job.key)
+            return
+        self._track(task_id, hs, ITEM_COPYING)
+
+        if plan.method == RSYNC:
             try:
-                await _qb_call_with_timeout(self.qb.resume, [h], timeout=5.0)
+                disk = await asyncio.to_thread(disk_key, job.dst_host)
             except Exception:
-                pass
+                disk = job.dst_host
+            async with self._disk_sem(disk), self.copy_sem:
+                if before_copy is not None:
+                    await before_copy()
+                t0 = time.monotonic()
+                self._copying += 1
+                try:
+                    job.copied = await self._copy(task_id, job, dry_run, agg)
+                finally:
+                    self._copying -= 1
+                if job.copied and not dry_run and self.db is not None:
+                    self.db.record_copy(disk, job.size, time.monotonic() - t0)
+            if job.copied:
+                agg.finish(job.key)
+            return
+        if dry_run or plan.method == NOOP:
+            job.copied = True
+            agg.finish(job.key)
             return
+        try:
+            # shielded: a cancel must not lose track of entries that were already renamed
+            job.fs_op = asyncio.ensure_future(self._link(plan, job, job.keep))
+            n = await asyncio.shield(job.fs_op)
+            await broker.publish("progress", {
+                "taskId": task_id, "hashes": hs,
+                "line": f"renamed {len(job.renamed)} entries, hardlinked {n} files",
+            })
+            job.copied = True
+            agg.finish(job.key)
+        except Exception as e:
+            await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"{plan.method} error: {e}", "level": "error"})
 
-        # --- Post actions ---
-        if not dry_run:
-            try:
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": f"setLocation -> {dst_container}"})
-                await _qb_call_with_timeout(self.qb.set_location, [h], dst_container, timeout=5.0)
+    async def _link(self, plan: MovePlan, job: "_Job", keep: Set[str] = frozenset()) -> int:
+        """Rename the job's top-level entries (except `keep`) and hardlink the rest."""
+        if plan.method == RENAME:
+            roots = [r for r in job.roots if r not in keep]
+            moved = await asyncio.to_thread(rename_roots, plan.src, plan.dst, roots)
+            for s, d in moved:
+                job.renamed[os.path.basename(s)] = (s, d)
+        # whatever couldn't be renamed (target exists, or no rename allowed) is linked
+        n = await asyncio.to_thread(hardlink_files, plan.src, plan.dst, job.files)
+        job.linked = n > 0
+        return n
 
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": "recheck"})
-                await _qb_call_with_timeout(self.qb.recheck, [h], timeout=5.0)
+    def _engine(self) -> str:
+        engine = self.cfg.copy_engine
+        if engine == "auto":
+            return "rsync" if shutil.which("rsync") else "native"
+        return engine
 
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": "resume"})
-                await _qb_call_with_timeout(self.qb.resume, [h], timeout=5.0)
-            except Exception as e:
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": f"post-action failed: {e}", "level": "warn"})
-        else:
-            await broker.publish("state", {"taskId": task_id, "hash": h, "message": "dry-run complete"})
+    async def _copy(self, task_id: str, job: "_Job", dry_run: bool, agg: ProgressAggregator) -> bool:
+        hs = [it.hash for it in job.items]
+        if self._engine() == "native":
+            return await self._copy_native(task_id, job, dry_run, agg)
+        if shutil.which("rsync") is None:
+            note = "rsync not found in PATH"
+            if dry_run:
+                await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"{note} — dry-run preview only"})
+                return True
+            await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": note, "level": "error"})
+            return False
+        try:
+            async for prog in run_rsync(job.src_host, job.dst_host, self._flags(), dry_run=dry_run, files=job.files):
+                if prog.is_progress:
+                    # throttled: the aggregator publishes the latest value per interval
+                    agg.update(job.key, prog.bytes, prog.rate)
+                elif prog.raw:
+                    await broker.publish("progress", {"taskId": task_id, "hashes": hs, "line": prog.raw})
+        except Exception as e:
+            await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"rsync error: {e}", "level": "error"})
+            return False
+        return True
 
-        # Delete old tree (only on live, if requested)
-        if not dry_run and delete_old:
-            s = os.path.realpath(src_host)
-            d = os.path.realpath(dst_host)
-            if s.startswith(d + os.sep) or d.startswith(s + os.sep):
-                await broker.publish("state", {
-                    "taskId": task_id, "hash": h,
-                    "message": f"Refusing to delete (overlap) src={s} dst={d}",
-                    "level": "warn",
+    async def _copy_native(self, task_id: str, job: "_Job", dry_run: bool, agg: ProgressAggregator) -> bool:
+        hs = [it.hash for it in job.items]
+        try:
+            stats = await copy_files(
+                job.src_host, job.dst_host, job.files, workers=self.cfg.copy_workers,
+                progress=lambda n: agg.update(job.key, n), dry_run=dry_run,
+            )
+        except Exception as e:
+            await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"copy error: {e}", "level": "error"})
+            return False
+        await broker.publish("progress", {
+            "taskId": task_id, "hashes": hs,
+            "line": f"{'would copy' if dry_run else 'copied'} {stats.files} file(s), {_fmt_bytes(stats.bytes)}"
+                    f" ({stats.skipped} up to date, {stats.linked} hardlinked)",
+        })
+        return True
+
+    async def _delete_old(self, task_id: str, job: "_Job", files: List[str]):
+        hs = [it.hash for it in job.items if it.relocated]
+        s = os.path.realpath(job.src_host)
+        d = os.path.realpath(job.dst_host)
+        if s == d:
+            await broker.publish("state", {
+                "taskId": task_id, "hashes": hs,
+                "message": f"Refusing to delete (same path) src={s}",
+                "level": "warn",
+            })
+            return
+        busy = await self._roots_in_use(job, files)
+        if busy is None:
+            await broker.publish("state", {
+                "taskId": task_id, "hashes": hs, "level": "warn",
+                "message": f"Not deleting {s}: could not check other torrents' paths",
+            })
+            return
+        if busy:
+            files = [f for f in files if f.split("/", 1)[0] not in busy]
+            await broker.publish("state", {
+                "taskId": task_id, "hashes": hs, "level": "warn",
+                "message": f"Keeping {', '.join(sorted(busy))}: used by another torrent",
+            })
+        if not files:
+            return
+        await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"Deleting {len(files)} old file(s) in {s}"})
+
+        last = 0.0
+
+        async def progress(st: DeleteStats) -> None:
+            nonlocal last
+            now = time.monotonic()
+            if now - last >= self.cfg.progress_interval:
+                last = now
+                await broker.publish("progress", {
+                    "taskId": task_id, "hashes": hs,
+                    "line": f"deleted {st.files}/{len(files)} file(s), {_fmt_bytes(st.bytes)}",
                 })
-            else:
-                await broker.publish("state", {"taskId": task_id, "hash": h, "message": f"Deleting old {s}"})
-                try:
-                    await _rm_rf(s)
-                except Exception as e:
-                    await broker.publish("state", {"taskId": task_id, "hash": h, "message": f"Delete failed: {e}", "level": "error"})
+
+        def throttle() -> float:
+            # per deleted file: caps each delete worker's rate while copies use the array
+            return self.cfg.delete_throttle_ms / 1000 if self._copying else 0.0
+
+        try:
+            async with self.delete_sem:
+                st = await delete_files(s, files, self.cfg.delete_workers, progress, throttle)
+            msg = {"taskId": task_id, "hashes": hs, "message": f"Deleted {st.files} file(s), {_fmt_bytes(st.bytes)}, {st.dirs} folder(s) in {s}"}
+            if st.errors:
+                msg.update(message=f"{msg['message']}; {st.errors} could not be removed", level="warn")
+            await broker.publish("state", msg)
+        except Exception as e:
+            await broker.publish("state", {"taskId": task_id, "hashes": hs, "message": f"Delete failed: {e}", "level": "error"})
+
+    async def _roots_in_use(self, job: "_Job", files: List[str]) -> Optional[Set[str]]:
+        """
+        Top-level entries about to be deleted that another torrent still points at
+        (its save_path or content_path is that entry or inside it). None if qB
+        can't be asked, in which case nothing should be deleted.
+        """
+        try:
+            others = await self._qb(self.qb.list_torrents)
+        except Exception:
+            return None
+        own = {it.hash for it in job.items}
+        paths: List[str] = []
+        for t in others:
+            if t.get("hash") in own:
+                continue
+            sp = t.get("save_path") or ""
+            paths.append(sp)
+            paths.append(t.get("content_path") or (f"{sp.rstrip('/')}/{t.get('name', '')}" if sp else ""))
+        bases = {job.src_host.rstrip("/"), os.path.realpath(job.src_host)}
+        busy: Set[str] = set()
+        for host in self.mapper.translate_many([p for p in paths if p]):
+            if not host:
+                continue
+            for root in content_roots(files):
+                for base in bases:
+                    r = f"{base}/{root}"
+                    if host == r or host.startswith(r + "/"):
+                        busy.add(root)
+        return busy
+
+
+@dataclass
+class _Item:
+    hash: str
+    src_container: str
+    dst_container: str
+    src_host: str
+    dst_host: str
+    files: List[str] = field(default_factory=list)
+    sizes: Dict[str, int] = field(default_factory=dict)
+    size: int = 0  # qB's torrent size, used until the file list is loaded
+    copied: bool = False  # data already at dst_host (resumed task)
+    relocated: bool = False
+
+
+@dataclass
+class _Job:
+    """Torrents moved together because they share source and destination folders."""
+    src_host: str
+    dst_host: str
+    key: str = ""
+    items: List[_Item] = field(default_factory=list)
+    method: str = RSYNC
+    copied: bool = False
+    linked: bool = False
+    plan: Optional[MovePlan] = None
+    keep: Set[str] = field(default_factory=set)  # roots linked instead of renamed
+    renamed: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    fs_op: Optional["asyncio.Future"] = None
+
+    @property
+    def files(self) -> List[str]:
+        return sorted({f for it in self.items for f in it.files})
+
+    @property
+    def size(self) -> int:
+        sizes: Dict[str, int] = {}
+        for it in self.items:
+            sizes.update(it.sizes)
+        return sum(sizes.values()) if sizes else sum(it.size for it in self.items)
+
+    @property
+    def roots(self) -> List[str]:
+        return content_roots(self.files)
+
+    def owners(self, root: str) -> List[_Item]:
+        return [it for it in self.items if root in content_roots(it.files)]
+
+
+def _group_jobs(items: List[_Item]) -> List[_Job]:
+    jobs: Dict[Tuple[str, str, bool], _Job] = {}
+    for it in items:
+        # already-copied torrents of a resumed task form their own (relocate-only) job
+        key = (it.src_host, it.dst_host, it.copied)
+        if key not in jobs:
+            jobs[key] = _Job(it.src_host, it.dst_host, key=str(len(jobs)))
+        jobs[key].items.append(it)
+    return list(jobs.values())
+
+
+def _waves(jobs: List[_Job], size: int) -> List[List[_Job]]:
+    """Whole jobs per wave, about `size` torrents each (a big job is its own wave)."""
+    waves: List[List[_Job]] = []
+    cur: List[_Job] = []
+    n = 0
+    for job in jobs:
+        if cur and n + len(job.items) > size:
+            waves.append(cur)
+            cur, n = [], 0
+        cur.append(job)
+        n += len(job.items)
+    if cur:
+        waves.append(cur)
+    return waves
 
 
-async def _rm_rf(path: str):
-    import shutil
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, lambda: shutil.rmtree(path, ignore_errors=True))
\ No newline at end of file
+def _group_by_dst(items: List[_Item]) -> Dict[str, List[_Item]]:
+    groups: Dict[str, List[_Item]] = {}
+    for it in items:
+        groups.setdefault(it.dst_container, []).append(it)
+    return groups
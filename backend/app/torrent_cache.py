@@ -0,0 +1,136 @@
+# ==============================
+# app/torrent_cache.py
+# ==============================
+from __future__ import annotations
+import asyncio
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from .qb_client import QBClient
+
+
+class TorrentCache:
+    """
+    In-process mirror of qBittorrent's torrent list, kept current by following
+    /api/v2/sync/maindata deltas (rid protocol). Every applied change bumps a
+    revision counter so readers can ask for "what changed since rev N".
+    """
+
+    def __init__(self, qb: QBClient, poll_sec: float = 2.0, max_removed: int = 10000):
+        self.qb = qb
+        self.poll_sec = poll_sec
+        self.epoch = uuid.uuid4().hex[:8]  # changes per process, so old ETags never match
+        self.rid = 0
+        self.rev = 0
+        self._torrents: Dict[str, Dict[str, Any]] = {}
+        self._rev_of: Dict[str, int] = {}
+        self._removed: Dict[str, int] = {}
+        self._max_removed = max_removed
+        self._floor = 0  # oldest rev we can still serve a delta from
+        self._ready = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- applying deltas ----------
+    def apply(self, data: Dict[str, Any]) -> None:
+        self.rid = data.get("rid", self.rid)
+        torrents = data.get("torrents") or {}
+        if not torrents and not data.get("torrents_removed") and not data.get("full_update"):
+            # empty delta: keep the revision (and the ETag) stable
+            self._ready.set()
+            return
+        self.rev += 1
+        rev = self.rev
+
+        if data.get("full_update"):
+            for h in list(self._torrents):
+                if h not in torrents:
+                    self._drop(h, rev)
+            for h, t in torrents.items():
+                t = dict(t, hash=h)
+                if self._torrents.get(h) != t:
+                    self._torrents[h] = t
+                    self._rev_of[h] = rev
+                    self._removed.pop(h, None)
+        else:
+            for h, partial in torrents.items():
+                cur = self._torrents.get(h)
+                if cur is None:
+                    self._torrents[h] = dict(partial, hash=h)
+                    self._removed.pop(h, None)
+                else:
+                    cur.update(partial)
+                self._rev_of[h] = rev
+
+        for h in data.get("torrents_removed") or []:
+            self._drop(h, rev)
+        self._ready.set()
+
+    def _drop(self, h: str, rev: int) -> None:
+        if self._torrents.pop(h, None) is None:
+            return
+        self._rev_of.pop(h, None)
+        self._removed[h] = rev
+        if len(self._removed) > self._max_removed:
+            # forget the oldest tombstones; clients older than that get a full list
+            for old in list(self._removed)[: len(self._removed) - self._max_removed]:
+                self._floor = max(self._floor, self._removed.pop(old))
+
+    # ---------- reading ----------
+    @property
+    def etag(self) -> str:
+        return f'"{self.epoch}-{self.rev}"'
+
+    def snapshot(self, since: Optional[int] = None) -> Tuple[bool, List[Dict[str, Any]], List[str]]:
+        """
+        Returns (full, torrents, removed_hashes). A delta is only served when
+        `since` is a revision this process can still account for.
+        """
+        if since is None or since < self._floor or since > self.rev:
+            return True, list(self._torrents.values()), []
+        changed = [self._torrents[h] for h, r in self._rev_of.items() if r > since]
+        removed = [h for h, r in self._removed.items() if r > since]
+        return False, changed, removed
+
+    def get(self, h: str) -> Optional[Dict[str, Any]]:
+        return self._torrents.get(h)
+
+    def __len__(self) -> int:
+        return len(self._torrents)
+
+    # ---------- polling ----------
+    async def poll_once(self) -> None:
+        async with self._lock:
+            self.apply(await self.qb.sync_maindata(self.rid))
+
+    async def ensure_ready(self) -> None:
+        if self._ready.is_set():
+            return
+        async with self._lock:
+            # concurrent first readers wait for one initial load
+            if not self._ready.is_set():
+                self.apply(await self.qb.sync_maindata(self.rid))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # qB unreachable: start over from a full update next time
+                self.rid = 0
+            await asyncio.sleep(self.poll_sec)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,65 @@
+# ==============================
+# app/torrent_index.py
+# ==============================
+from __future__ import annotations
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+Fetch = Callable[[Optional[List[str]]], Awaitable[List[Dict[str, Any]]]]
+
+
+class TorrentIndex:
+    """
+    Hash-keyed snapshot of qBittorrent torrents for one batch.
+    Loaded once (only the requested hashes), looked up in O(1) and refreshed
+    incrementally: only missing or stale hashes are re-fetched, in one call.
+    """
+
+    def __init__(self, fetch: Fetch, max_age: float = 60.0):
+        self._fetch = fetch
+        self._max_age = max_age
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._seen_ts: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, h: str) -> bool:
+        return h in self._items
+
+    async def load(self, hashes: Iterable[str]) -> None:
+        await self.refresh(list(dict.fromkeys(hashes)))
+
+    async def refresh(self, hashes: List[str]) -> None:
+        if not hashes:
+            return
+        now = time.monotonic()
+        found = set()
+        for t in await self._fetch(hashes):
+            h = t.get("hash")
+            if h:
+                self._items[h] = t
+                found.add(h)
+        # hashes qB did not return are remembered as misses until they go stale
+        for h in hashes:
+            self._seen_ts[h] = now
+            if h not in found:
+                self._items.pop(h, None)
+
+    def _stale(self, h: str) -> bool:
+        ts = self._seen_ts.get(h)
+        return ts is None or time.monotonic() - ts > self._max_age
+
+    async def get(self, h: str, pending: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Return the torrent for `h`. If it is missing or stale, refresh it together
+        with any stale hashes in `pending` (the rest of the batch) in a single call.
+        """
+        if self._stale(h):
+            await self.refresh([x for x in dict.fromkeys([h, *pending]) if self._stale(x)])
+        return self._items.get(h)
+
+    def update(self, h: str, **fields: Any) -> None:
+        """Apply a local change (e.g. new save_path) without asking qB again."""
+        if h in self._items:
+            self._items[h].update(fields)
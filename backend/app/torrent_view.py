@@ -0,0 +1,236 @@
+# ==============================
+# app/torrent_view.py
+# ==============================
+from __future__ import annotations
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .listing import TorrentRecord
+from .placement import Placement, _tags
+from .torrent_cache import TorrentCache
+
+# Sort keys accepted by query(); prefix with "-" for descending
+SORT_KEYS = ("name", "size", "progress", "state", "category", "save_path")
+# Largest page /api/torrents serves
+MAX_PAGE = 5000
+# Orderings kept per revision, so paging through one query doesn't re-sort
+ORDER_CACHE = 16
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _sort_value(r: TorrentRecord, key: str) -> Any:
+    v = getattr(r, key)
+    if key in ("size", "progress"):
+        return v or 0
+    v = v or ""
+    return v.lower() if key == "name" else v
+
+
+def encode_cursor(value: Any, h: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, h]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        value, h = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise QueryError(f"bad cursor: {e}") from None
+    return value, h
+
+
+def _after(keyed: List[Tuple[Any, str]], cursor: Tuple[Any, str], desc: bool) -> int:
+    """Index of the first row past `cursor` in `keyed` (sorted, descending if `desc`)."""
+    cursor = tuple(cursor)
+    lo, hi = 0, len(keyed)
+    try:
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (keyed[mid] < cursor) if desc else (keyed[mid] > cursor):
+                hi = mid
+            else:
+                lo = mid + 1
+    except TypeError:
+        raise QueryError("cursor belongs to a different sort") from None
+    return lo
+
+
+@dataclass
+class Query:
+    misplaced: Optional[bool] = None
+    states: Optional[Set[str]] = None
+    category: Optional[str] = None
+    tags: Set[str] = field(default_factory=set)  # all of them
+    q: Optional[str] = None                      # name substring, case-insensitive
+    sort: str = "name"
+    desc: bool = False
+
+    def key(self) -> Tuple:
+        return (self.misplaced, frozenset(self.states or ()), self.category, frozenset(self.tags),
+                (self.q or "").lower(), self.sort, self.desc)
+
+
+@dataclass
+class Page:
+    total: int
+    rows: List[TorrentRecord]
+    next_cursor: Optional[str] = None
+
+
+class TorrentView:
+    """
+    Filterable index over the TorrentCache for /api/torrents.
+    - follows the cache's revisions, re-classifying only changed torrents and keeping
+      one compact TorrentRecord per torrent (what the endpoint serves)
+    - keeps hash sets per state/category/tag and of misplaced torrents, so filters
+      start from the smallest matching set instead of scanning the whole list
+    - pages with keyset cursors (sort value + hash of the last row), which stay
+      valid while torrents come and go
+    """
+
+    def __init__(self, cache: TorrentCache, placement: Placement):
+        self.cache = cache
+        self.placement = placement
+        self._rev: Optional[int] = None
+        self._records: Dict[str, TorrentRecord] = {}
+        self._facets: Dict[str, Tuple[str, str, frozenset]] = {}  # hash -> (state, category, tags)
+        self.by_state: Dict[str, Set[str]] = {}
+        self.by_category: Dict[str, Set[str]] = {}
+        self.by_tag: Dict[str, Set[str]] = {}
+        self.misplaced: Set[str] = set()
+        self._orders: Dict[Tuple, Tuple[List[str], List[Tuple[Any, str]]]] = {}
+
+    # ---------- index upkeep ----------
+    @staticmethod
+    def _remove_from(index: Dict[str, Set[str]], key: str, h: str) -> None:
+        s = index.get(key)
+        if s is not None:
+            s.discard(h)
+            if not s:
+                del index[key]
+
+    def _drop(self, h: str) -> None:
+        facets = self._facets.pop(h, None)
+        if facets is not None:
+            state, cat, tags = facets
+            self._remove_from(self.by_state, state, h)
+            self._remove_from(self.by_category, cat, h)
+            for tag in tags:
+                self._remove_from(self.by_tag, tag, h)
+        self._records.pop(h, None)
+        self.misplaced.discard(h)
+
+    def _add(self, t: Dict[str, Any], target: Optional[str]) -> None:
+        h = t["hash"]
+        self._drop(h)
+        facets = (t.get("state") or "", t.get("category") or "", _tags(t.get("tags")))
+        self._facets[h] = facets
+        self.by_state.setdefault(facets[0], set()).add(h)
+        self.by_category.setdefault(facets[1], set()).add(h)
+        for tag in facets[2]:
+            self.by_tag.setdefault(tag, set()).add(h)
+        self._records[h] = TorrentRecord.of(t, target)
+        if target is not None:
+            self.misplaced.add(h)
+
+    def sync(self) -> None:
+        """Catch up with the cache."""
+        if self._rev == self.cache.rev:
+            return
+        full, torrents, removed = self.cache.snapshot(self._rev)
+        if full:
+            for h in list(self._facets):
+                self._drop(h)
+        for h in removed:
+            self._drop(h)
+        for t, target in zip(torrents, self.placement.classify_many(torrents)):
+            self._add(t, target)
+        self._rev = self.cache.rev
+        self._orders.clear()
+
+    def target(self, h: str) -> Optional[str]:
+        r = self._records.get(h)
+        return r.suggested_target if r is not None else None
+
+    # ---------- queries ----------
+    def matches(self, h: str, query: Query) -> bool:
+        r = self._records.get(h)
+        if r is None:
+            return False
+        state, cat, tags = self._facets[h]
+        if query.misplaced is not None and (h in self.misplaced) != query.misplaced:
+            return False
+        if query.states and state not in query.states:
+            return False
+        if query.category is not None and cat != query.category:
+            return False
+        if query.tags and not query.tags <= tags:
+            return False
+        if query.q and query.q.lower() not in (r.name or "").lower():
+            return False
+        return True
+
+    def _candidates(self, query: Query) -> Set[str]:
+        """Smallest index set the query is limited to (everything if none applies)."""
+        sets: List[Set[str]] = []
+        if query.misplaced:
+            sets.append(self.misplaced)
+        if query.states:
+            sets.append(set().union(*(self.by_state.get(s, set()) for s in query.states)))
+        if query.category is not None:
+            sets.append(self.by_category.get(query.category, set()))
+        for tag in query.tags:
+            sets.append(self.by_tag.get(tag, set()))
+        if not sets:
+            return set(self._facets)
+        sets.sort(key=len)
+        return set.intersection(*sets) if len(sets) > 1 else set(sets[0])
+
+    def _ordered(self, query: Query) -> Tuple[List[str], List[Tuple[Any, str]]]:
+        if query.sort not in SORT_KEYS:
+            raise QueryError(f"unknown sort key {query.sort!r} (one of {', '.join(SORT_KEYS)})")
+        key = query.key()
+        hit = self._orders.get(key)
+        if hit is not None:
+            return hit
+        keyed = sorted(
+            (_sort_value(self._records[h], query.sort), h)
+            for h in self._candidates(query) if self.matches(h, query)
+        )
+        if query.desc:
+            keyed.reverse()
+        if len(self._orders) >= ORDER_CACHE:
+            self._orders.pop(next(iter(self._orders)))
+        hit = self._orders[key] = ([h for _, h in keyed], keyed)
+        return hit
+
+    def query(self, query: Query, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        self.sync()
+        hashes, keyed = self._ordered(query)
+        start = _after(keyed, decode_cursor(cursor), query.desc) if cursor else 0
+        end = len(hashes) if limit is None else min(len(hashes), start + max(1, limit))
+        rows = [self._records[h] for h in hashes[start:end]]
+        next_cursor = encode_cursor(*keyed[end - 1]) if end < len(hashes) and end > start else None
+        return Page(total=len(hashes), rows=rows, next_cursor=next_cursor)
+
+    def changed(self, since: int, query: Query) -> Tuple[bool, List[TorrentRecord], List[str]]:
+        """
+        Delta for clients holding a filtered list: (full, rows, removed). Changed torrents
+        that no longer match are reported as removed.
+        """
+        self.sync()
+        full, torrents, removed = self.cache.snapshot(since)
+        if full:
+            page = self.query(query)
+            return True, page.rows, []
+        rows = []
+        for t in torrents:
+            if self.matches(t["hash"], query):
+                rows.append(self._records[t["hash"]])
+            else:
+                removed.append(t["hash"])
+        return False, rows, removed
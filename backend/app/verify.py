@@ -0,0 +1,130 @@
+# ==============================
+# app/verify.py
+# ==============================
+from __future__ import annotations
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .bencode import bdecode
+
+# Verification modes
+RECHECK = "recheck"    # always let qBittorrent re-hash
+MANIFEST = "manifest"  # same size and mtime as the source, file by file
+PIECES = "pieces"      # hash the copy against the .torrent's v1 piece hashes
+
+
+def compare_manifest(src: str, dst: str, files: List[str]) -> List[str]:
+    """Relative paths whose copy differs in size or mtime from the source (or is missing)."""
+    bad: List[str] = []
+    for rel in files:
+        try:
+            s = os.stat(os.path.join(src, rel))
+        except FileNotFoundError:
+            continue  # never downloaded (skipped file), nothing to compare
+        try:
+            d = os.stat(os.path.join(dst, rel))
+        except FileNotFoundError:
+            bad.append(rel)
+            continue
+        if s.st_size != d.st_size or s.st_mtime_ns != d.st_mtime_ns:
+            bad.append(rel)
+    return bad
+
+
+@dataclass
+class Layout:
+    """v1 piece layout: files in torrent order as (relative path or None for padding, length)."""
+    piece_length: int
+    hashes: List[bytes]
+    files: List[Tuple[Optional[str], int]]
+
+    @property
+    def total(self) -> int:
+        return sum(n for _, n in self.files)
+
+
+def torrent_layout(data: bytes, names: Optional[List[str]] = None) -> Optional[Layout]:
+    """
+    Piece layout of a .torrent. `names` (qB's current file names, same order) win over
+    the names in the metadata, so renamed files are found. None for v2-only torrents.
+    """
+    meta: Dict[bytes, Any] = bdecode(data)
+    info = meta.get(b"info") or {}
+    pieces = info.get(b"pieces")
+    if not isinstance(pieces, bytes) or b"piece length" not in info:
+        return None
+    name = info.get(b"name", b"").decode("utf-8", "surrogateescape")
+    files: List[Tuple[Optional[str], int]] = []
+    if b"files" in info:
+        for f in info[b"files"]:
+            pad = b"p" in f.get(b"attr", b"")
+            path = "/".join(p.decode("utf-8", "surrogateescape") for p in f[b"path"])
+            files.append((None if pad else f"{name}/{path}", int(f[b"length"])))
+    else:
+        files.append((name, int(info[b"length"])))
+    real = [i for i, (p, _) in enumerate(files) if p is not None]
+    if names is not None and len(names) == len(real):
+        for i, n in zip(real, names):
+            files[i] = (n, files[i][1])
+    hashes = [pieces[i:i + 20] for i in range(0, len(pieces), 20)]
+    return Layout(int(info[b"piece length"]), hashes, files)
+
+
+def _read_span(root: str, layout: Layout, start: int, length: int) -> bytes:
+    """`length` bytes of the torrent's concatenated payload starting at `start`."""
+    out = bytearray()
+    offset = 0
+    for path, size in layout.files:
+        if length <= 0:
+            break
+        if offset + size <= start:
+            offset += size
+            continue
+        begin = max(0, start - offset)
+        n = min(size - begin, length)
+        if path is None:
+            out += bytes(n)  # padding file (BEP 47), never on disk
+        else:
+            with open(os.path.join(root, path), "rb") as f:
+                f.seek(begin)
+                chunk = f.read(n)
+            if len(chunk) != n:
+                raise EOFError(path)
+            out += chunk
+        start += n
+        length -= n
+        offset += size
+    return bytes(out)
+
+
+def _check_range(root: str, layout: Layout, first: int, last: int) -> List[int]:
+    bad: List[int] = []
+    total = layout.total
+    for idx in range(first, last):
+        start = idx * layout.piece_length
+        try:
+            data = _read_span(root, layout, start, min(layout.piece_length, total - start))
+        except (OSError, EOFError):
+            bad.append(idx)
+            continue
+        if hashlib.sha1(data).digest() != layout.hashes[idx]:
+            bad.append(idx)
+    return bad
+
+
+def verify_pieces(root: str, layout: Layout, workers: int = 4) -> List[int]:
+    """
+    Indices of pieces whose data under `root` doesn't match. Pieces are split into
+    `workers` contiguous ranges hashed in parallel (hashlib releases the GIL).
+    """
+    n = len(layout.hashes)
+    if n == 0:
+        return []
+    workers = max(1, min(workers, n))
+    step = -(-n // workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify") as pool:
+        parts = pool.map(lambda a: _check_range(root, layout, a, min(a + step, n)), range(0, n, step))
+        return [i for p in parts for i in p]
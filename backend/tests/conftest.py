@@ -1,4 +1,97 @@
 # ==============================
 # tests/conftest.py
 # ==============================
-# (left intentionally minimal; real tests would mock QBClient and file system)
\ No newline at end of file
+import json
+import os
+from typing import Any, Dict, List
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from app.config import AppConfig
+
+
+class FakeQB:
+    """
+    Minimal scripted qBittorrent WebAPI behind an httpx.MockTransport.
+    `maindata` is a list of responses served in order by /api/v2/sync/maindata.
+    """
+
+    def __init__(self):
+        self.torrents: Dict[str, Dict[str, Any]] = {}
+        self.maindata: List[Dict[str, Any]] = []
+        self.files: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls: List[httpx.Request] = []
+        self.prefs: Dict[str, Any] = {'dht': True, 'pex': True, 'lsd': True}
+        self.exports: Dict[str, bytes] = {}
+
+    def paths(self) -> List[str]:
+        return [r.url.path for r in self.calls]
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request)
+        path = request.url.path
+        if path == '/api/v2/auth/login':
+            return httpx.Response(200, text='Ok.')
+        if path == '/api/v2/torrents/info':
+            wanted = request.url.params.get('hashes')
+            items = list(self.torrents.values())
+            if wanted:
+                keep = set(wanted.split('|'))
+                items = [t for t in items if t['hash'] in keep]
+            return httpx.Response(200, json=items)
+        if path == '/api/v2/torrents/files':
+            h = request.url.params['hash']
+            return httpx.Response(200, json=self.files.get(h, [{'name': f'{h[:8]}/data.bin', 'size': 1}]))
+        if path == '/api/v2/sync/maindata':
+            rid = int(request.url.params.get('rid', 0))
+            if not self.maindata:
+                return httpx.Response(200, json={'rid': rid})
+            return httpx.Response(200, json=self.maindata.pop(0))
+        if path == '/api/v2/torrents/export':
+            data = self.exports.get(request.url.params['hash'])
+            return httpx.Response(200, content=data) if data is not None else httpx.Response(404)
+        if path == '/api/v2/app/preferences':
+            return httpx.Response(200, json=self.prefs)
+        if path == '/api/v2/app/setPreferences':
+            self.prefs.update(json.loads(self.form(request)['json']))
+        return httpx.Response(200, text='Ok.')
+
+    @staticmethod
+    def form(request: httpx.Request) -> Dict[str, str]:
+        body = request.content.decode() if request.content else ''
+        out = {k: v[0] for k, v in parse_qs(body).items()}
+        out.update(dict(request.url.params))
+        return out
+
+
+@pytest.fixture
+def cfg(tmp_path, monkeypatch):
+    monkeypatch.setenv('APP_DATA_DIR', str(tmp_path / 'config'))
+    monkeypatch.setenv('QB_URL', 'http://qb.test:8080')
+    return AppConfig()
+
+
+@pytest.fixture
+def fake_qb():
+    return FakeQB()
+
+
+@pytest.fixture
+def bench(record_property):
+    """
+    Benchmarks only run with BENCH=1 (they time the machine, not the code's behavior).
+    Returns record(name, value): the number goes to the junit XML and the summary below.
+    """
+    if not os.environ.get('BENCH'):
+        pytest.skip('benchmark: set BENCH=1 to run')
+    return record_property
+
+
+def pytest_terminal_summary(terminalreporter):
+    rows = [(r.nodeid, k, v) for r in terminalreporter.stats.get('passed', []) for k, v in r.user_properties]
+    if rows:
+        terminalreporter.section('benchmarks')
+        for nodeid, name, value in rows:
+            terminalreporter.write_line(f'{nodeid}: {name} = {value}')
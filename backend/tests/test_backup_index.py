@@ -0,0 +1,94 @@
+# ==============================
+# tests/test_backup_index.py
+# ==============================
+import hashlib
+import os
+
+import pytest
+
+from app.backup_index import BackupIndex
+from app.bencode import BencodeError, info_hash
+from app.db import DB
+
+
+def _benc(v):
+    if isinstance(v, int):
+        return b'i%de' % v
+    if isinstance(v, str):
+        v = v.encode()
+    if isinstance(v, bytes):
+        return b'%d:%s' % (len(v), v)
+    if isinstance(v, list):
+        return b'l' + b''.join(_benc(x) for x in v) + b'e'
+    return b'd' + b''.join(_benc(k) + _benc(v[k]) for k in sorted(v)) + b'e'
+
+
+def _torrent(name):
+    info = {'name': name, 'length': 1, 'piece length': 16384, 'pieces': b'\x00' * 20}
+    data = _benc({'announce': 'http://t', 'info': info, 'comment': 'x'})
+    return data, hashlib.sha1(_benc(info)).hexdigest()
+
+
+def test_info_hash_hashes_only_the_raw_info_dict():
+    data, h = _torrent('a')
+    assert info_hash(data) == h
+    v2 = {'name': 'b', 'meta version': 2, 'piece length': 16384, 'file tree': {}}
+    assert info_hash(_benc({'info': v2})) == hashlib.sha256(_benc(v2)).hexdigest()[:40]
+    with pytest.raises(BencodeError):
+        info_hash(_benc({'announce': 'x'}))
+    with pytest.raises(BencodeError):
+        info_hash(data[:-5])
+
+
+@pytest.mark.asyncio
+async def test_refresh_only_parses_new_and_changed_files(cfg, tmp_path):
+    root = tmp_path / 'backups'
+    (root / 'sub').mkdir(parents=True)
+    hashes = {}
+    for i in range(20):
+        data, h = _torrent(f't{i}')
+        # qB names its backups by hash, but any name works
+        (root / ('sub' if i % 2 else '') / f'file{i}.torrent').write_bytes(data)
+        hashes[i] = h
+    (root / 'junk.torrent').write_bytes(b'not bencode')
+    db = DB(cfg)
+    index = BackupIndex(str(root), db, workers=4)
+
+    stats = await index.refresh()
+    assert (stats.files, stats.parsed, stats.invalid) == (21, 21, 1)
+    assert index.lookup(hashes[3]) == str(root / 'sub' / 'file3.torrent')
+    assert index.lookup(hashes[4].upper()) == str(root / 'file4.torrent')
+
+    new, h_new = _torrent('new')
+    (root / 'new.torrent').write_bytes(new)
+    os.remove(root / 'file0.torrent')
+    stats = await index.refresh()
+    assert (stats.parsed, stats.removed) == (1, 1)
+    assert index.lookup(h_new) and index.lookup(hashes[0]) is None
+
+    # a restart reloads the index from SQLite instead of parsing everything again
+    reloaded = BackupIndex(str(root), db)
+    reloaded.load()
+    assert len(reloaded) == 20
+    assert (await reloaded.refresh()).parsed == 0
+
+
+@pytest.mark.asyncio
+async def test_duplicate_backups_keep_the_hash_indexed(tmp_path):
+    data, h = _torrent('dup')
+    (tmp_path / 'a.torrent').write_bytes(data)
+    (tmp_path / 'b.torrent').write_bytes(data)
+    index = BackupIndex(str(tmp_path))
+    await index.refresh()
+    assert index.lookup(h) == str(tmp_path / 'a.torrent')
+
+    os.remove(tmp_path / 'a.torrent')
+    await index.refresh()
+    assert index.lookup(h) == str(tmp_path / 'b.torrent')
+    # re-parsing the remaining copy doesn't drop it either
+    os.utime(tmp_path / 'b.torrent', ns=(0, 0))
+    (tmp_path / 'c.torrent').write_bytes(data)
+    await index.refresh()
+    os.remove(tmp_path / 'c.torrent')
+    await index.refresh()
+    assert index.lookup(h) == str(tmp_path / 'b.torrent') and len(index) == 1
@@ -0,0 +1,23 @@
+# ==============================
+# tests/test_config.py
+# ==============================
+import pytest
+from pydantic import ValidationError
+
+from app.config import AppConfig
+
+
+def test_copy_engine_is_validated(cfg, monkeypatch):
+    monkeypatch.setenv('COPY_ENGINE', 'Native')
+    assert AppConfig().copy_engine == 'native'
+    monkeypatch.setenv('COPY_ENGINE', 'rsnyc')
+    with pytest.raises(ValidationError, match='COPY_ENGINE'):
+        AppConfig()
+
+
+def test_verify_mode_is_validated(cfg, monkeypatch):
+    monkeypatch.setenv('VERIFY_MODE', 'Manifest')
+    assert AppConfig().verify_mode == 'manifest'
+    monkeypatch.setenv('VERIFY_MODE', 'peices')
+    with pytest.raises(ValidationError, match='VERIFY_MODE'):
+        AppConfig()
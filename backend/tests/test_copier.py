@@ -0,0 +1,67 @@
+# ==============================
+# tests/test_copier.py
+# ==============================
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from app.copier import copy_files
+from app.rsync import run_rsync
+
+
+def _tree(root, n=3, size=1 << 20):
+    (root / 'T' / 'sub').mkdir(parents=True)
+    for i in range(n):
+        (root / 'T' / 'sub' / f'f{i}.bin').write_bytes(os.urandom(size))
+    os.link(root / 'T' / 'sub' / 'f0.bin', root / 'T' / 'link.bin')
+    os.symlink('sub/f1.bin', root / 'T' / 'sym')
+    os.chmod(root / 'T' / 'sub' / 'f2.bin', 0o640)
+    os.utime(root / 'T' / 'sub', ns=(1_000_000_000, 1_000_000_000))
+    return [f'T/sub/f{i}.bin' for i in range(n)] + ['T/link.bin', 'T/sym']
+
+
+@pytest.mark.asyncio
+async def test_copy_files_preserves_metadata_and_links(tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    files = _tree(src)
+    (src / 'other').write_text('not ours')
+    seen = []
+
+    stats = await copy_files(str(src), str(dst), files, workers=2, progress=seen.append)
+
+    assert stats.files == 5 and stats.linked == 1 and stats.bytes == 3 << 20
+    assert seen[-1] == 3 << 20 and seen == sorted(seen)
+    for rel in files[:3]:
+        s, d = os.stat(src / rel), os.stat(dst / rel)
+        assert (s.st_size, s.st_mode, s.st_mtime_ns) == (d.st_size, d.st_mode, d.st_mtime_ns)
+        assert (src / rel).read_bytes() == (dst / rel).read_bytes()
+    assert os.path.samefile(dst / 'T/link.bin', dst / 'T/sub/f0.bin')
+    assert os.readlink(dst / 'T/sym') == 'sub/f1.bin'
+    assert os.stat(dst / 'T/sub').st_mtime_ns == 1_000_000_000
+    assert not (dst / 'other').exists()
+
+    again = await copy_files(str(src), str(dst), files)
+    assert again.skipped == 3 and again.bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_copy_benchmark_vs_rsync(tmp_path, bench):
+    # tmpfs when available, so the disk doesn't dominate
+    root = Path('/dev/shm') / f'copybench-{os.getpid()}' if os.path.isdir('/dev/shm') else tmp_path
+    try:
+        files = _tree(root / 'src', n=16, size=4 << 20)
+        t0 = time.perf_counter()
+        await copy_files(str(root / 'src'), str(root / 'native'), files, workers=4)
+        bench('copy 64MiB native (ms)', round((time.perf_counter() - t0) * 1000, 1))
+        if shutil.which('rsync'):
+            t0 = time.perf_counter()
+            async for _ in run_rsync(str(root / 'src'), str(root / 'rsync'), ['-aHAX', '--numeric-ids'], files=files):
+                pass
+            bench('copy 64MiB rsync (ms)', round((time.perf_counter() - t0) * 1000, 1))
+        assert (root / 'native' / 'T/sub/f15.bin').stat().st_size == 4 << 20
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
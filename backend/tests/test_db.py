@@ -0,0 +1,73 @@
+# ==============================
+# tests/test_db.py
+# ==============================
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from app.db import DB, MIGRATIONS
+
+
+def test_migrations_upgrade_unversioned_db(cfg):
+    # a database created before versioning: only the original tables, user_version 0
+    os.makedirs(cfg.data_dir, exist_ok=True)
+    path = os.path.join(cfg.data_dir, 'app.db')
+    old = sqlite3.connect(path)
+    old.executescript(MIGRATIONS[0])
+    old.execute("INSERT INTO tasks VALUES('t','migrate','done','{}',1,1)")
+    old.commit()
+    old.close()
+
+    db = DB(cfg)
+    assert db.user_version == len(MIGRATIONS)
+    assert db.get_task('t')['status'] == 'done'
+    db.migrate()  # no-op once current
+    assert db.conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+
+def test_connection_per_thread(cfg):
+    db = DB(cfg)
+    other = []
+    t = threading.Thread(target=lambda: other.append(db.conn))
+    t.start()
+    t.join()
+    assert other[0] is not db.conn
+    assert db.conn is db.conn
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_write_queue_batches_until_flush(cfg, monkeypatch):
+    db = DB(cfg)
+    batches = []
+    apply = db._apply
+    monkeypatch.setattr(db, '_apply', lambda batch: (batches.append(len(batch)), apply(batch)))
+    db.start_writer()
+    db.create_task('t1', 'migrate', {'hashes': ['a', 'b']})
+    for i in range(200):
+        db.set_item_state('t1', ['a', 'b'], f's{i}')
+    db.set_task_status('t1', 'running')
+    await db.flush()
+
+    task = db.get_task('t1')
+    assert task['status'] == 'running'
+    assert {i['state'] for i in task['items']} == {'s199'}
+    assert sum(batches) == 202 and len(batches) < 10
+    await db.stop_writer()
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_logged_and_the_rest_applied(cfg, caplog):
+    db = DB(cfg)
+    db.start_writer()
+    db.create_task('t1', 'migrate', {})
+    db._write('INSERT INTO no_such_table VALUES(?)', [(1,)])
+    db.set_task_status('t1', 'running')
+    with caplog.at_level('ERROR', logger='app.db'):
+        await db.flush()
+
+    assert db.get_task('t1')['status'] == 'running'
+    assert 'no_such_table' in caplog.text
+    await db.stop_writer()
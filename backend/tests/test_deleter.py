@@ -0,0 +1,52 @@
+# ==============================
+# tests/test_deleter.py
+# ==============================
+import os
+
+import pytest
+
+from app.deleter import BATCH, delete_files
+
+
+@pytest.mark.asyncio
+async def test_delete_files_streams_progress_and_prunes(tmp_path):
+    files = [f'Pack/S01/e{i:04d}.mkv' for i in range(BATCH + 10)] + ['Pack/info.nfo', 'Single.mkv']
+    for rel in files:
+        p = tmp_path / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(b'x' * 10)
+    (tmp_path / 'Pack' / 'keep.txt').write_text('not ours')
+    seen = []
+    pauses = []
+
+    def throttle():
+        pauses.append(1)
+        return 0.0
+
+    async def progress(s):
+        seen.append(s.files)
+
+    st = await delete_files(str(tmp_path), files + ['Pack/missing'], workers=1,
+                            progress=progress, throttle=throttle)
+
+    assert (st.files, st.bytes, st.errors) == (len(files), 10 * len(files), 0)
+    assert st.dirs == 1  # S01; Pack still holds keep.txt
+    assert sorted(os.listdir(tmp_path)) == ['Pack']
+    assert os.listdir(tmp_path / 'Pack') == ['keep.txt']
+    assert len(seen) == len(pauses) == 2 and seen[-1] == len(files)
+
+
+@pytest.mark.asyncio
+async def test_delete_throttles_per_file(tmp_path, monkeypatch):
+    import app.deleter as deleter
+    files = [f'f{i}' for i in range(5)]
+    for rel in files:
+        (tmp_path / rel).write_bytes(b'x')
+    slept = []
+    monkeypatch.setattr(deleter.time, 'sleep', slept.append)
+    # no directory listing: only the named paths are touched
+    monkeypatch.setattr(deleter.os, 'scandir', None)
+
+    st = await delete_files(str(tmp_path), files + ['missing'], workers=2, throttle=lambda: 0.01)
+    assert st.files == 5 and slept == [0.01] * 5
+    assert os.listdir(tmp_path) == []
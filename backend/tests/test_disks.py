@@ -0,0 +1,19 @@
+# ==============================
+# tests/test_disks.py
+# ==============================
+from app.disks import disk_key, unraid_backing
+
+
+def test_user_share_resolves_to_backing_disk(tmp_path):
+    mnt = tmp_path / 'mnt'
+    (mnt / 'disk1' / 'media' / 'torrents' / 'movies').mkdir(parents=True)
+    (mnt / 'disk2' / 'media' / 'tv').mkdir(parents=True)
+    (mnt / 'user').mkdir()
+
+    # target doesn't exist yet on any disk: resolved from the deepest existing parent
+    new = str(mnt / 'user' / 'media' / 'torrents' / 'movies' / 'New Film')
+    assert unraid_backing(new, str(mnt)) == str(mnt / 'disk1' / 'media' / 'torrents' / 'movies' / 'New Film')
+    assert disk_key(new, str(mnt)) == 'disk1'
+    # 'media' exists on both disks -> ambiguous
+    assert unraid_backing(str(mnt / 'user' / 'media' / 'other'), str(mnt)) is None
+    assert disk_key(str(mnt / 'disk2' / 'media' / 'tv'), str(mnt)) == 'disk2'
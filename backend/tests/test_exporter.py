@@ -0,0 +1,86 @@
+# ==============================
+# tests/test_exporter.py
+# ==============================
+import hashlib
+
+import httpx
+import pytest
+
+from app.backup_index import BackupIndex
+from app.db import DB
+from app.exporter import TorrentExporter
+from app.qb_client import QBClient
+from app.torrent_cache import TorrentCache
+
+
+def _torrent(name):
+    info = b'd6:lengthi1e4:name%d:%s12:piece lengthi16384e6:pieces20:%se' % (len(name), name, b'\0' * 20)
+    return b'd4:info' + info + b'e', hashlib.sha1(info).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_export_only_fetches_missing_torrents(cfg, fake_qb, tmp_path):
+    root = tmp_path / 'backups'
+    root.mkdir()
+    torrents = [_torrent(b'%d' % i) for i in range(4)]
+    (h0, h1, h2, h3) = [h for _, h in torrents]
+    (root / 'old-name.torrent').write_bytes(torrents[0][0])  # already backed up
+    fake_qb.exports = {h1: torrents[1][0], h2: torrents[2][0], h3: torrents[0][0]}  # h3: wrong file
+    qb = QBClient(cfg, transport=httpx.MockTransport(fake_qb.handler))
+    cache = TorrentCache(qb)
+    cache.apply({'rid': 1, 'full_update': True, 'torrents': {
+        **{h: {'state': 'uploading'} for _, h in torrents},
+        'f' * 40: {'state': 'metaDL'},  # nothing to export yet
+    }})
+    exporter = TorrentExporter(cfg, qb, cache, BackupIndex(str(root), DB(cfg)))
+
+    stats = await exporter.export_once()
+    assert (stats.total, stats.present, stats.exported, stats.failed) == (4, 1, 2, 1)
+    assert (root / f'{h1}.torrent').read_bytes() == torrents[1][0]
+    assert not (root / f'{h3}.torrent').exists()
+    assert sorted(p.name for p in root.iterdir()) == sorted(['old-name.torrent', f'{h1}.torrent', f'{h2}.torrent'])
+
+    fake_qb.calls.clear()
+    stats = await exporter.export_once()
+    assert (stats.present, stats.exported, stats.failed) == (3, 0, 1)
+    exported = [r.url.params['hash'] for r in fake_qb.calls if r.url.path == '/api/v2/torrents/export']
+    assert exported == [h3]  # only the one still missing
+
+
+@pytest.mark.asyncio
+async def test_export_stops_when_qb_has_no_export_endpoint(cfg, fake_qb, tmp_path):
+    hashes = [_torrent(b'%d' % i)[1] for i in range(3)]
+    qb = QBClient(cfg, transport=httpx.MockTransport(fake_qb.handler))
+    cache = TorrentCache(qb)
+    cache.apply({'rid': 1, 'full_update': True, 'torrents': {h: {'state': 'uploading'} for h in hashes}})
+    exporter = TorrentExporter(cfg, qb, cache, BackupIndex(str(tmp_path / 'b')))
+    with pytest.raises(httpx.HTTPStatusError):
+        await exporter.export_once()
+    assert [r.url.path for r in fake_qb.calls].count('/api/v2/torrents/export') == 1
+
+
+@pytest.mark.asyncio
+async def test_requested_export_waits_for_the_scheduled_one(cfg, fake_qb, tmp_path):
+    import asyncio
+    torrents = [_torrent(b'%d' % i) for i in range(3)]
+    fake_qb.exports = {h: data for data, h in torrents}
+    exported = []
+
+    async def handler(request):
+        if request.url.path == '/api/v2/torrents/export':
+            exported.append(request.url.params['hash'])
+            await asyncio.sleep(0.01)
+        return fake_qb.handler(request)
+
+    qb = QBClient(cfg, transport=httpx.MockTransport(handler))
+    cache = TorrentCache(qb)
+    cache.apply({'rid': 1, 'full_update': True, 'torrents': {h: {'state': 'uploading'} for _, h in torrents}})
+    exporter = TorrentExporter(cfg, qb, cache, BackupIndex(str(tmp_path)))
+
+    scheduled = asyncio.create_task(exporter.export_once())
+    await asyncio.sleep(0)
+    assert not exporter.trigger()  # a run is in progress
+    again = await exporter.export_once()  # waits instead of exporting the same hashes
+    assert (await scheduled).exported == 3 and again.exported == 0
+    assert sorted(exported) == sorted(h for _, h in torrents)
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith('.tmp')]
@@ -0,0 +1,125 @@
+# ==============================
+# tests/test_metafix.py
+# ==============================
+import httpx
+import pytest
+
+from app.db import DB
+from app.metafix import MetaFixer
+from app.qb_client import QBClient
+from app.torrent_cache import TorrentCache
+
+
+def _fixer(cfg, fake_qb, db=None):
+    qb = QBClient(cfg, transport=httpx.MockTransport(fake_qb.handler))
+    return MetaFixer(cfg, qb, TorrentCache(qb), db)
+
+
+def _count(fake_qb, path):
+    return fake_qb.paths().count(path)
+
+
+@pytest.mark.asyncio
+async def test_stuck_torrents_escalate_in_batches(cfg, fake_qb, tmp_path):
+    cfg.stuck_minutes = 0
+    cfg.backup_torrent_dir = str(tmp_path)
+    hashes = [f'{i:040x}' for i in range(250)]
+    fixer = _fixer(cfg, fake_qb)
+    fixer.cache.apply({'rid': 1, 'full_update': True, 'torrents': {
+        h: {'state': 'metaDL', 'save_path': '/data/torrents/tv', 'category': 'tv'} for h in hashes
+    }})
+    (tmp_path / f'{hashes[0]}.torrent').write_bytes(b'd4:infod6:lengthi1e4:name1:aee')
+
+    assert set(await fixer.scan_once()) == {'reannounce'}
+    assert _count(fake_qb, '/api/v2/torrents/reannounce') == 3  # chunked 100/100/50
+
+    fake_qb.calls.clear()
+    assert set(await fixer.scan_once()) == {'dht-nudge'}
+    # one toggle for all 250: read prefs, DHT off, DHT/PeX/LSD on
+    assert _count(fake_qb, '/api/v2/app/preferences') == 1
+    sets = [fake_qb.form(r)['json'] for r in fake_qb.calls if r.url.path == '/api/v2/app/setPreferences']
+    assert sets == ['{"dht": false}', '{"dht": true, "pex": true, "lsd": true}']
+    assert _count(fake_qb, '/api/v2/torrents/reannounce') == 3
+
+    fake_qb.calls.clear()
+    ran = await fixer.scan_once()
+    assert ran == {'replace': [hashes[0]]}  # only one has a backup
+    assert fake_qb.form(next(r for r in fake_qb.calls if r.url.path == '/api/v2/torrents/delete'))['deleteFiles'] == 'false'
+    assert _count(fake_qb, '/api/v2/torrents/add') == 1
+
+    fake_qb.calls.clear()
+    assert await fixer.scan_once() == {}  # everything tried
+    assert fake_qb.calls == []
+
+
+@pytest.mark.asyncio
+async def test_meta_seen_follows_the_cache(cfg, fake_qb):
+    cfg.stuck_minutes = 10
+    db = DB(cfg)
+    fixer = _fixer(cfg, fake_qb, db)
+    fixer.cache.apply({'rid': 1, 'full_update': True, 'torrents': {
+        'a': {'state': 'metaDL'}, 'b': {'state': 'stalledDL'}, 'c': {'state': 'forcedMetaDL'},
+    }})
+    assert await fixer.scan_once() == {}  # not stuck for 10 minutes yet
+    assert set(db.meta_seen()) == {'a', 'c'}
+
+    fixer.cache.apply({'rid': 2, 'torrents': {'a': {'state': 'downloading'}}, 'torrents_removed': ['c']})
+    await fixer.scan_once()
+    assert db.meta_seen() == {}
+    assert fake_qb.calls == []
+
+
+@pytest.mark.asyncio
+async def test_manual_fix_stops_once_metadata_arrives(cfg, fake_qb):
+    cfg.metafix_settle_sec = 0
+    db = DB(cfg)
+    fixer = _fixer(cfg, fake_qb, db)
+    fake_qb.torrents = {
+        'a': {'hash': 'a', 'state': 'metaDL'},
+        'b': {'hash': 'b', 'state': 'metaDL'},
+        'c': {'hash': 'c', 'state': 'uploading'},
+    }
+    handler = fake_qb.handler
+
+    def fixes_a(request):
+        if request.url.path == '/api/v2/torrents/reannounce':
+            fake_qb.torrents['a']['state'] = 'downloading'
+        return handler(request)
+
+    fixer.qb._client._transport = httpx.MockTransport(fixes_a)
+    await fixer.enqueue('f1', ['a', 'b', 'c'], ['reannounce', 'dht-nudge'])
+    await db.flush()
+
+    task = db.get_task('f1')
+    states = {i['hash']: (i['state'], i['message']) for i in task['items']}
+    assert states == {
+        'a': ('done', 'fixed by reannounce'),
+        'b': ('error', 'still no metadata'),
+        'c': ('done', 'has metadata'),
+    }
+    reannounced = [fake_qb.form(r)['hashes'] for r in fake_qb.calls if r.url.path == '/api/v2/torrents/reannounce']
+    assert reannounced == ['a|b', 'b']  # the nudge only touched what was still stuck
+
+
+@pytest.mark.asyncio
+async def test_replace_goes_torrent_by_torrent(cfg, fake_qb, tmp_path):
+    cfg.backup_torrent_dir = str(tmp_path)
+    hashes = [c * 40 for c in 'abc']
+    for h in hashes:
+        (tmp_path / f'{h}.torrent').write_bytes(b'd4:infod6:lengthi1e4:name1:aee')
+    fixer = _fixer(cfg, fake_qb)
+    handler = fake_qb.handler
+
+    def rejects_b(request):
+        if request.url.path == '/api/v2/torrents/add' and hashes[1].encode() in request.read():
+            fake_qb.calls.append(request)
+            return httpx.Response(200, text='Fails.')
+        return handler(request)
+
+    fixer.qb._client._transport = httpx.MockTransport(rejects_b)
+    torrents = [{'hash': h, 'state': 'metaDL', 'save_path': '/data/torrents/tv'} for h in hashes]
+
+    assert await fixer.apply('replace', torrents) == [hashes[0], hashes[2]]
+    deleted = [fake_qb.form(r)['hashes'] for r in fake_qb.calls if r.url.path == '/api/v2/torrents/delete']
+    assert deleted == hashes  # each one deleted right before its own add
+    assert fake_qb.paths().count('/api/v2/torrents/add') == 3
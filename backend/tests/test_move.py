@@ -0,0 +1,45 @@
+# ==============================
+# tests/test_move.py
+# ==============================
+import os
+
+from app.move import HARDLINK, NOOP, RENAME, content_roots, hardlink_files, plan_move, rename_roots
+
+
+def test_same_filesystem_prefers_rename_then_hardlink(tmp_path):
+    src = tmp_path / 'torrents' / 'movies'
+    (src / 'Film').mkdir(parents=True)
+    (src / 'Film' / 'film.mkv').write_bytes(b'x' * 10)
+    (src / 'Other').mkdir()
+    dst = tmp_path / 'media' / 'torrents' / 'movies'
+
+    assert plan_move(str(src), str(src), True).method == NOOP
+    assert plan_move(str(src), str(dst), True).method == RENAME
+    plan = plan_move(str(src), str(dst), False)
+    assert plan.method == HARDLINK
+
+    assert hardlink_files(plan.src, plan.dst, ['Film/film.mkv']) == 1
+    a, b = src / 'Film' / 'film.mkv', dst / 'Film' / 'film.mkv'
+    assert os.path.samefile(a, b) and os.stat(a).st_nlink == 2
+    # only the torrent's own files, and re-running is idempotent
+    assert not (dst / 'Other').exists()
+    assert hardlink_files(plan.src, plan.dst, ['Film/film.mkv']) == 0
+
+
+def test_unraid_user_shares_move_on_backing_disk(tmp_path):
+    mnt = tmp_path / 'mnt'
+    (mnt / 'disk2' / 'torrents' / 'movies' / 'Film').mkdir(parents=True)
+    (mnt / 'disk2' / 'torrents' / 'movies' / 'Neighbour').mkdir()
+    (mnt / 'disk2' / 'media').mkdir()
+    (mnt / 'disk1' / 'media').mkdir(parents=True)
+    (mnt / 'user').mkdir()
+
+    plan = plan_move(str(mnt / 'user' / 'torrents' / 'movies'),
+                     str(mnt / 'user' / 'media' / 'torrents' / 'movies'), True, mnt=str(mnt))
+    assert plan.method == RENAME
+    assert plan.src == str(mnt / 'disk2' / 'torrents' / 'movies')
+    assert plan.dst == str(mnt / 'disk2' / 'media' / 'torrents' / 'movies')
+    moved = rename_roots(plan.src, plan.dst, content_roots(['Film/a.mkv', 'Film/b.nfo']))
+    assert len(moved) == 1
+    assert (mnt / 'disk2' / 'media' / 'torrents' / 'movies' / 'Film').is_dir()
+    assert (mnt / 'disk2' / 'torrents' / 'movies' / 'Neighbour').is_dir()
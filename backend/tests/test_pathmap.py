@@ -10,4 +10,33 @@ def test_longest_prefix_wins():
         PathMapping(container='/data', host='/mnt/user/torrents'),
     ])
     assert pm.container_to_host('/data/torrents/movies/x') == '/mnt/user/media/torrents/movies/x'
-    assert pm.container_to_host('/data/foo') == '/mnt/user/torrents/foo'
\ No newline at end of file
+    assert pm.container_to_host('/data/foo') == '/mnt/user/torrents/foo'
+
+
+def test_component_boundaries_and_reverse():
+    pm = PathMapper([
+        {'container': '/data', 'host': '/mnt/user/torrents'},
+        {'container': '/', 'host': '/mnt/user/root'},
+    ])
+    assert pm.container_to_host('/data/') == '/mnt/user/torrents'
+    assert pm.container_to_host('/database/x') == '/mnt/user/root/database/x'  # not under /data
+    assert pm.container_to_host('relative/x') is None
+    assert pm.host_to_container('/mnt/user/torrents/tv/a') == '/data/tv/a'
+    assert pm.host_to_container('/mnt/user/root/etc') == '/etc'
+    assert pm.translate_many(['/data/a', '/data/a', 'x']) == ['/mnt/user/torrents/a'] * 2 + [None]
+    assert pm.cache_info()['to_host']['hits'] == 1
+
+
+def test_translate_many_benchmark(bench):
+    import time
+    rules = [{'container': f'/data/share{i}/sub', 'host': f'/mnt/disk{i % 8}/share{i}'} for i in range(100)]
+    pm = PathMapper(rules, cache_size=0)  # measure the trie itself, not the cache
+    paths = [f'/data/share{i % 100}/sub/torrent-{i}/file.mkv' for i in range(10_000)]
+
+    t0 = time.perf_counter()
+    out = pm.translate_many(paths)
+    per_path = (time.perf_counter() - t0) / len(paths)
+
+    assert out[123] == '/mnt/disk7/share23/torrent-123/file.mkv'
+    bench('pathmap us/path (10k paths x 100 rules)', round(per_path * 1e6, 2))
+    assert per_path < 50e-6
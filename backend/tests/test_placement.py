@@ -0,0 +1,40 @@
+# ==============================
+# tests/test_placement.py
+# ==============================
+from app.config import AppConfig, PlacementRule
+from app.placement import Placement
+
+
+def test_default_rules_match_legacy_behaviour(cfg):
+    p = Placement(cfg.placement_rules)
+    assert p.target('/data/movies') == '/data/torrents/movies'
+    assert p.target('/data/movies/') == '/data/torrents/movies'
+    assert p.target('/data') == '/data/torrents'
+    assert p.target('/data/torrents/tv') is None
+    assert p.target('/database/x') is None
+    assert p.target('/downloads') is None
+
+
+def test_rules_in_order_and_batch():
+    p = Placement([
+        PlacementRule(kind='tag', pattern='keep'),
+        PlacementRule(kind='category', pattern='tv', target='/data/torrents/tv'),
+        PlacementRule(kind='glob', pattern='/downloads/*/incoming', target='/data/torrents/incoming'),
+        PlacementRule(kind='prefix', pattern='/data', target='/data/torrents'),
+    ])
+    torrents = [
+        {'save_path': '/data/x', 'tags': 'seed, keep'},
+        {'save_path': '/data/x', 'category': 'tv'},
+        {'save_path': '/data/torrents/tv', 'category': 'tv'},
+        {'save_path': '/downloads/a/incoming/'},
+        {'save_path': '/data/x'},
+    ] * 2000
+    out = p.classify_many(torrents)
+    assert out[:5] == [None, '/data/torrents/tv', None, '/data/torrents/incoming', '/data/torrents/x']
+    assert len(out) == 10000 and out[5:10] == out[:5]
+
+
+def test_rules_from_env(monkeypatch):
+    monkeypatch.setenv('PLACEMENT_RULES', '[{"kind": "prefix", "pattern": "/dl", "target": "/media/dl/"}]')
+    rules = AppConfig().placement_rules
+    assert Placement(rules).target('/dl/a') == '/media/dl/a'
@@ -0,0 +1,77 @@
+# ==============================
+# tests/test_preflight.py
+# ==============================
+import httpx
+import pytest
+
+import app.tasks as tasks
+from app.disks import disk_key, unraid_backing
+from app.pathmap import PathMapper
+from app.preflight import DEFAULT_RATE, PlanJob, plan_capacity
+from app.qb_client import QBClient
+
+GiB = 1024 ** 3
+
+
+def test_plan_fits_smallest_first_per_disk():
+    jobs = [
+        PlanJob('big', '/mnt/disk1/a', 8 * GiB, True),
+        PlanJob('small', '/mnt/disk1/b', 1 * GiB, True),
+        PlanJob('mid', '/mnt/disk1/c', 3 * GiB, True),
+        PlanJob('other', '/mnt/disk2/d', 2 * GiB, True),
+        PlanJob('link', '/mnt/disk1/e', 50 * GiB, False),
+    ]
+    free = {'disk1': 6 * GiB, 'disk2': 10 * GiB}
+    plan = plan_capacity(
+        jobs, reserve=1 * GiB, rates={'disk2': GiB},
+        free=lambda p: free[p.split('/')[2]], key=lambda p: p.split('/')[2],
+    )
+    assert plan.accepted == ['link', 'small', 'mid', 'other']
+    assert list(plan.rejected) == ['big']
+    disks = {d['disk']: d for d in plan.disks}
+    assert disks['disk1']['needed'] == 4 * GiB and disks['disk1']['rejected'] == 1
+    assert disks['disk1']['eta'] == int(4 * GiB / DEFAULT_RATE)
+    assert disks['disk2']['eta'] == 2
+    assert plan.eta == max(disks['disk1']['eta'], 2)
+
+
+
+def test_plan_reads_free_space_on_the_backing_disk(tmp_path):
+    mnt = tmp_path / 'mnt'
+    (mnt / 'disk1' / 'media' / 'movies').mkdir(parents=True)
+    (mnt / 'disk2' / 'media' / 'tv').mkdir(parents=True)
+    (mnt / 'user').mkdir()
+    asked = []
+
+    def free(p):
+        asked.append(p)
+        return 10 * GiB
+
+    plan = plan_capacity(
+        [PlanJob('m', str(mnt / 'user' / 'media' / 'movies' / 'Film'), GiB, True),
+         PlanJob('t', str(mnt / 'user' / 'media' / 'tv' / 'Show'), GiB, True)],
+        reserve=0, rates={}, free=free,
+        key=lambda p: disk_key(p, str(mnt)), backing=lambda p: unraid_backing(p, str(mnt)),
+    )
+    assert asked == [str(mnt / 'disk1' / 'media' / 'movies' / 'Film'), str(mnt / 'disk2' / 'media' / 'tv' / 'Show')]
+    assert [d['disk'] for d in plan.disks] == ['disk1', 'disk2']
+
+@pytest.mark.asyncio
+async def test_plan_migrate_uses_torrent_sizes_without_file_lists(cfg, fake_qb, tmp_path):
+    from app.config import PathMapping
+    cfg.mappings = [PathMapping(container='/data', host=str(tmp_path))]
+    for i in range(3):
+        h = f'{i:040x}'
+        fake_qb.torrents[h] = {'hash': h, 'name': f't{i}', 'size': (i + 1) * 1000, 'save_path': '/data/movies'}
+    qb = QBClient(cfg, transport=httpx.MockTransport(fake_qb.handler))
+    runner = tasks.TaskRunner(cfg, qb, PathMapper(cfg.mappings))
+
+    plan = await runner.plan_migrate(list(fake_qb.torrents) + ['f' * 40], delete_old=False)
+
+    assert '/api/v2/torrents/files' not in fake_qb.paths()
+    assert '/api/v2/torrents/pause' not in fake_qb.paths()
+    rows = plan['items']
+    assert [r['ok'] for r in rows] == [True, True, True, False]
+    assert rows[0]['dst'] == '/data/torrents/movies'
+    assert rows[3]['reason'] == 'Not found'
+    assert plan['accepted'] == 1  # the three share a folder: one job
@@ -0,0 +1,43 @@
+# ==============================
+# tests/test_progress.py
+# ==============================
+import asyncio
+
+import pytest
+
+from app.progress import ProgressAggregator
+from app.rsync import RsyncProgress
+
+
+def test_parse_progress2_line():
+    p = RsyncProgress('      1,234,567  10%    2.00MB/s    0:01:02 (xfr#3, to-chk=7/10)')
+    assert p.is_progress
+    assert (p.bytes, p.percent, p.rate, p.eta) == (1234567, 10, 2 * 1024 ** 2, 62)
+    assert (p.xfr, p.to_check, p.total_files) == (3, 7, 10)
+    assert not RsyncProgress('sending incremental file list').is_progress
+
+
+@pytest.mark.asyncio
+async def test_aggregator_coalesces_updates():
+    events = []
+
+    async def publish(event, data):
+        events.append((event, data))
+
+    agg = ProgressAggregator('t', publish, interval=0.05)
+    agg.add_job('a', 1000)
+    agg.add_job('b', 1000)
+    agg.start()
+    for i in range(1, 501):
+        agg.update('a', i, rate=100.0)
+        agg.update('b', i, rate=100.0)
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    await asyncio.sleep(0.06)
+    agg.finish('a')
+    await agg.close()
+
+    assert len(events) <= 4
+    last = events[-1][1]
+    assert (last['bytes'], last['total']) == (1500, 2000)
+    assert last['percent'] == 75.0 and last['eta'] == 5
@@ -0,0 +1,61 @@
+# ==============================
+# tests/test_qb_client.py
+# ==============================
+import asyncio
+
+import httpx
+import pytest
+
+from app.qb_client import QBClient
+
+
+@pytest.mark.asyncio
+async def test_relogin_on_403(cfg, fake_qb):
+    expired = {'done': False}
+
+    def handler(request):
+        if request.url.path == '/api/v2/torrents/info' and not expired['done']:
+            expired['done'] = True
+            fake_qb.calls.append(request)
+            return httpx.Response(403, text='Forbidden')
+        return fake_qb.handler(request)
+
+    fake_qb.torrents = {'a': {'hash': 'a'}}
+    qb = QBClient(cfg, transport=httpx.MockTransport(handler))
+    assert await qb.list_torrents() == [{'hash': 'a'}]
+    assert fake_qb.paths().count('/api/v2/auth/login') == 2
+
+
+@pytest.mark.asyncio
+async def test_identical_gets_are_coalesced(cfg, fake_qb):
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return fake_qb.handler(request)
+
+    fake_qb.torrents = {'a': {'hash': 'a'}}
+    qb = QBClient(cfg, transport=httpx.MockTransport(handler))
+    results = await asyncio.gather(*[qb.list_torrents() for _ in range(10)])
+    assert all(r == [{'hash': 'a'}] for r in results)
+    assert fake_qb.paths().count('/api/v2/torrents/info') == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_403s_share_one_login(cfg, fake_qb):
+    sid = {'valid': False}
+
+    async def handler(request):
+        if request.url.path == '/api/v2/auth/login':
+            await asyncio.sleep(0.01)
+            sid['valid'] = True
+        elif request.url.path == '/api/v2/torrents/pause' and not sid['valid']:
+            await asyncio.sleep(0.01)  # all ten are in flight on the dead SID
+            fake_qb.calls.append(request)
+            return httpx.Response(403, text='Forbidden')
+        return fake_qb.handler(request)
+
+    qb = QBClient(cfg, transport=httpx.MockTransport(handler))
+    await qb.login()
+    sid['valid'] = False  # qB restarted: every SID is gone
+    await asyncio.gather(*[qb.pause([f'{i:040x}']) for i in range(10)])
+    assert fake_qb.paths().count('/api/v2/auth/login') == 2
+    assert fake_qb.paths().count('/api/v2/torrents/pause') == 20
@@ -11,4 +11,25 @@ async def test_rsync_dryrun_builds(tmp_path):
     dst = tmp_path / 'dst'
     src.mkdir(); (src / 'f').write_text('x')
     async for _ in run_rsync(str(src), str(dst), ['-a','--info=progress2'], dry_run=True):
-        pass
\ No newline at end of file
+        pass
+
+@pytest.mark.asyncio
+async def test_records_split_on_carriage_returns():
+    from app.rsync import _aiter_records, RsyncProgress
+    reader = asyncio.StreamReader()
+    reader.feed_data(b'sending incremental file list\n')
+    reader.feed_data(b'        100   1%    1.00MB/s    0:00:09\r        200   2%')
+    reader.feed_data(b'    1.00MB/s    0:00:08\r' + b'x' * 100)
+    reader.feed_eof()
+    recs = [r async for r in _aiter_records(reader, chunk_size=7, limit=40)]
+    assert recs[0] == b'sending incremental file list'
+    assert [RsyncProgress(r.decode()).bytes for r in recs[1:3]] == [100, 200]
+    assert recs[3:] == [b'x' * 40, b'x' * 40, b'x' * 20]
+
+
+@pytest.mark.asyncio
+async def test_terminate_stops_process():
+    from app.rsync import _terminate
+    proc = await asyncio.create_subprocess_exec('sleep', '30')
+    await _terminate(proc, grace=1.0)
+    assert proc.returncode is not None
@@ -0,0 +1,44 @@
+# ==============================
+# tests/test_scheduler.py
+# ==============================
+import asyncio
+
+import pytest
+
+from app.scheduler import FIFO, SMALL_FIRST, PriorityGate, migrate_key
+
+
+@pytest.mark.asyncio
+async def test_gate_admits_lowest_key_first():
+    gate = PriorityGate(1)
+    order = []
+
+    async def job(name, key):
+        async with gate.slot(key):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await gate.acquire()  # hold the only slot while the others queue up
+    tasks = [
+        asyncio.create_task(job('big', migrate_key(SMALL_FIRST, 0, 4 << 40))),
+        asyncio.create_task(job('small', migrate_key(SMALL_FIRST, 0, 1 << 20))),
+        asyncio.create_task(job('urgent', migrate_key(SMALL_FIRST, 5, 8 << 40))),
+    ]
+    await asyncio.sleep(0)
+    gate.release()
+    await asyncio.gather(*tasks)
+    assert order == ['urgent', 'small', 'big']
+    assert migrate_key(FIFO, 0, 1) == migrate_key(FIFO, 0, 2)
+
+
+@pytest.mark.asyncio
+async def test_gate_cancelled_waiter_leaves_queue():
+    gate = PriorityGate(1)
+    await gate.acquire()
+    waiter = asyncio.create_task(gate.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    gate.release()
+    await asyncio.wait_for(gate.acquire(), 1)  # the slot wasn't lost
@@ -0,0 +1,70 @@
+# ==============================
+# tests/test_sse.py
+# ==============================
+import pytest
+
+from app.sse import SSEBroker
+
+
+@pytest.mark.asyncio
+async def test_filters_and_progress_coalescing():
+    broker = SSEBroker(maxsize=3)
+    mine = broker.subscribe(task_ids=['t1'])
+    others = broker.subscribe(events=['done'])
+
+    for i in range(50):
+        await broker.publish('progress', {'taskId': 't1', 'bytes': i})
+        await broker.publish('progress', {'taskId': 't2', 'bytes': i})
+    await broker.publish('done', {'taskId': 't1', 'success': True})
+
+    # one pending progress (the latest) + done; t2 filtered out
+    assert mine.stats()['lag'] == 2
+    assert '"bytes": 49' in await mine.get(0.1)
+    assert 'event: done' in await mine.get(0.1)
+    assert await mine.get(0.01) is None
+    assert others.stats()['lag'] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest_instead_of_disconnecting():
+    broker = SSEBroker(maxsize=3)
+    sub = broker.subscribe(hashes=['a'])
+    for i in range(10):
+        await broker.publish('state', {'taskId': 't', 'hashes': ['a', 'b'], 'message': str(i)})
+    await broker.publish('state', {'taskId': 't', 'hash': 'c', 'message': 'x'})
+    stats = broker.metrics()[0]
+    assert stats['dropped'] == 7 and stats['lag'] == 3
+    assert '"message": "7"' in await sub.get(0.1)
+
+
+@pytest.mark.asyncio
+async def test_last_event_id_replays_only_missed_events():
+    broker = SSEBroker(log_size=5)
+    for i in range(3):
+        await broker.publish('state', {'taskId': 't', 'message': str(i)})
+    last_id = f'{broker.epoch}-2'
+
+    sub = broker.subscribe()
+    assert broker.replay(sub, last_id)
+    chunk = await sub.get(0.1)
+    assert chunk.startswith(f'id: {broker.epoch}-3\n') and '"message": "2"' in chunk
+    assert await sub.get(0.01) is None
+
+    # older than the window, or from another process: caller must resync
+    for i in range(10):
+        await broker.publish('state', {'taskId': 't', 'message': str(i)})
+    assert not broker.replay(broker.subscribe(), last_id)
+    assert not broker.replay(broker.subscribe(), 'deadbeef-1')
+
+
+@pytest.mark.asyncio
+async def test_replay_past_memory_window_from_sqlite(cfg):
+    from app.db import DB
+    broker = SSEBroker(log_size=2)
+    broker.attach_db(DB(cfg))
+    for i in range(6):
+        await broker.publish('state', {'taskId': 't', 'message': str(i)})
+    sub = broker.subscribe()
+    assert broker.replay(sub, f'{broker.epoch}-1')
+    got = [await sub.get(0.1) for _ in range(5)]
+    assert [c.split('\n', 1)[0] for c in got] == [f'id: {broker.epoch}-{n}' for n in range(2, 7)]
@@ -0,0 +1,381 @@
+# ==============================
+# tests/test_tasks.py
+# ==============================
+import os
+
+import httpx
+import pytest
+
+import app.tasks as tasks
+from app.pathmap import PathMapper
+from app.qb_client import QBClient
+
+
+async def _fake_rsync(src, dst, flags, dry_run=False, files=None):
+    if False:
+        yield None
+
+
+@pytest.fixture
+def runner(cfg, fake_qb, monkeypatch):
+    monkeypatch.setattr(tasks, 'run_rsync', _fake_rsync)
+    monkeypatch.setattr(tasks.shutil, 'which', lambda _: '/usr/bin/rsync')
+    qb = QBClient(cfg, transport=httpx.MockTransport(fake_qb.handler))
+    return tasks.TaskRunner(cfg, qb, PathMapper(cfg.mappings))
+
+
+@pytest.mark.asyncio
+async def test_migrate_batches_qb_mutations(cfg, fake_qb, runner, monkeypatch):
+    cfg.qb_batch_size = 1000
+    hashes = [f'{i:040x}' for i in range(250)]
+    for i, h in enumerate(hashes):
+        fake_qb.torrents[h] = {'hash': h, 'save_path': '/data/movies' if i % 2 else '/data/tv'}
+    # no copy: quick moves are paused/relocated/resumed together
+    monkeypatch.setattr(tasks, 'plan_move', lambda s, d, allow, mnt='/mnt': tasks.MovePlan(tasks.NOOP, s, d, 'test'))
+
+    await runner.migrate('t1', hashes, dry_run=False, delete_old=False)
+
+    paths = fake_qb.paths()
+    assert paths.count('/api/v2/torrents/info') == 3  # one snapshot, chunked
+    assert paths.count('/api/v2/torrents/pause') == 3  # 100 + 100 + 50
+    assert paths.count('/api/v2/torrents/resume') == 3
+    assert paths.count('/api/v2/torrents/recheck') == 3
+    locs = [fake_qb.form(r) for r in fake_qb.calls if r.url.path == '/api/v2/torrents/setLocation']
+    assert {l['location'] for l in locs} == {'/data/torrents/movies', '/data/torrents/tv'}
+    assert sum(len(l['hashes'].split('|')) for l in locs) == 250
+
+
+@pytest.mark.asyncio
+async def test_copies_pause_only_their_own_torrents(cfg, fake_qb, runner, monkeypatch):
+    import asyncio
+    runner.pauses = tasks.PauseBudget(2)
+    paused = set()
+    seen = []  # torrents paused while each copy runs
+    handler = fake_qb.handler
+
+    def tracking(request):
+        if request.url.path in ('/api/v2/torrents/pause', '/api/v2/torrents/resume'):
+            hs = set(fake_qb.form(request)['hashes'].split('|'))
+            paused.update(hs) if request.url.path.endswith('pause') else paused.difference_update(hs)
+        return handler(request)
+
+    async def rsync(src, dst, flags, dry_run=False, files=None):
+        seen.append((src.rsplit('/', 1)[-1], set(paused)))
+        await asyncio.sleep(0.01)
+        if False:
+            yield None
+
+    runner.qb._client._transport = httpx.MockTransport(tracking)
+    monkeypatch.setattr(tasks, 'run_rsync', rsync)
+    monkeypatch.setattr(tasks, 'disk_key', lambda p: next(s for s in p.split('/') if s.startswith('disk')))
+    for i in range(6):
+        h = f'{i:040x}'
+        fake_qb.torrents[h] = {'hash': h, 'save_path': f'/data/x/disk{i % 3}/t{i}'}
+
+    await runner.migrate('t1a', list(fake_qb.torrents), dry_run=False, delete_old=False)
+
+    assert len(seen) == 6
+    for name, during in seen:
+        h = f'{int(name[1:]):040x}'
+        assert h in during and len(during) <= 2  # its own torrent, never more than the cap
+    assert not paused and runner.pauses.paused == 0
+
+@pytest.mark.asyncio
+async def test_failed_set_location_does_not_stop_other_destinations(cfg, fake_qb, runner, monkeypatch):
+    from app.db import DB
+    runner.db = DB(cfg)
+    hs = ['a' * 40, 'b' * 40]
+    fake_qb.torrents[hs[0]] = {'hash': hs[0], 'save_path': '/data/movies'}
+    fake_qb.torrents[hs[1]] = {'hash': hs[1], 'save_path': '/data/tv'}
+
+    def handler(request):
+        if request.url.path == '/api/v2/torrents/setLocation' and 'movies' in fake_qb.form(request)['location']:
+            fake_qb.calls.append(request)
+            return httpx.Response(500)
+        return fake_qb.handler(request)
+
+    runner.qb._client._transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(tasks, 'plan_move', lambda s, d, allow, mnt='/mnt': tasks.MovePlan(tasks.NOOP, s, d, 'test'))
+    await runner.enqueue_migrate('t1b', hs, dry_run=False, delete_old=False)
+
+    assert fake_qb.paths().count('/api/v2/torrents/setLocation') == 2
+    rechecked = [fake_qb.form(r)['hashes'] for r in fake_qb.calls if r.url.path == '/api/v2/torrents/recheck']
+    assert rechecked == [hs[1]]
+    states = {i['hash']: i['state'] for i in runner.db.get_task('t1b')['items']}
+    assert states == {hs[0]: tasks.ITEM_ERROR, hs[1]: tasks.ITEM_DONE}
+
+@pytest.mark.asyncio
+async def test_copies_parallel_across_disks_serial_per_disk(cfg, fake_qb, runner, monkeypatch):
+    import asyncio
+    active = {}
+    peak = {}
+
+    async def slow_rsync(src, dst, flags, dry_run=False, files=None):
+        disk = tasks.disk_key(dst)
+        active[disk] = active.get(disk, 0) + 1
+        peak[disk] = max(peak.get(disk, 0), active[disk])
+        peak['all'] = max(peak.get('all', 0), sum(active.values()))
+        await asyncio.sleep(0.01)
+        active[disk] -= 1
+        if False:
+            yield None
+
+    monkeypatch.setattr(tasks, 'run_rsync', slow_rsync)
+    # .../x/<disk>/... -> '<disk>'
+    monkeypatch.setattr(tasks, 'disk_key', lambda p: next(s for s in p.split('/') if s.startswith('disk')))
+    for i in range(8):
+        h = f'{i:040x}'
+        fake_qb.torrents[h] = {'hash': h, 'save_path': f'/data/x/disk{i % 2}/t{i}'}
+
+    await runner.migrate('t2', list(fake_qb.torrents), dry_run=False, delete_old=False)
+    assert peak['disk0'] == 1 and peak['disk1'] == 1
+    assert peak['all'] == 2
+
+
+@pytest.mark.asyncio
+async def test_migrate_moves_only_the_torrents_files(cfg, fake_qb, runner, tmp_path):
+    from app.config import PathMapping
+    old = tmp_path / 'torrents' / 'movies'
+    for name in ('A', 'B', 'Neighbour'):
+        (old / name).mkdir(parents=True)
+        (old / name / 'f.mkv').write_text(name)
+    cfg.mappings = [
+        PathMapping(container='/data/torrents', host=str(tmp_path / 'media' / 'torrents')),
+        PathMapping(container='/data', host=str(tmp_path / 'torrents')),
+    ]
+    runner.mapper = PathMapper(cfg.mappings)
+    for h, name in (('a' * 40, 'A'), ('b' * 40, 'B')):
+        fake_qb.torrents[h] = {'hash': h, 'save_path': '/data/movies'}
+        fake_qb.files[h] = [{'name': f'{name}/f.mkv'}]
+
+    await runner.migrate('t3', ['a' * 40, 'b' * 40], dry_run=False, delete_old=True)
+
+    new = tmp_path / 'media' / 'torrents' / 'movies'
+    assert (new / 'A' / 'f.mkv').read_text() == 'A'
+    assert (new / 'B' / 'f.mkv').read_text() == 'B'
+    assert not (new / 'Neighbour').exists()
+    assert sorted(os.listdir(old)) == ['Neighbour']
+    locs = [fake_qb.form(r) for r in fake_qb.calls if r.url.path == '/api/v2/torrents/setLocation']
+    assert locs == [{'hashes': 'a' * 40 + '|' + 'b' * 40, 'location': '/data/torrents/movies'}]
+
+
+@pytest.mark.asyncio
+async def test_task_items_persisted_and_resumed(cfg, fake_qb, runner, monkeypatch):
+    from app.db import DB
+    db = DB(cfg)
+    runner.db = db
+    hs = ['a' * 40, 'b' * 40, 'c' * 40]
+    for h in hs:
+        fake_qb.torrents[h] = {'hash': h, 'save_path': '/data/movies'}
+
+    # simulate a restart mid-task: a done, b copied but not relocated, c untouched
+    db.create_task('t4', 'migrate', {'hashes': hs, 'dryRun': False, 'deleteOld': False})
+    db.set_task_status('t4', 'running')
+    db.set_item_state('t4', [hs[0]], tasks.ITEM_DONE)
+    db.set_item_state('t4', [hs[1]], tasks.ITEM_RELOCATING)
+    db.set_item_state('t4', [hs[2]], tasks.ITEM_QUEUED)
+    copied = []
+
+    async def rsync(src, dst, flags, dry_run=False, files=None):
+        copied.extend(files or [])
+        if False:
+            yield None
+
+    monkeypatch.setattr(tasks, 'run_rsync', rsync)
+    assert runner.resume_pending() == ['t4']
+    await runner.tasks['t4']
+
+    task = db.get_task('t4')
+    assert task['status'] == 'done'
+    assert {i['hash']: i['state'] for i in task['items']} == dict.fromkeys(hs, tasks.ITEM_DONE)
+    assert copied == ['cccccccc/data.bin']
+    locs = [fake_qb.form(r) for r in fake_qb.calls if r.url.path == '/api/v2/torrents/setLocation']
+    # b is only relocated, c's copy relocates on its own as soon as it is done
+    assert sorted(l['hashes'] for l in locs) == hs[1:]
+    assert db.unfinished_tasks('migrate') == []
+
+
+@pytest.mark.asyncio
+async def test_cancel_kills_copy_and_resumes(cfg, fake_qb, runner, monkeypatch):
+    import asyncio
+    from app.db import DB
+    runner.db = DB(cfg)
+    started = asyncio.Event()
+    killed = []
+
+    async def stuck_rsync(src, dst, flags, dry_run=False, files=None):
+        started.set()
+        try:
+            await asyncio.sleep(3600)
+        finally:
+            killed.append(src)  # run_rsync terminates the process here
+        yield None
+
+    monkeypatch.setattr(tasks, 'run_rsync', stuck_rsync)
+    hs = ['a' * 40, 'b' * 40]
+    for h in hs:
+        fake_qb.torrents[h] = {'hash': h, 'save_path': '/data/movies'}
+
+    t = runner.enqueue_migrate('t5', hs, dry_run=False, delete_old=False)
+    await asyncio.wait_for(started.wait(), 1)
+    assert runner.cancel('t5')
+    with pytest.raises(asyncio.CancelledError):
+        await t
+
+    assert killed
+    paths = fake_qb.paths()
+    assert '/api/v2/torrents/resume' in paths
+    assert '/api/v2/torrents/setLocation' not in paths
+    task = runner.db.get_task('t5')
+    assert task['status'] == 'canceled'
+    assert {i['state'] for i in task['items']} == {tasks.ITEM_CANCELED}
+    assert not runner.cancel('t5')
+
+
+@pytest.mark.asyncio
+async def test_verified_copies_skip_recheck(cfg, fake_qb, runner, tmp_path, monkeypatch):
+    from app.config import PathMapping
+    src = tmp_path / 'torrents' / 'movies'
+    (src / 'A').mkdir(parents=True)
+    (src / 'A' / 'f.mkv').write_text('A')
+    cfg.mappings = [
+        PathMapping(container='/data/torrents', host=str(tmp_path / 'media')),
+        PathMapping(container='/data', host=str(tmp_path / 'torrents')),
+    ]
+    runner.mapper = PathMapper(cfg.mappings)
+    cfg.verify_mode = 'manifest'
+    h = 'a' * 40
+    fake_qb.torrents[h] = {'hash': h, 'save_path': '/data/movies'}
+    fake_qb.files[h] = [{'name': 'A/f.mkv', 'size': 1}]
+
+    async def copying_rsync(s, d, flags, dry_run=False, files=None):
+        import shutil as sh
+        for rel in files:
+            os.makedirs(os.path.dirname(os.path.join(d, rel)), exist_ok=True)
+            sh.copy2(os.path.join(s, rel), os.path.join(d, rel))
+        if False:
+            yield None
+
+    # different "filesystems", so the data really is copied
+    monkeypatch.setattr(tasks, 'plan_move', lambda s, d, allow, mnt='/mnt': tasks.MovePlan(tasks.RSYNC, s, d, 'test'))
+    monkeypatch.setattr(tasks, 'run_rsync', copying_rsync)
+    await runner.migrate('t6', [h], dry_run=False, delete_old=False)
+    assert '/api/v2/torrents/recheck' not in fake_qb.paths()
+
+    # a copy that doesn't match falls back to a recheck
+    os.utime(tmp_path / 'media' / 'movies' / 'A' / 'f.mkv', ns=(0, 0))
+    monkeypatch.setattr(tasks, 'run_rsync', _fake_rsync)
+    fake_qb.torrents[h]['save_path'] = '/data/movies'
+    await runner.migrate('t7', [h], dry_run=False, delete_old=False)
+    assert fake_qb.paths().count('/api/v2/torrents/recheck') == 1
+
+
+def _cross_seed(cfg, fake_qb, runner, tmp_path):
+    """Torrents A and B in /data/movies, plus a cross-seed of B that isn't migrated."""
+    from app.config import PathMapping
+    old = tmp_path / 'torrents' / 'movies'
+    for name in ('A', 'B'):
+        (old / name).mkdir(parents=True)
+        (old / name / 'f.mkv').write_text(name)
+    cfg.mappings = [
+        PathMapping(container='/data/torrents', host=str(tmp_path / 'media' / 'torrents')),
+        PathMapping(container='/data', host=str(tmp_path / 'torrents')),
+    ]
+    runner.mapper = PathMapper(cfg.mappings)
+    for h, name in (('a' * 40, 'A'), ('b' * 40, 'B')):
+        fake_qb.torrents[h] = {'hash': h, 'save_path': '/data/movies'}
+        fake_qb.files[h] = [{'name': f'{name}/f.mkv'}]
+    fake_qb.torrents['c' * 40] = {'hash': 'c' * 40, 'save_path': '/data/movies', 'content_path': '/data/movies/B'}
+    return old, tmp_path / 'media' / 'torrents' / 'movies'
+
+
+@pytest.mark.asyncio
+async def test_delete_keeps_content_used_by_other_torrents(cfg, fake_qb, runner, tmp_path, monkeypatch):
+    old, _ = _cross_seed(cfg, fake_qb, runner, tmp_path)
+
+    # link instead of rename, so the old files are left behind for the delete step
+    monkeypatch.setattr(tasks, 'plan_move', lambda s, d, allow, mnt='/mnt': tasks.MovePlan(tasks.HARDLINK, s, d, 'test'))
+    await runner.migrate('t8', ['a' * 40, 'b' * 40], dry_run=False, delete_old=True)
+
+    assert sorted(os.listdir(old)) == ['B']
+    assert (tmp_path / 'media' / 'torrents' / 'movies' / 'B' / 'f.mkv').exists()
+
+
+@pytest.mark.asyncio
+async def test_rename_links_content_used_by_other_torrents(cfg, fake_qb, runner, tmp_path):
+    old, new = _cross_seed(cfg, fake_qb, runner, tmp_path)
+    src_inode = os.stat(old / 'B' / 'f.mkv').st_ino
+
+    # same filesystem: the real planner picks rename
+    await runner.migrate('t9', ['a' * 40, 'b' * 40], dry_run=False, delete_old=True)
+
+    assert sorted(os.listdir(new)) == ['A', 'B']
+    assert sorted(os.listdir(old)) == ['B']  # A was renamed away, B stays for the cross-seed
+    assert (old / 'B' / 'f.mkv').read_text() == 'B'
+    assert os.stat(new / 'B' / 'f.mkv').st_ino == src_inode  # linked, not copied
+
+
+@pytest.mark.asyncio
+async def test_failed_migrate_is_recorded_as_error(cfg, fake_qb, runner, monkeypatch):
+    from app.db import DB
+    runner.db = DB(cfg)
+    done = []
+
+    class Broker:
+        async def publish(self, event, data):
+            if event == 'done':
+                done.append(data)
+
+    monkeypatch.setattr(tasks, 'broker', Broker())
+    h = 'a' * 40
+    fake_qb.torrents[h] = {'hash': h, 'save_path': '/data/movies'}
+
+    async def boom(*args):
+        raise RuntimeError('boom')
+
+    # an unexpected error mid-task
+    monkeypatch.setattr(runner, '_preflight', boom)
+    await runner.enqueue_migrate('t9', [h], dry_run=False, delete_old=False)
+    # qB unreachable before the task even starts
+    monkeypatch.setattr(runner.qb, 'list_torrents', boom)
+    await runner.enqueue_migrate('t10', [h], dry_run=False, delete_old=False)
+
+    assert done == [{'taskId': 't9', 'success': False}, {'taskId': 't10', 'success': False}]
+    for task_id in ('t9', 't10'):
+        task = runner.db.get_task(task_id)
+        assert task['status'] == 'error'
+        assert [i['state'] for i in task['items']] == [tasks.ITEM_ERROR]
+    assert runner.db.unfinished_tasks('migrate') == []
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_deletes_of_earlier_waves(cfg, fake_qb, runner, monkeypatch):
+    import asyncio
+    cfg.qb_batch_size = 1
+    hs = ['a' * 40, 'b' * 40]
+    for i, h in enumerate(hs):
+        fake_qb.torrents[h] = {'hash': h, 'save_path': f'/data/movies{i}'}
+    second_wave = asyncio.Event()
+    stopped = []
+
+    async def run_wave(task_id, wave, *args):
+        if wave[0].items[0].hash == hs[0]:
+            return [(wave[0], ['f.mkv'])]
+        second_wave.set()
+        await asyncio.sleep(3600)
+
+    async def delete_old(task_id, job, files):
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            stopped.append(job.items[0].hash)
+            raise
+
+    monkeypatch.setattr(runner, '_run_wave', run_wave)
+    monkeypatch.setattr(runner, '_delete_old', delete_old)
+    t = runner.create_task('t11', runner.migrate('t11', hs, dry_run=False, delete_old=True))
+    await asyncio.wait_for(second_wave.wait(), 1)
+    runner.cancel('t11')
+    with pytest.raises(asyncio.CancelledError):
+        await t
+    assert stopped == [hs[0]]
@@ -0,0 +1,42 @@
+# ==============================
+# tests/test_torrent_cache.py
+# ==============================
+import httpx
+import pytest
+
+from app.qb_client import QBClient
+from app.torrent_cache import TorrentCache
+
+
+@pytest.mark.asyncio
+async def test_cache_follows_maindata_deltas(cfg, fake_qb):
+    fake_qb.maindata = [
+        {'rid': 1, 'full_update': True, 'torrents': {
+            'a': {'name': 'A', 'save_path': '/data/a', 'progress': 0.5},
+            'b': {'name': 'B', 'save_path': '/data/torrents/b', 'progress': 1.0},
+        }},
+        {'rid': 2, 'torrents': {'a': {'progress': 0.75}}},
+        {'rid': 3, 'torrents': {'c': {'name': 'C', 'save_path': '/data/c'}}, 'torrents_removed': ['b']},
+    ]
+    qb = QBClient(cfg, transport=httpx.MockTransport(fake_qb.handler))
+    cache = TorrentCache(qb)
+
+    await cache.ensure_ready()
+    full, items, removed = cache.snapshot()
+    assert full and {t['hash'] for t in items} == {'a', 'b'}
+    rev1 = cache.rev
+
+    await cache.poll_once()
+    full, items, removed = cache.snapshot(rev1)
+    assert not full
+    assert items == [{'name': 'A', 'save_path': '/data/a', 'progress': 0.75, 'hash': 'a'}]
+    rev2 = cache.rev
+
+    await cache.poll_once()
+    full, items, removed = cache.snapshot(rev2)
+    assert [t['hash'] for t in items] == ['c'] and removed == ['b']
+    assert fake_qb.calls[-1].url.params['rid'] == '2'
+
+    # unknown / future revisions fall back to a full list
+    full, items, _ = cache.snapshot(cache.rev + 10)
+    assert full and {t['hash'] for t in items} == {'a', 'c'}
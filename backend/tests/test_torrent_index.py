@@ -0,0 +1,39 @@
+# ==============================
+# tests/test_torrent_index.py
+# ==============================
+import pytest
+from app.torrent_index import TorrentIndex
+
+
+class FakeFetch:
+    def __init__(self, torrents):
+        self.torrents = {t["hash"]: t for t in torrents}
+        self.calls = []
+
+    async def __call__(self, hashes):
+        self.calls.append(list(hashes))
+        return [dict(self.torrents[h]) for h in hashes if h in self.torrents]
+
+
+@pytest.mark.asyncio
+async def test_index_fetches_once_for_batch():
+    fetch = FakeFetch([{"hash": f"h{i}", "save_path": "/data/x"} for i in range(500)])
+    idx = TorrentIndex(fetch)
+    wanted = [f"h{i}" for i in range(0, 500, 2)]
+    await idx.load(wanted)
+    for i, h in enumerate(wanted):
+        assert (await idx.get(h, wanted[i + 1:]))["hash"] == h
+    assert len(fetch.calls) == 1
+    assert fetch.calls[0] == wanted
+
+
+@pytest.mark.asyncio
+async def test_index_misses_and_stale_refresh():
+    fetch = FakeFetch([{"hash": "a"}, {"hash": "b"}])
+    idx = TorrentIndex(fetch, max_age=0.0)
+    await idx.load(["a", "b", "zz"])
+    fetch.torrents.pop("b")
+    assert await idx.get("a", ["b"]) is not None
+    # the stale refresh covered the pending hash too, in one call
+    assert fetch.calls[-1] == ["a", "b"]
+    assert "b" not in idx
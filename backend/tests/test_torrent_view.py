@@ -0,0 +1,72 @@
+# ==============================
+# tests/test_torrent_view.py
+# ==============================
+import pytest
+
+from app.config import PlacementRule
+from app.placement import Placement
+from app.torrent_cache import TorrentCache
+from app.torrent_view import Query, QueryError, TorrentView
+
+
+def _view(torrents):
+    cache = TorrentCache(qb=None)
+    cache.apply({'rid': 1, 'full_update': True, 'torrents': torrents})
+    rules = [
+        PlacementRule(kind='prefix', pattern='/data/torrents'),
+        PlacementRule(kind='prefix', pattern='/data', target='/data/torrents'),
+    ]
+    return cache, TorrentView(cache, Placement(rules))
+
+
+def _fleet(n=100):
+    return {
+        f'{i:040x}': {
+            'name': f'Torrent {i:03d}', 'size': (i * 37) % 101, 'state': 'uploading' if i % 3 else 'stalledDL',
+            'category': 'tv' if i % 2 else 'movies', 'tags': 'hd, x' if i % 5 == 0 else '',
+            'save_path': '/data/tv' if i % 10 == 0 else '/data/torrents/tv',
+        } for i in range(n)
+    }
+
+
+def test_filters_use_the_indexes():
+    _, view = _view(_fleet())
+    page = view.query(Query(misplaced=True))
+    assert page.total == 10 and all(r.suggested_target == '/data/torrents/tv' for r in page.rows)
+    page = view.query(Query(states={'stalledDL'}, category='movies', tags={'hd'}))
+    assert {r.name for r in page.rows} == {f'Torrent {i:03d}' for i in range(0, 100, 30)}
+    assert view.query(Query(q='torrent 05')).total == 10
+    assert view.query(Query(misplaced=False)).total == 90
+
+
+def test_cursor_pages_cover_everything_once():
+    cache, view = _view(_fleet())
+    for sort, desc in (('size', True), ('name', False)):
+        seen, cursor = [], None
+        while True:
+            page = view.query(Query(sort=sort, desc=desc), cursor, limit=7)
+            seen += [r.hash for r in page.rows]
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        values = [cache.get(h)[sort] for h in seen]
+        assert len(seen) == len(set(seen)) == 100
+        assert values == sorted(values, reverse=desc)
+    with pytest.raises(QueryError):
+        view.query(Query(sort='size'), cursor=view.query(Query(sort='name'), limit=1).next_cursor)
+    with pytest.raises(QueryError):
+        view.query(Query(sort='ratio'))
+
+
+def test_index_follows_cache_deltas():
+    cache, view = _view(_fleet(10))
+    h = f'{0:040x}'
+    assert view.query(Query(misplaced=True)).total == 1
+    rev = cache.rev
+    cache.apply({'rid': 2, 'torrents': {h: {'save_path': '/data/torrents/tv', 'category': 'music'}}})
+    assert view.query(Query(misplaced=True)).total == 0
+    assert [r.hash for r in view.query(Query(category='music')).rows] == [h]
+    assert 'movies' in view.by_category and h not in view.by_category['movies']
+    # a client watching misplaced torrents is told the fixed one left its list
+    full, rows, removed = view.changed(rev, Query(misplaced=True))
+    assert (full, rows, removed) == (False, [], [h])
@@ -0,0 +1,92 @@
+# ==============================
+# tests/test_verify.py
+# ==============================
+import hashlib
+import os
+import time
+
+import pytest
+
+from app.bencode import BencodeError, bdecode
+from app.verify import compare_manifest, torrent_layout, verify_pieces
+
+
+def _benc(v):
+    if isinstance(v, int):
+        return b'i%de' % v
+    if isinstance(v, str):
+        v = v.encode()
+    if isinstance(v, bytes):
+        return b'%d:%s' % (len(v), v)
+    if isinstance(v, list):
+        return b'l' + b''.join(_benc(x) for x in v) + b'e'
+    return b'd' + b''.join(_benc(k) + _benc(v[k]) for k in sorted(v)) + b'e'
+
+
+def _make_torrent(root, sizes, piece=16384):
+    (root / 'T').mkdir(parents=True)
+    payload = b''
+    files = []
+    for i, size in enumerate(sizes):
+        data = os.urandom(size)
+        (root / 'T' / f'f{i}').write_bytes(data)
+        payload += data
+        files.append({'length': size, 'path': [f'f{i}']})
+        if i == 0:  # BEP 47 padding to the next piece boundary
+            pad = -size % piece
+            payload += bytes(pad)
+            files.append({'length': pad, 'path': ['.pad', str(pad)], 'attr': 'p'})
+    pieces = b''.join(hashlib.sha1(payload[i:i + piece]).digest() for i in range(0, len(payload), piece))
+    return _benc({'info': {'name': 'T', 'piece length': piece, 'pieces': pieces, 'files': files}})
+
+
+def test_bdecode_roundtrip_and_errors():
+    assert bdecode(_benc({'a': [1, 'x', {'b': -2}]})) == {b'a': [1, b'x', {b'b': -2}]}
+    for bad in (b'i1', b'5:ab', b'li1e', b'i1ei2e', b'x'):
+        with pytest.raises(BencodeError):
+            bdecode(bad)
+
+
+def test_pieces_detect_corruption(tmp_path):
+    meta = _make_torrent(tmp_path, [10000, 50000, 3])
+    layout = torrent_layout(meta, ['T/f0', 'T/f1', 'T/f2'])
+    assert layout.total == 16384 + 50003
+    assert verify_pieces(str(tmp_path), layout, workers=3) == []
+
+    with open(tmp_path / 'T' / 'f1', 'r+b') as f:
+        f.seek(20000)
+        f.write(b'\0')
+    assert verify_pieces(str(tmp_path), layout) == [2]
+    os.unlink(tmp_path / 'T' / 'f2')
+    assert verify_pieces(str(tmp_path), layout) == [2, 4]
+
+
+def test_manifest_compare(tmp_path):
+    (tmp_path / 's').mkdir()
+    (tmp_path / 'd').mkdir()
+    for name in ('a', 'b', 'c'):
+        (tmp_path / 's' / name).write_text(name)
+    for name in ('a', 'b'):
+        (tmp_path / 'd' / name).write_text(name)
+        st = os.stat(tmp_path / 's' / name)
+        os.utime(tmp_path / 'd' / name, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.utime(tmp_path / 'd' / 'b', ns=(0, 0))
+    assert compare_manifest(str(tmp_path / 's'), str(tmp_path / 'd'), ['a', 'b', 'c', 'missing']) == ['b', 'c']
+
+
+def test_verify_benchmark(tmp_path, bench):
+    meta = _make_torrent(tmp_path, [32 << 20, 32 << 20], piece=1 << 20)
+    layout = torrent_layout(meta)
+    # what a qB recheck does: SHA-1 over every piece, one thread
+    t0 = time.perf_counter()
+    assert verify_pieces(str(tmp_path), layout, workers=1) == []
+    recheck = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    assert verify_pieces(str(tmp_path), layout, workers=4) == []
+    pieces = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    assert compare_manifest(str(tmp_path), str(tmp_path), ['T/f0', 'T/f1']) == []
+    manifest = time.perf_counter() - t0
+    bench('verify 64MiB recheck-equivalent, 1 thread (ms)', round(recheck * 1000, 1))
+    bench('verify 64MiB pieces, 4 threads (ms)', round(pieces * 1000, 1))
+    bench('verify 64MiB manifest (us)', round(manifest * 1e6))
@@ -28,6 +28,8 @@ export default function App() {
   useEffect(() => {
     if (!ok) return
     const close = connectSSE((ev) => {
+      // server couldn't replay the gap since our last event: resync the list
+      if (ev.type === 'reset') load()
       try {
         const data = JSON.parse((ev as any).data || '{}')
         if (typeof data.line === 'string') {
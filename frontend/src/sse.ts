@@ -1,23 +1,33 @@
-export function connectSSE(onMessage: (ev: MessageEvent) => void) {
-  let es = new EventSource('/api/events/stream', { withCredentials: true } as any)
+export function connectSSE(onMessage: (ev: MessageEvent) => void, lastEventId = '') {
+  const url = lastEventId
+    ? `/api/events/stream?lastEventId=${encodeURIComponent(lastEventId)}`
+    : '/api/events/stream'
+  let es = new EventSource(url, { withCredentials: true } as any)
+  let lastId = lastEventId
+
+  const handle = (ev: MessageEvent) => {
+    if (ev.lastEventId) lastId = ev.lastEventId
+    onMessage(ev)
+  }
 
   es.onopen = () => {
     // optional: you could dispatch a message to your UI here
   }
   es.onerror = () => {
-    // Auto-reconnect after a short delay
+    // Auto-reconnect after a short delay; the server replays what we missed
     try { es.close() } catch {}
     setTimeout(() => {
-      es = connectSSE(onMessage) as any
+      es = connectSSE(onMessage, lastId) as any
     }, 1500)
   }
 
-  es.onmessage = onMessage
-  es.addEventListener('progress', onMessage as any)
-  es.addEventListener('state', onMessage as any)
-  es.addEventListener('done', onMessage as any)
+  es.onmessage = handle
+  es.addEventListener('progress', handle as any)
+  es.addEventListener('state', handle as any)
+  es.addEventListener('done', handle as any)
+  es.addEventListener('reset', handle as any)
 
   return () => {
     try { es.close() } catch {}
   }
-}
\ No newline at end of file
+}